@@ -0,0 +1,383 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the quadrature backends of the folding
+calculations (see folding.py). A backend is chosen by its name,
+e.g. backend='filon', or by passing a backend object.
+"""
+
+from .matematik import j_hat_1, j_hat_1_table, j_hat_1_tabulated, is_uniform, mesh_weights, kernel_cache, array_key
+from numpy import pi, concatenate
+from .simpson import integrals as simpson_integrals
+from . import time_check
+from .errors import InputError
+
+
+class Backend:
+    """
+    The integrals needed by the folding calculations:
+
+    fourier(f, r, q)           : int f(r) j_n(qr) r^2 dr, f could be a stack (Nf x Nr)
+    inverse(f_q, q, R)         : the same transform from q space to R space
+    fqs(fr2, r, g, s, q)       : f(q, s) = int fr2(r) j_hat_1(g(r) s) j_0(qr) r^2 dr
+    gRs(dFqs, R, s, q)         : g(R, s) = int dFqs(q, s) j_0(qR) q^2 dq
+    u_ex(dGRs, k, vnn_ex, R, s): u(R) = int dGRs(R, s) vnn_ex(s) j_0(k(R) s) s^2 ds
+    """
+    name = None
+
+    def fourier(self, f, r, q, n=0):
+        raise NotImplementedError
+
+    def inverse(self, f_q, q, R, n=0):
+        return self.fourier(f_q, q, R, n)
+
+    def fqs(self, fr2, r, g, s, q):
+        raise NotImplementedError
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        raise NotImplementedError
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+
+class SimpsonBackend(Backend):
+    """
+    Simpson 1/3 rule (quadrature weights of the meshes, see mesh_weights).
+    table_dx: j_hat_1 in fqs is interpolated from a table with this step,
+              e.g. SimpsonBackend(table_dx=0.01), see j_hat_1_table
+    """
+    name = 'simpson'
+
+    def __init__(self, table_dx=None):
+        self.integrals = simpson_integrals
+        self.table_dx = table_dx
+
+    def fourier(self, f, r, q, n=0):
+        if f.ndim > 1:
+            return self.integrals.fourier_with_simpson_batch(f, r, q, n)
+        return self.integrals.fourier_with_simpson(f, r, q, n)
+
+    def fqs(self, fr2, r, g, s, q):
+        return self.integrals.fqs_with_simpson(fr2, r, g, s, q, self.table_dx)
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        return self.integrals.gRs_with_simpson(dFqs, R, s, q, n)
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        return self.integrals.u_ex_with_simpson(dGRs, k, vnn_ex, R, s, n)
+
+
+class FilonBackend(Backend):
+    """
+    Filon's method for the oscillating integrands (uniform meshes),
+    see filon/integrals.py. table_dx: see SimpsonBackend
+    """
+    name = 'filon'
+
+    def __init__(self, table_dx=None):
+        # filon/ imports folding.py, so its integrals are imported
+        # when the backend is created (see get_backend)
+        from .filon import integrals as filon_integrals
+        self.integrals = filon_integrals
+        self.table_dx = table_dx
+
+    def fourier(self, f, r, q, n=0):
+        if f.ndim > 1:
+            return self.integrals.fourier_with_filon_batch(f, r, q, n)
+        return self.integrals.fourier_with_filon(f, r, q, n)
+
+    def fqs(self, fr2, r, g, s, q):
+        return self.integrals.fqs_with_filon(fr2, r, g, s, q, self.table_dx)
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        return self.integrals.gRs_with_filon(dFqs, R, s, q, n)
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        return self.integrals.u_ex_with_filon(dGRs, k, vnn_ex, R, s, n)
+
+
+class KernelBackend(SimpsonBackend):
+    """
+    Transforms as matrix products with kernel matrices
+    K[i, j] = w[j] r[j]^2 j_n(q[i] r[j]) (see fourier_kernel).
+    The recently used kernels are kept for each pair of meshes (see
+    kernel_cache), so repeated calculations on the same meshes only cost
+    matrix products.
+    u_ex is calculated as in SimpsonBackend since k(R) changes
+    in every iteration.
+    """
+    name = 'kernel'
+
+    def __init__(self, table_dx=None):
+        super().__init__(table_dx)
+        self.kernels = kernel_cache
+
+    def kernel_key(self, r, q, n):
+        return (repr(self), array_key(r, q), n)
+
+    def kernel(self, r, q, n=0):
+        key = self.kernel_key(r, q, n)
+        kernel = self.kernels.get(key)
+        if kernel is None:
+            kernel = self.kernels[key] = self.integrals.fourier_kernel(r, q, n)
+        return kernel
+
+    def fourier(self, f, r, q, n=0):
+        return f @ self.kernel(r, q, n).T
+
+    def fqs(self, fr2, r, g, s, q):
+        # all s values at once: (Ns x Nr) @ (Nr x Nq)
+        gs = (s.reshape(-1, 1) * g.reshape(1, -1)).ravel()
+        if self.table_dx:
+            j_hat = j_hat_1_tabulated(gs, *j_hat_1_table(gs.max(), self.table_dx), self.table_dx)
+        else:
+            j_hat = j_hat_1(gs)
+        fr2_s = fr2 * j_hat.reshape(len(s), len(r))
+        return (fr2_s @ self.kernel(r, q).T).T
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        return self.kernel(q, R, n) @ dFqs
+
+    def clear(self):
+        for key in [key for key in self.kernels if key[0] == repr(self)]:
+            del self.kernels[key]
+
+
+class HybridBackend(KernelBackend):
+    """
+    Simpson or Filon weights for each q (for each R in the inverse
+    transform) depending on the oscillations per Simpson panel (2 dx):
+    Filon if t dx / pi >= osc, otherwise Simpson. Simpson is more accurate
+    for a few oscillations per panel, while it fails for many oscillations
+    per panel where Filon is still accurate. The kernel matrices are kept
+    for each pair of meshes (see KernelBackend).
+    Non-uniform meshes use the quadrature weights of the meshes only.
+    """
+    name = 'hybrid'
+
+    def __init__(self, osc=0.6, table_dx=None):
+        super().__init__(table_dx)
+        from .filon import integrals as filon_integrals
+        self.filon_integrals = filon_integrals
+        self.osc = osc
+        self.theta = pi * osc
+
+    def filon_mesh(self, x, n=0):
+        return n == 0 and len(x) % 2 == 1 and is_uniform(x)
+
+    def kernel(self, r, q, n=0):
+        key = self.kernel_key(r, q, n)
+        kernel = self.kernels.get(key)
+        if kernel is None:
+            if self.filon_mesh(r, n):
+                kernel = self.filon_integrals.hybrid_kernel(r, mesh_weights(r), q, self.theta)
+            else:
+                kernel = self.integrals.fourier_kernel(r, q, n)
+            self.kernels[key] = kernel
+        return kernel
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        if self.filon_mesh(s, n):
+            return self.filon_integrals.u_ex_hybrid(dGRs, k, vnn_ex, R, s, mesh_weights(s), self.theta)
+        return self.integrals.u_ex_with_simpson(dGRs, k, vnn_ex, R, s, n)
+
+    def __repr__(self):
+        return f'HybridBackend(osc={self.osc})'
+
+
+class MixedBackend(Backend):
+    """
+    Uses a different backend for each integral, e.g.
+    MixedBackend('simpson', inverse='filon') uses Filon's method
+    for the inverse transforms (q --> R) and Simpson elsewhere.
+    default: the backend of the other integrals
+    """
+    name = 'mixed'
+
+    def __init__(self, default='simpson', fourier=None, inverse=None, fqs=None, gRs=None, u_ex=None):
+        self.default = default
+        self.ops = {'fourier': fourier, 'inverse': inverse, 'fqs': fqs, 'gRs': gRs, 'u_ex': u_ex}
+
+    def backend(self, op):
+        op_backend = self.ops[op]
+        return _find_backend(self.default if op_backend is None else op_backend)
+
+    def fourier(self, f, r, q, n=0):
+        return self.backend('fourier').fourier(f, r, q, n)
+
+    def inverse(self, f_q, q, R, n=0):
+        return self.backend('inverse').inverse(f_q, q, R, n)
+
+    def fqs(self, fr2, r, g, s, q):
+        return self.backend('fqs').fqs(fr2, r, g, s, q)
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        return self.backend('gRs').gRs(dFqs, R, s, q, n)
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        return self.backend('u_ex').u_ex(dGRs, k, vnn_ex, R, s, n)
+
+    def __repr__(self):
+        ops = ''.join(f', {op}={b!r}' for op, b in self.ops.items() if b is not None)
+        return f'MixedBackend({self.default!r}{ops})'
+
+
+class ProfiledBackend(Backend):
+    """
+    Records every integral of backend as a stage of the running profile
+    and counts the transformed functions, see time_check.profile_on().
+    get_backend() returns it while a profiled calculation runs.
+    """
+    name = 'profiled'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def run(self, op, n_func, *args):
+        with time_check.stage(op):
+            time_check.count(op, n_func)
+            result = getattr(self.backend, op)(*args)
+            time_check.track_arrays(**{op: result})
+        return result
+
+    def fourier(self, f, r, q, n=0):
+        return self.run('fourier', len(f) if f.ndim > 1 else 1, f, r, q, n)
+
+    def inverse(self, f_q, q, R, n=0):
+        return self.run('inverse', len(f_q) if f_q.ndim > 1 else 1, f_q, q, R, n)
+
+    def fqs(self, fr2, r, g, s, q):
+        return self.run('fqs', 1, fr2, r, g, s, q)
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        return self.run('gRs', 1, dFqs, R, s, q, n)
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        return self.run('u_ex', 1, dGRs, k, vnn_ex, R, s, n)
+
+    def __repr__(self):
+        return f'ProfiledBackend({self.backend!r})'
+
+
+class ProgressBackend(Backend):
+    """
+    Reports the progress of the integrals of backend and checks the
+    cancellation between them, see progress.py.
+    stages: {op: Progress} of the reported integrals
+    calls : {op: the number of calls} expected for each reported integral
+    label : the prefix of the stage names, e.g. 'exchange'
+    gRs and u_ex are integrated in blocks of progress.block R points,
+    so a long integral is reported (and could be cancelled) during the run.
+    """
+    name = 'progress'
+
+    def __init__(self, backend, stages, calls, label=''):
+        self.backend = backend
+        self.stages = stages
+        self.calls = calls
+        self.label = label
+        self.done = {op: 0 for op in stages}
+
+    def update(self, op, fraction=1.0):
+        progress = self.stages.get(op)
+        if progress is None:
+            return
+        calls = max(self.calls.get(op, 1), 1)
+        progress.update(f'{self.label}/{op}', (self.done[op] + fraction) / calls)
+
+    def finish(self, op):
+        if op in self.done:
+            self.update(op)
+            self.done[op] += 1
+
+    def blocks(self, op, R, integral):
+        progress = self.stages.get(op)
+        nR = len(R)
+        size = nR if progress is None else max(progress.block, 3)
+        # the last block has at least 3 points
+        starts = [i for i in range(0, nR, size) if i == 0 or nR - i >= 3]
+        if len(starts) == 1:
+            result = integral(slice(None))
+        else:
+            # the blocks start one point early: some integrals patch the
+            # first point of R by extrapolation (R ~ 0, see filon f_0)
+            results = [integral(slice(0, starts[1]))]
+            for i, end in zip(starts[1:], starts[2:] + [nR]):
+                self.update(op, i / nR)
+                results.append(integral(slice(i - 1, end))[1:])
+            result = concatenate(results)
+        self.finish(op)
+        return result
+
+    def fourier(self, f, r, q, n=0):
+        result = self.backend.fourier(f, r, q, n)
+        self.finish('fourier')
+        return result
+
+    def inverse(self, f_q, q, R, n=0):
+        result = self.backend.inverse(f_q, q, R, n)
+        self.finish('inverse')
+        return result
+
+    def fqs(self, fr2, r, g, s, q):
+        result = self.backend.fqs(fr2, r, g, s, q)
+        self.finish('fqs')
+        return result
+
+    def gRs(self, dFqs, R, s, q, n=0):
+        return self.blocks('gRs', R, lambda b: self.backend.gRs(dFqs, R[b], s, q, n))
+
+    def u_ex(self, dGRs, k, vnn_ex, R, s, n=0):
+        return self.blocks('u_ex', R, lambda b: self.backend.u_ex(dGRs[b], k[b], vnn_ex, R[b], s, n))
+
+    def __repr__(self):
+        return f'ProgressBackend({self.backend!r})'
+
+
+backend_classes = {'simpson': SimpsonBackend, 'filon': FilonBackend, 'kernel': KernelBackend,
+                   'hybrid': HybridBackend}
+_backends = {}
+
+def _find_backend(backend):
+    if not isinstance(backend, str):
+        return backend
+    if backend not in _backends:
+        if backend not in backend_classes:
+            raise InputError(f"unknown backend '{backend}': use one of {list(backend_classes)} or a Backend object")
+        _backends[backend] = backend_classes[backend]()
+    return _backends[backend]
+
+def _profiled(backend):
+    while isinstance(backend, ProgressBackend):
+        backend = backend.backend
+    return isinstance(backend, ProfiledBackend)
+
+def get_backend(backend='simpson'):
+    """
+    Returns the backend object of a backend name ('simpson', 'filon', 'kernel', 'hybrid').
+    Backend objects are returned as they are.
+    During a profiled calculation the backend is wrapped by ProfiledBackend.
+    """
+    backend = _find_backend(backend)
+    if time_check._profile is not None and not _profiled(backend):
+        return ProfiledBackend(backend)
+    return backend
@@ -0,0 +1,260 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the benchmarks of the transforms, the exchange
+kernels and the full folding potentials on a ladder of mesh sizes.
+
+python -m bifold.benchmark --sizes small medium --backends simpson filon --output new.json
+python -m bifold.benchmark --output new.json --compare old.json
+
+The first call of each case is reported separately from the steady
+state (best and median of the repeated calls). Only the first call of
+a case in the process (on the first mesh size) includes the JIT
+compilation of numba, see 'jit' in the results. The kernel and spline
+caches are cleared before every timed call, so best and median are the
+cold times of the calculation, and 'cached' is the best time with the
+caches kept. The results are saved as JSON, so that two versions can be
+compared (see compare_results).
+"""
+
+from .constants import zero
+from .matematik import mesh, kernel_cache, _spline_fits
+from .functions import f_2prm_fermi, f_2prm_gaussian, f_3prm_fermi, f_external
+from .interactions import v_coulomb, v_m3y_reid_ex_fr
+from .quadrature import integrator_tradeoff
+from .backends import get_backend
+from .folding import (u_m3y_reid_zr, u_ddm3y_reid_zr, u_xdm3yn_fr, u_coul_bifold_d,
+                      u_coul_ucs, k_fermi, k_fermi_spline)
+from numpy import median
+from numpy.random import default_rng
+from time import perf_counter
+from datetime import datetime
+import argparse
+import json
+import platform
+import sys
+
+# mesh ladder: (dr, dq) with r_max = 10 fm and q_max = 3 fm^-1
+mesh_sizes = {'small': (0.2, 0.08), 'medium': (0.1, 0.04), 'large': (0.05, 0.02)}
+
+transform_cases = ['fourier', 'fqs', 'gRs', 'u_ex']
+density_cases = ['k_fermi', 'k_fermi_spline']
+potential_cases = ['u_m3y_reid_zr', 'u_ddm3y_reid_zr', 'u_xdm3yn_fr', 'u_coul_bifold_d']
+all_cases = transform_cases + density_cases + potential_cases
+
+
+def clear_caches():
+    """
+    Clears the kernel matrices and the splines kept between the calls.
+    """
+    kernel_cache.clear()
+    _spline_fits.clear()
+
+def time_call(func, repeat=5, clear=clear_caches):
+    """
+    Returns the time of the first call, the best and the median of the
+    next repeat calls with clear() before each of them (cold caches) and
+    the best of repeat calls without clear (cached), in s.
+    """
+    clear()
+    start = perf_counter()
+    func()
+    first = perf_counter() - start
+
+    times = []
+    for i in range(repeat):
+        clear()
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+
+    cached = []
+    for i in range(repeat):
+        start = perf_counter()
+        func()
+        cached.append(perf_counter() - start)
+    return {'first': first, 'best': min(times), 'median': float(median(times)),
+            'cached': min(cached), 'repeat': repeat}
+
+def make_inputs(size, seed=0):
+    """
+    The meshes and the inputs of the cases for a mesh size.
+    The density parameters are drawn around 16O values with a fixed seed.
+    """
+    dr, dq = mesh_sizes[size]
+    rng = default_rng(seed)
+    r = mesh(zero, 10, dr)
+    q = mesh(zero, 3, dq)
+    R, s = r.copy(), r.copy()
+
+    rho_0, c, a = (0.181, 2.525, 0.450) * (1 + 0.01 * rng.standard_normal(3))
+    rho = f_2prm_fermi(r, rho_0, c, a)
+    rho_he = f_2prm_gaussian(r, 0.4229, (1 / 0.7024) ** .5)
+    rho_ext = f_external(r, {'benchmark': '\n'.join(f'{ri} {fi}' for ri, fi in zip(r, rho()))})
+    kf = k_fermi(r, rho(), Cs=1/4)
+    vnn = v_m3y_reid_ex_fr(s)
+    k_local = 0.8 + 0.1 * rng.random(len(R))
+    dFqs = rng.random((len(q), len(s)))
+    dGRs = rng.random((len(R), len(s)))
+    return {'r': r, 'q': q, 'R': R, 's': s, 'rho': rho, 'rho_he': rho_he, 'rho_ext': rho_ext,
+            'kf': kf, 'vnn': vnn, 'k_local': k_local, 'dFqs': dFqs, 'dGRs': dGRs,
+            'u_coul': u_coul_ucs(R, 5.42, 8, 8),
+            'rho_p_ch': f_2prm_gaussian(r, 0.4229, (1 / 0.7024) ** .5, Ze=2),
+            'rho_t_ch': f_3prm_fermi(r, 0.084933, -0.161/3.766**2, 3.766, 0.586)}
+
+def case_function(case, backend, x):
+    """
+    Returns a function without arguments running the case.
+    """
+    b = get_backend(backend)
+    r, q, R, s = x['r'], x['q'], x['R'], x['s']
+    cases = {
+        'fourier':        lambda: b.fourier(x['rho'](), r, q),
+        'fqs':            lambda: b.fqs(x['rho'](), r, x['kf'](), s, q),
+        'gRs':            lambda: b.gRs(x['dFqs'], R, s, q),
+        'u_ex':           lambda: b.u_ex(x['dGRs'], x['k_local'], x['vnn'](), R, s),
+        'k_fermi':        lambda: k_fermi(r, x['rho'](), Cs=1/4),
+        'k_fermi_spline': lambda: k_fermi_spline(r, x['rho_ext'](), Cs=1/4),
+        'u_m3y_reid_zr':  lambda: u_m3y_reid_zr(141.7, 4, x['rho_he'], x['rho'], r, q, R, s, backend=b),
+        'u_ddm3y_reid_zr': lambda: u_ddm3y_reid_zr(141.7, 4, x['rho_he'], x['rho'], r, q, R, s, backend=b),
+        'u_xdm3yn_fr':    lambda: u_xdm3yn_fr(250., 16, 16, x['rho'], x['rho'], x['u_coul'], r, q, R, s,
+                                              Cs=1/4, dd_name='bdm3y1', backend=b),
+        'u_coul_bifold_d': lambda: u_coul_bifold_d(x['rho_p_ch'], x['rho_t_ch'], v_coulomb(s), r, q, R, s, backend=b),
+    }
+    return cases[case]
+
+def run_benchmarks(cases=None, sizes=('small', 'medium'), backends=('simpson', 'filon'),
+                   repeat=5, seed=0, quadrature=True, msg=True):
+    """
+    Runs the cases on the mesh sizes with the backends.
+    k_fermi and k_fermi_spline do not depend on the backend, they run once.
+
+    Returns
+    -------
+    dict
+        ``meta`` (versions, seed, date), ``results`` (list of dicts: case,
+        backend, size, nr, nq, first, jit, best, median, cached, repeat) and
+        ``quadrature`` (see integrator_tradeoff)
+    """
+    import numpy, scipy, numba
+    cases = all_cases if cases is None else cases
+    results = []
+    # the cases run once already, their first calls include no compilation
+    compiled = set()
+    for size in sizes:
+        x = make_inputs(size, seed)
+        for case in cases:
+            for backend in (backends[:1] if case in density_cases else backends):
+                timing = time_call(case_function(case, backend, x), repeat=repeat)
+                result = {'case': case, 'backend': backend if case not in density_cases else None,
+                          'size': size, 'nr': len(x['r']), 'nq': len(x['q']),
+                          'jit': (case, backend) not in compiled, **timing}
+                compiled.add((case, backend))
+                results.append(result)
+                if msg:
+                    print_result(result)
+
+    bench = {'meta': {'date': datetime.now().isoformat(timespec='seconds'),
+                      'python': platform.python_version(), 'platform': platform.platform(),
+                      'numpy': numpy.__version__, 'scipy': scipy.__version__, 'numba': numba.__version__,
+                      'seed': seed, 'repeat': repeat, 'sizes': {k: mesh_sizes[k] for k in sizes}},
+             'results': results}
+    if quadrature:
+        bench['quadrature'] = integrator_tradeoff(
+            lambda r: r * r * f_2prm_fermi(r, 0.169, 3.60, 0.523)(), 0, 12)
+    return bench
+
+def print_result(result):
+    backend = result['backend'] or '-'
+    first = 'first (jit)' if result.get('jit') else 'first call '
+    cached = f"   cached = {result['cached']:10.4e} s" if 'cached' in result else ''
+    print(f"{result['case']:<16s} {backend:<8s} {result['size']:<7s} nr = {result['nr']:4d} nq = {result['nq']:4d}"
+          f"   {first} = {result['first']:10.4e} s   best = {result['best']:10.4e} s"
+          f"   median = {result['median']:10.4e} s{cached}")
+
+def save_results(bench, path):
+    with open(path, 'w') as f:
+        json.dump(bench, f, indent=2)
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def compare_results(old, new, threshold=1.25, min_time=1e-4, key='best'):
+    """
+    Compares the steady state times of two benchmark runs (see run_benchmarks),
+    the cold times (best) by default, key='cached' for the times with the caches.
+    A case is flagged as a regression if new / old > threshold. The cases
+    faster than min_time (s) in both runs are not flagged, their timings
+    are dominated by noise.
+
+    Returns
+    -------
+    list of dict
+        ``case``, ``backend``, ``size``, ``old``, ``new``, ``ratio``, ``regression``
+    """
+    old_results = {(o['case'], o['backend'], o['size']): o for o in old['results']}
+    comparison = []
+    for n in new['results']:
+        o = old_results.get((n['case'], n['backend'], n['size']))
+        if o is None:
+            continue
+        ratio = n[key] / o[key]
+        regression = ratio > threshold and max(n[key], o[key]) > min_time
+        comparison.append({'case': n['case'], 'backend': n['backend'], 'size': n['size'],
+                           'old': o[key], 'new': n[key], 'ratio': ratio, 'regression': regression})
+    return comparison
+
+def print_comparison(comparison):
+    for c in comparison:
+        flag = 'REGRESSION' if c['regression'] else ''
+        backend = c['backend'] or '-'
+        print(f"{c['case']:<16s} {backend:<8s} {c['size']:<7s} old = {c['old']:10.4e} s   "
+              f"new = {c['new']:10.4e} s   new/old = {c['ratio']:6.3f} {flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='bifold benchmarks')
+    parser.add_argument('--cases', nargs='+', default=None, choices=all_cases)
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(mesh_sizes))
+    parser.add_argument('--backends', nargs='+', default=['simpson', 'filon'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-quadrature', action='store_true', help='skip the integrator accuracy table')
+    parser.add_argument('--output', default=None, help='JSON file of the results')
+    parser.add_argument('--compare', default=None, help='JSON file of an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.25, help='new/old time flagged as a regression')
+    args = parser.parse_args(argv)
+
+    # headless runs
+    import matplotlib
+    matplotlib.use('Agg')
+
+    bench = run_benchmarks(args.cases, args.sizes, args.backends, args.repeat, args.seed,
+                           quadrature=not args.no_quadrature)
+    if args.output is not None:
+        save_results(bench, args.output)
+
+    if args.compare is not None:
+        comparison = compare_results(load_results(args.compare), bench, threshold=args.threshold)
+        print_comparison(comparison)
+        if any(c['regression'] for c in comparison):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module chooses the meshes (r, q, R, s) of a folding calculation
+for a requested precision.
+"""
+
+from .constants import zero
+from .matematik import mesh
+from .errors import InputError
+from numpy import interp, abs, max
+from warnings import warn
+
+# chosen meshes for each nucleus pair
+_mesh_cache = {}
+
+def u_R_vol2(u):
+    """
+    Returns u_R and vol2 of the total potential of a folding calculation.
+    """
+    try:
+        return u['func_r']['total']['u_R'], u['func_i']['total']['u_R'][0]['vol2']
+    except KeyError:
+        return u['func_r']['u_R'], u['func_i']['u_R'][0]['vol2']
+
+def mesh_errors(u_coarse, R_coarse, u_fine, R_fine, order=None):
+    """
+    Estimates the errors of u_R and vol2 of the coarse calculation
+    by comparing it to the fine calculation on the coarse R mesh.
+
+    order == None: half-step comparison, error = |u_coarse - u_fine|
+    order == p   : Richardson estimate for a method of order p,
+                   error = |u_coarse - u_fine| / (1 - 2^-p)
+
+    Returns
+    -------
+    float, float, float, float
+        ``max error of u_R``, ``max |u_R|``, ``error of vol2``, ``|vol2|``
+    """
+    uc, vol2_c = u_R_vol2(u_coarse)
+    uf, vol2_f = u_R_vol2(u_fine)
+    richardson = 1 if order is None else 1 / (1 - 2.0 ** -order)
+
+    err_u = richardson * max(abs(uc - interp(R_coarse, R_fine, uf)))
+    err_vol2 = richardson * abs(vol2_c - vol2_f)
+    return err_u, max(abs(uc)), err_vol2, abs(vol2_c)
+
+def converged(errors, atol=None, rtol=None):
+    """
+    Checks the errors (see mesh_errors) against the absolute (atol) and/or
+    relative (rtol) tolerances for both u_R and vol2.
+    """
+    err_u, u_max, err_vol2, vol2 = errors
+    ok = True
+    if atol is not None:
+        ok = ok and err_u <= atol and err_vol2 <= atol * vol2 / u_max
+    if rtol is not None:
+        ok = ok and err_u <= rtol * u_max and err_vol2 <= rtol * vol2
+    return ok
+
+def converge_mesh(calc, r_max=10, q_max=3, dr=0.2, dq=0.08, atol=None, rtol=1e-3, order=None,
+                  pair=None, grow=1.25, r_limit=30, q_limit=15, max_refine=5, msg=False):
+    """
+    Chooses the cheapest uniform meshes (r, q, R, s) for which the
+    estimated errors of u_R and vol2 meet the tolerances.
+
+    calc    : function calc(r, q, R, s) returning a folding calculation,
+              e.g. lambda r, q, R, s: u_m3y_reid_zr(e_lab, a_proj,
+                   f_2prm_gaussian(r, 0.4229, 1.19), f_2prm_fermi(r, 0.169, 3.60, 0.523), r, q, R, s)
+    r_max   : starting r_max (fm), it is used for r, R and s meshes
+    q_max   : starting q_max (fm^-1)
+    dr, dq  : starting (coarse) mesh steps
+    atol    : absolute tolerance on u_R (MeV), vol2 is checked with the same relative precision
+    rtol    : relative tolerance on u_R (relative to max|u_R|) and vol2
+    order   : None for half-step comparison or the order of the method for Richardson estimates
+    pair    : a hashable key of the calculation, it must cover the physics of calc,
+              e.g. ('4He', '40Ca', e_lab, 'cdm3y6'), the chosen meshes are cached for
+              the key, the tolerances and the other arguments of the search
+    grow    : r_max and q_max are multiplied by grow until they converge
+    r_limit, q_limit, max_refine: limits of the search, max_refine >= 1
+
+    1. r_max and q_max are extended with the coarse steps until u_R and
+       vol2 do not change on the common R mesh.
+    2. the steps are halved until the half-step (or Richardson) error
+       estimate meets the tolerances. The coarser of the last two meshes
+       is chosen.
+    A search that reaches r_limit, q_limit or max_refine warns and
+    sets info['converged'] to False.
+
+    Returns
+    -------
+    dict
+        ``r``, ``q``, ``R``, ``s`` meshes and ``info`` of the search
+    """
+    if int(max_refine) != max_refine or max_refine < 1:
+        raise InputError(f'max_refine = {max_refine} must be a positive integer: the errors are estimated by a refinement')
+    cache_key = (pair, atol, rtol, order, r_max, q_max, dr, dq, grow, r_limit, q_limit, max_refine)
+    if pair is not None and cache_key in _mesh_cache:
+        return _copy_chosen(_mesh_cache[cache_key])
+
+    n_calc = 0
+    def run(r_max_i, q_max_i, dr_i, dq_i):
+        nonlocal n_calc
+        n_calc += 1
+        r = mesh(zero, r_max_i, dr_i)
+        q = mesh(zero, q_max_i, dq_i)
+        u = calc(r, q, r.copy(), r.copy())
+        if msg:
+            print(f'converge_mesh: r_max = {r_max_i:7.3f}, q_max = {q_max_i:7.3f}, dr = {dr_i:7.4f}, dq = {dq_i:7.4f}')
+        return u, r
+
+    # 1. extents
+    not_converged = []
+    u_0, R_0 = run(r_max, q_max, dr, dq)
+    while r_max * grow <= r_limit:
+        u_1, R_1 = run(r_max * grow, q_max, dr, dq)
+        if converged(mesh_errors(u_0, R_0, u_1, R_1), atol=atol, rtol=rtol):
+            break
+        r_max *= grow
+        u_0, R_0 = u_1, R_1
+    else:
+        not_converged.append(f'r_max reached r_limit = {r_limit}')
+
+    while q_max * grow <= q_limit:
+        u_1, R_1 = run(r_max, q_max * grow, dr, dq)
+        if converged(mesh_errors(u_0, R_0, u_1, R_1), atol=atol, rtol=rtol):
+            break
+        q_max *= grow
+        u_0, R_0 = u_1, R_1
+    else:
+        not_converged.append(f'q_max reached q_limit = {q_limit}')
+
+    # 2. steps
+    for i in range(max_refine):
+        u_1, R_1 = run(r_max, q_max, dr / 2, dq / 2)
+        errors = mesh_errors(u_0, R_0, u_1, R_1, order=order)
+        if converged(errors, atol=atol, rtol=rtol):
+            break
+        dr, dq = dr / 2, dq / 2
+        u_0, R_0 = u_1, R_1
+    else:
+        not_converged.append(f'the steps did not converge in {max_refine} refinements')
+    if not_converged:
+        warn(f"converge_mesh: {', '.join(not_converged)}, the tolerances may not be met "
+             f"(r_max = {r_max}, q_max = {q_max}, dr = {dr}, dq = {dq}).", RuntimeWarning, stacklevel=2)
+
+    r = mesh(zero, r_max, dr)
+    q = mesh(zero, q_max, dq)
+    err_u, u_max, err_vol2, vol2 = errors
+    chosen = {'r': r, 'q': q, 'R': r.copy(), 's': r.copy(),
+              'info': {'r_max': r_max, 'q_max': q_max, 'dr': dr, 'dq': dq,
+                       'nr': len(r), 'nq': len(q), 'error_u_R': float(err_u), 'error_vol2': float(err_vol2),
+                       'atol': atol, 'rtol': rtol, 'order': order, 'n_calc': n_calc,
+                       'converged': not not_converged, 'not_converged': not_converged}}
+    if pair is not None:
+        _mesh_cache[cache_key] = _copy_chosen(chosen)
+    return chosen
+
+def _copy_chosen(chosen):
+    # the callers can change the meshes in place without changing the cache
+    copy = {name: chosen[name].copy() for name in ('r', 'q', 'R', 's')}
+    copy['info'] = {**chosen['info'], 'not_converged': list(chosen['info']['not_converged'])}
+    return copy
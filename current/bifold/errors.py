@@ -0,0 +1,72 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the exceptions of bifold.
+
+BifoldError
+├── InputError (also ValueError): invalid input of a calculation
+│   ├── EnergyRangeError    : E/A out of the range of a parametrization
+│   ├── InteractionError    : unknown or not implemented dd_name / vnn_name
+│   ├── MeshError           : invalid r, q, R or s meshes
+│   └── DataFormatError     : unreadable external density data
+├── PotentialError          : unknown potential given to print_all/plot_all
+└── Cancelled               : the calculation is cancelled, see progress.py
+
+A batch of calculations could skip the bad inputs, e.g.
+
+try:
+    u = u_xdm3yn_fr(...)
+except InputError as err:
+    print(err)
+"""
+
+
+class BifoldError(Exception):
+    """
+    The base class of the bifold exceptions.
+    """
+
+
+class InputError(BifoldError, ValueError):
+    pass
+
+
+class EnergyRangeError(InputError):
+    pass
+
+
+class InteractionError(InputError):
+    pass
+
+
+class MeshError(InputError):
+    pass
+
+
+class DataFormatError(InputError):
+    pass
+
+
+class PotentialError(BifoldError):
+    pass
+
+
+class Cancelled(BifoldError):
+    """
+    Raised when a calculation is cancelled by its CancelToken.
+    """
@@ -21,9 +21,11 @@ Filon's integrations.
 """
 
 from ..time_check import timer
-from numpy import (sin, cos, sum)
+from numpy import (sin, cos, sum, zeros)
 from numba import njit
 from ..matematik import *
+from ..simpson.integrals import (fourier_with_simpson, fourier_with_simpson_batch,
+                                 u_ex_with_simpson, fqs_with_simpson, gRs_with_simpson)
 
 @njit
 def f_0(r, f):
@@ -82,41 +84,133 @@ def filon(g, x, t):
     int_gamma = gamma * s_odd(f[1:][::2], x[1:][::2], t)
     return (int_alpha + int_beta + int_gamma) * dx
 
+# Filon's method is linear in g: filon(g, x, t) == sum(filon_weights(x, t) * g)
 @njit
+def filon_weights(x, t):
+    """
+    Weights of filon(g, x, t) including the f_0 patch of f[0].
+    x must be a uniform mesh with odd number of points.
+    """
+    nx = x.shape[0]
+    dx = x[1] - x[0]
+    alpha, beta, gamma = alpha_beta_gamma(t * dx)
+    sin_tx = sinm(t * x)
+
+    c = zeros(nx)
+    c[0::2] += beta * sin_tx[0::2]
+    c[1::2] += gamma * sin_tx[1::2]
+    c[0] += alpha * cosm(t * x[0]) - beta * sin_tx[0] / 2
+    c[-1] += -alpha * cosm(t * x[-1]) - beta * sin_tx[-1] / 2
+
+    # f[0] = f_0(x, f) = (1 + x1/h) f[1] - x1/h f[2]
+    h = x[2] - x[1]
+    c[1] += c[0] * (1 + x[1] / h)
+    c[2] -= c[0] * x[1] / h
+    c[0] = 0
+    return c * dx * x / t
+
+@njit
+def _filon_kernel(x, t):
+    kernel = zeros((t.shape[0], x.shape[0]))
+    for i in range(t.shape[0]):
+        kernel[i, :] = filon_weights(x, t[i])
+    return kernel
+
+def filon_kernel(x, t):
+    """
+    Kernel matrix of Filon's method: K @ g == [filon(g, x, ti) for ti in t]
+    The row of t[0] ~ 0 is extrapolated linearly from the next two rows
+    (see f_0). The recently used matrices are kept, see kernel_cache.
+    """
+    key = ('filon', array_key(x, t))
+    kernel = kernel_cache.get(key)
+    if kernel is None:
+        kernel = _filon_kernel(x, t)
+        if t.shape[0] > 2:
+            h = t[2] - t[1]
+            kernel[0, :] = (1 + t[1] / h) * kernel[1, :] - t[1] / h * kernel[2, :]
+        kernel_cache[key] = kernel
+    return kernel
+
+def clear_filon_kernels():
+    for key in [key for key in kernel_cache if key[0] == 'filon']:
+        del kernel_cache[key]
+
+# Filon's method needs uniform meshes.
+# For the non-uniform meshes (e.g. mesh_gl) the transforms are done
+# with the quadrature weights of the meshes, see simpson/integrals.py.
 def fourier_with_filon(f, r, q, n=0):
-    fq = q.copy()
-    for i in range(*fq.shape):
-        fq[i] = filon(f, r, q[i])
-    fq[0] = f_0(q, fq)
-    return fq
+    if not is_uniform(r):
+        return fourier_with_simpson(f, r, q, n)
+    return filon_kernel(r, q) @ f
+
+def fourier_with_filon_batch(f, r, q, n=0):
+    """
+    Fourier transforms of a stack of functions (Nf x Nr).
+    Returns a (Nf x Nq) array.
+    """
+    if not is_uniform(r):
+        return fourier_with_simpson_batch(f, r, q, n)
+    return f @ filon_kernel(r, q).T
 
 # @timer
-@njit
 def u_ex_with_filon(dGRs, k, vnn_ex, R, s, n=0):
-    u0_ex = R.copy()
-    for iR in range(*u0_ex.shape):
-        u0_ex[iR] = filon(dGRs[iR, :] * vnn_ex, s, k[iR])
+    if not is_uniform(s):
+        return u_ex_with_simpson(dGRs, k, vnn_ex, R, s, n)
+    # k(R) changes in every iteration, so the weights are not kept
+    u0_ex = (_filon_kernel(s, k) * dGRs) @ vnn_ex
     u0_ex[0] = f_0(R, u0_ex)
     return u0_ex
 
+# @timer
+def fqs_with_filon(fr2, r, g, s, q, table_dx=None):
+    if not is_uniform(r) or not is_uniform(q):
+        return fqs_with_simpson(fr2, r, g, s, q, table_dx)
+    # all s values at once: (Ns x Nr) @ (Nr x Nq)
+    gs = (s.reshape(-1, 1) * g.reshape(1, -1)).ravel()
+    if table_dx:
+        j_hat = j_hat_1_tabulated(gs, *j_hat_1_table(gs.max(), table_dx), table_dx)
+    else:
+        j_hat = j_hat_1(gs)
+    fr2_s = fr2 * j_hat.reshape(len(s), len(r))
+    return (fr2_s @ filon_kernel(r, q).T).T
 
 # @timer
+def gRs_with_filon(dFqs, R, s, q, n=0):
+    if not is_uniform(q):
+        return gRs_with_simpson(dFqs, R, s, q, n)
+    return filon_kernel(q, R) @ dFqs
+
 @njit
-def fqs_with_filon(fr2, r, g, s, q):
-    fqs = q.reshape(-1, 1) * s.reshape(1, -1)
-    _, ns = fqs.shape
-    for j in range(ns):
-        fqs[:, j] = fourier_with_filon(fr2 * j_hat_1(g * s[j]), r, q)
-    return fqs
+def hybrid_kernel(x, w, t, theta):
+    """
+    Kernel matrix of the transform int g(x) j_0(t x) x^2 dx from x to t:
+    Filon weights if t dx >= theta (many oscillations per panel),
+    otherwise the quadrature weights w of x.
+    """
+    dx = x[1] - x[0]
+    w_x2 = w * x*x
+    kernel = zeros((t.shape[0], x.shape[0]))
+    for i in range(t.shape[0]):
+        if t[i] * dx >= theta:
+            kernel[i, :] = filon_weights(x, t[i])
+        else:
+            kernel[i, :] = w_x2 * j_n(0, t[i] * x)
+    return kernel
 
-# @timer
 @njit
-def gRs_with_filon(dFqs, R, s, q, n=0):
-    grs = R.reshape(-1, 1) * s.reshape(1, -1)
-    nr, ns = grs.shape
-    for i in range(nr):
-        for j in range(ns):
-            grs[i, j] = filon( dFqs.T[j, :], q, R[i])
-    return grs
+def u_ex_hybrid(dGRs, k, vnn_ex, R, s, w, theta):
+    """
+    u_ex_with_filon for k(R) ds >= theta, otherwise u_ex_with_simpson.
+    """
+    ds = s[1] - s[0]
+    u0_ex = R.copy()
+    vnn_ex_s2 = vnn_ex * s*s * w
+    for iR in range(*u0_ex.shape):
+        if k[iR] * ds >= theta:
+            u0_ex[iR] = filon(dGRs[iR, :] * vnn_ex, s, k[iR])
+        else:
+            u0_ex[iR] = sum(dGRs[iR, :] * vnn_ex_s2 * j_n(0, k[iR] * s))
+    return u0_ex
 ########################################################
 ########################################################
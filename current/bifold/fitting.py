@@ -0,0 +1,199 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module fits the renormalisation N_R and the imaginary part of the
+optical potential to the measured elastic cross sections. The folded
+potential is calculated once, only the scalars change in the fit:
+
+u = u_xdm3yn_fr(...)
+fit = ElasticFit(e_lab, a_proj, a_targ, z_proj, z_targ, u, theta, y, dy, u_coul=uc)
+best = fit.fit({'n_r': 1.0, 'n_i': 0.8})
+best['params'], best['chi2']
+
+The imaginary part W(R) is
+imag = 'folded': n_i u_nuc(R)                      (parameter n_i)
+imag = 'ws'    : Woods-Saxon, see woods_saxon      (w0, r_w, a_w)
+imag = None    : W = 0
+
+fit(..., starts=8, workers=4) starts the optimiser at 8 points (the given
+start and random points within the bounds) in 4 processes.
+"""
+
+from .constants import e2, hbc
+from .scattering import (as_potential, kinematics, channel, s_matrix, cross_sections,
+                         reaction_cross_section, coulomb_phases, chi2)
+from .errors import InputError
+from numpy import asarray, exp, inf, isfinite, array
+from numpy.random import default_rng
+from scipy.optimize import minimize
+from concurrent.futures import ProcessPoolExecutor
+
+
+# the parameters of each imaginary part and their default bounds
+imag_params = {'folded': ('n_i',), 'ws': ('w0', 'r_w', 'a_w'), None: ()}
+default_bounds = {'n_r': (0.1, 3.0), 'n_i': (0.0, 3.0), 'w0': (0.0, 200.0),
+                  'r_w': (0.5, 2.0), 'a_w': (0.1, 1.5)}
+
+
+class ElasticFit:
+    """
+    The chi^2 of the elastic cross sections as a fast function of N_R and
+    the parameters of the imaginary part (see the module docstring).
+    u_nuc, u_coul: the folded potentials, see elastic
+    theta, y, dy : the measured c.m. angles (degrees), cross sections and errors
+    observable   : 'ratio' (to Rutherford / Mott) or 'dsigma' (mb/sr) for y
+    The Numerov mesh, the potentials on it and the Coulomb functions are
+    calculated here once, each evaluation solves only the radial equations.
+    """
+    def __init__(self, e_lab, a_proj, a_targ, z_proj, z_targ, u_nuc, theta, y, dy, u_coul=None,
+                 imag='folded', observable='ratio', identical=False, r_match=None, h=None, l_max=None):
+        if imag not in imag_params:
+            raise InputError(f"unknown imag '{imag}': use 'folded', 'ws' or None")
+        if observable not in ('ratio', 'dsigma'):
+            raise InputError(f"unknown observable '{observable}': use 'ratio' or 'dsigma'")
+        self.theta = asarray(theta, dtype=float)
+        self.y = asarray(y, dtype=float)
+        self.dy = asarray(dy, dtype=float)
+        if not self.theta.shape == self.y.shape == self.dy.shape or (self.dy <= 0).any():
+            raise InputError('theta, y and dy must have the same length and dy must be positive')
+        self.imag = imag
+        self.names = ('n_r',) + imag_params[imag]
+        self.observable = observable
+        self.identical = identical
+
+        self.e_cm, mu, self.k, self.eta = kinematics(e_lab, a_proj, a_targ, z_proj, z_targ)
+        self.r_w0 = a_proj ** (1 / 3) + a_targ ** (1 / 3)
+        nuc = as_potential(u_nuc)
+        r_match = nuc.R_max if r_match is None else r_match
+        self.R, self.L, self.n1, self.n2, self.fg = channel(self.k, self.eta, r_match, h, l_max)
+        self.sigma = coulomb_phases(self.eta, self.L[-1])
+
+        # 2 mu / hbar^2 of the fixed parts on the Numerov mesh
+        c = 2 * mu / hbc / hbc
+        self.v_nuc = c * nuc(self.R)
+        if u_coul is None:
+            self.v_coul = c * z_proj * z_targ * e2 / self.R
+        else:
+            self.v_coul = c * as_potential(u_coul, nuc.R, tail='coulomb')(self.R)
+        self.c = c
+        self.best = None
+        self.n_calls = 0
+
+    def v(self, params):
+        """
+        2 mu U(R) / hbar^2 of the parameters {name: value}.
+        """
+        v = params['n_r'] * self.v_nuc + self.v_coul + 0j
+        if self.imag == 'folded':
+            v = v + 1j * params['n_i'] * self.v_nuc
+        elif self.imag == 'ws':
+            R_w = params['r_w'] * self.r_w0
+            v = v - 1j * self.c * params['w0'] / (1 + exp((self.R - R_w) / params['a_w']))
+        return v
+
+    def evaluate(self, params, theta=None):
+        """
+        The elastic scattering of the parameters, see elastic.
+        """
+        theta = self.theta if theta is None else asarray(theta, dtype=float)
+        S = s_matrix(self.v(params), self.R, self.L, self.k * self.k, self.n1, self.n2, self.fg)
+        dsigma, ratio = cross_sections(S, self.sigma, self.k, self.eta, theta, self.identical)
+        return {'L': self.L, 'S': S, 'sigma': self.sigma, 'theta': theta, 'dsigma': dsigma,
+                'ratio': ratio, 'sigma_r': reaction_cross_section(S, self.k), 'k': self.k,
+                'eta': self.eta, 'e_cm': self.e_cm}
+
+    def chi2(self, params):
+        self.n_calls += 1
+        try:
+            S = s_matrix(self.v(params), self.R, self.L, self.k * self.k, self.n1, self.n2, self.fg)
+        except InputError:
+            return inf
+        dsigma, ratio = cross_sections(S, self.sigma, self.k, self.eta, self.theta, self.identical)
+        return chi2(ratio if self.observable == 'ratio' else dsigma, self.y, self.dy)
+
+    def objective(self, free, fixed=None):
+        """
+        Returns f(x) = chi2 of the free parameters x (in the order of free),
+        the others are taken from fixed, e.g. for scipy.optimize.
+        """
+        fixed = {} if fixed is None else dict(fixed)
+        def f(x):
+            params = dict(fixed)
+            params.update(zip(free, x))
+            return self.chi2(params)
+        return f
+
+    def fit(self, start=None, fixed=(), bounds=None, method='L-BFGS-B', starts=1, workers=None,
+            seed=None, options=None):
+        """
+        Minimises chi2.
+        start  : {name: value} of all parameters, the last best fit
+                 (or 1 for all) by default
+        fixed  : the names of the parameters kept at their start values
+        bounds : {name: (lo, hi)}, see default_bounds
+        method : a method of scipy.optimize.minimize
+        starts : the number of starting points, the others are random within the bounds
+        workers: the number of processes for starts > 1, None: in this process
+
+        Returns
+        -------
+        dict
+            ``params`` (best), ``chi2``, ``result`` (OptimizeResult of the best start)
+            and ``results`` (of all starts)
+        """
+        if start is None:
+            start = dict(self.best['params']) if self.best is not None else {}
+        start = {name: start.get(name, 1.0) for name in self.names}
+        unknown = set(fixed) - set(self.names)
+        if unknown:
+            raise InputError(f'unknown parameters {sorted(unknown)}: the parameters are {self.names}')
+        free = [name for name in self.names if name not in fixed]
+        if not free:
+            raise InputError('there is no free parameter')
+        bounds = {**default_bounds, **({} if bounds is None else bounds)}
+        limits = [bounds[name] for name in free]
+
+        x0 = [array([start[name] for name in free])]
+        rng = default_rng(seed)
+        for i in range(starts - 1):
+            x0.append(array([rng.uniform(lo, hi) for lo, hi in limits]))
+        fixed_values = {name: start[name] for name in fixed}
+        jobs = [(self, free, fixed_values, x, limits, method, options) for x in x0]
+
+        if workers is None or starts == 1:
+            results = [_minimize(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_minimize, *zip(*jobs)))
+
+        finite = [result for result in results if isfinite(result.fun)]
+        if not finite:
+            raise InputError('chi2 is not finite at any start')
+        result = min(finite, key=lambda result: result.fun)
+        values = dict(fixed_values)
+        values.update(zip(free, result.x))
+        params = {name: float(values[name]) for name in self.names}
+        self.best = {'params': params, 'chi2': float(result.fun), 'result': result, 'results': results}
+        return self.best
+
+
+def _minimize(fit, free, fixed, x0, limits, method, options):
+    # a module function, it runs in the worker processes
+    bounded = method in ('L-BFGS-B', 'TNC', 'SLSQP', 'Powell', 'Nelder-Mead', 'trust-constr')
+    return minimize(fit.objective(free, fixed), x0, method=method,
+                    bounds=limits if bounded else None, options=options)
@@ -0,0 +1,1001 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module calculates the double folding potentials.
+The integrals are calculated by a quadrature backend, see backends.py.
+The backend is chosen per call, e.g. backend='filon' or
+backend=MixedBackend('simpson', inverse='filon'), or per module,
+see bind_backend (simpson/simpson.py and filon/filon.py).
+"""
+
+from .constants import *
+from .matematik import *
+from .functions import *
+from .interactions import *
+from .backends import get_backend, ProgressBackend
+from .time_check import profiled, stage, count, track_arrays
+from .memory_check import estimate, dd_term_counts
+from .progress import as_progress
+from .errors import InputError, InteractionError, MeshError
+from .potential import attach_potential
+from scipy.special import erf
+from numpy import log, isfinite, diff, ndarray
+from functools import wraps
+
+# Coulomb potential energy of uniformly charged spheres
+@volumes
+@njit
+def u_coul_ucs(r, rc, z_proj, z_targ):
+    q2 = z_proj * z_targ * e2 # MeV.fm
+    r_in, r_out = r[r<rc], r[r>=rc] # fm
+    uc_in = (3 - r_in*r_in/rc/rc)/rc/2
+    uc_out = 1/r_out
+    return q2 * append(uc_in, uc_out) # MeV
+
+@profiled
+@attach_potential
+def u_coul_bifold_d(rho_p_ch_, rho_t_ch_, v_coul_, r, q, R=None, s=None, backend='simpson'):
+    # Direct part of Coulomb potential using folding integrals
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p_ch': rho_p_ch_, 'rho_t_ch': rho_t_ch_}, {'v_coul': v_coul_})
+
+    r_cou = mesh(r[0], 1.25 * r[-1], r[1] - r[0])
+    s_cou = mesh(s[0], 1.25 * s[-1], s[1] - s[0])
+
+    s_len = len(s)
+    s34 = int(.75 * s_len)
+    s_tail = s[s34:]
+
+    v_coul = v_coul_.copy()
+    rho_p_ch = rho_p_ch_.copy()
+    rho_t_ch = rho_t_ch_.copy()
+
+    # correction for the tail of Coulomb potential
+    z_p = rho_p_ch.info[0]['vol2']
+    z_t = rho_t_ch.info[0]['vol2']
+    u_tail = z_p * z_t * e2 / s_tail
+
+
+    v_coul.value = interp(s_cou, s, v_coul.value)
+    rho_p_ch.value = interp(r_cou, r, rho_p_ch.value)
+    rho_t_ch.value = interp(r_cou, r, rho_t_ch.value)
+
+    # actual integration happens here
+    u_coul_df_dict = u_bifold_d(rho_p_ch, rho_t_ch, v_coul, r_cou, q, R, s_cou, backend=backend)
+
+    # this is to fix integration errors on the tail part of the coulomb
+    # by rescaling folding coulomb to z_p * z_t * e2 * 1/r (analytical coulomb)
+    re_scale = u_tail[0]/u_coul_df_dict['func_r']['u_R'][s34]
+    u_coul_df_dict['func_r']['u_R'] = append(u_coul_df_dict['func_r']['u_R'][:s34]*re_scale, u_tail)
+    u_coul_df_dict['func_i']['u_R'][0]['name'] = 'u_coul_bifold_d'
+
+    return u_coul_df_dict
+
+@profiled
+@attach_potential
+def u_coul_bifold_q(rho_p_ch, rho_t_ch, r, q, R=None, s=None, backend='simpson'):
+    """
+    Direct part of Coulomb potential using folding in momentum space.
+
+    u(R) = 1/(2 pi^2) int rho_p(q) rho_t(q) 4 pi e^2/q^2 q^2 j_0(qR) dq
+
+    The long range part is taken from two Gaussian charge distributions
+    with the same total charges and the same mean square radii as the
+    folded densities. Their folding is known analytically,
+    z_p z_t e^2 erf(R/2/b)/R, and it gives the exact z_p z_t e^2/R tail.
+    Only the short range difference is integrated numerically, and it
+    vanishes like q^4 at small q. Therefore, neither an extended mesh
+    nor a rescaling of the tail is necessary.
+
+    func_q['u_R'] is the short range integrand that is transformed,
+    4 pi e^2 (rho_p(q) rho_t(q) - z_p z_t exp(-b^2 q^2)) / q^2, and
+    func_q['vnn'] is 4 pi e^2 / q^2 except at q ~ 0 where it is set to 0
+    (the q --> 0 part is in the analytic long range term).
+    """
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p_ch': rho_p_ch, 'rho_t_ch': rho_t_ch})
+
+    z_p = rho_p_ch.info[0]['vol2']
+    z_t = rho_t_ch.info[0]['vol2']
+    b2 = (rho_p_ch.info[0]['msr'] + rho_t_ch.info[0]['msr']) / 6
+
+    rho_pq = fourier_density(rho_p_ch, r, q, backend.fourier)
+    rho_tq = fourier_density(rho_t_ch, r, q, backend.fourier)
+    vnn_q = pi4 * e2 / (q * q)
+    vnn_q[q < 1e-6] = 0.0
+
+    # rho_p(q) rho_t(q) - z_p z_t exp(-b^2 q^2) ~ q^4 for q --> 0
+    u_q_short = (rho_pq * rho_tq - z_p * z_t * exp(-b2 * q * q)) / (q * q)
+    u_q_short[0] = f_0(q, u_q_short)
+    u_R_short = 2 * e2 / pi * backend.inverse(u_q_short, q, R)
+    u_q = pi4 * e2 * u_q_short
+    u_R = z_p * z_t * e2 * erf(R / sqrt(b2) / 2) / R + u_R_short
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+
+    v_coul = v_coulomb(s)
+    u_R_info = {'name':'u_coul_bifold_q', 'L':0, 'norm': None, 'renorm':1.0,
+                'vol2':u_R_vol2, 'vol4':u_R_vol4, 'msr':u_R_msr}
+    return {'func_i': {'u_R': [u_R_info], 'rho_p': rho_p_ch.info, 'rho_t': rho_t_ch.info, 'vnn': v_coul.info},
+            'func_r': {'u_R': u_R,        'rho_p': rho_p_ch(),    'rho_t': rho_t_ch(),    'vnn': v_coul()},
+            'func_q': {'u_R': u_q,        'rho_p': rho_pq,        'rho_t': rho_tq,        'vnn': vnn_q}}
+
+def vol_msr(R, u_R):
+    # u_R could be a stack of potentials (Nsamples x NR)
+    # R could be a non-uniform mesh, see mesh_gl
+    R2 = R*R
+    R4 = R2 * R2
+    u_R_vol2 = pi4 * integrate( u_R * R2, R)
+    u_R_vol4 = pi4 * integrate( u_R * R4, R)
+    u_R_msr  = u_R_vol4 / u_R_vol2
+    return u_R_vol2, u_R_vol4, u_R_msr
+
+def check_meshes(**meshes):
+    """
+    Raises MeshError unless each mesh is an increasing 1-D array
+    of at least 3 finite points >= 0, e.g. check_meshes(r=r, q=q).
+    """
+    for name, x in meshes.items():
+        if not isinstance(x, ndarray) or x.ndim != 1 or len(x) < 3:
+            raise MeshError(f'{name} must be a 1-D array of at least 3 points')
+        if not isfinite(x).all() or x[0] < 0 or (diff(x) <= 0).any():
+            raise MeshError(f'{name} must be an increasing mesh of finite points >= 0')
+
+def check_folding(r, q, R, s, densities, vnns=None, e_lab=None, a_proj=None, batch=False):
+    """
+    Validates the inputs of the folding potentials before the transforms.
+    densities: {name: density}, they must be on the r mesh, batch: stacks
+               of densities (Nsamples x Nr, see batch_params) are allowed
+    vnns     : {name: vnn}, the interactions on the s mesh
+    e_lab and a_proj are checked when they are given.
+    """
+    if e_lab is not None and (not e_lab > 0 or not a_proj > 0):
+        raise InputError(f'e_lab = {e_lab} and a_proj = {a_proj} must be positive')
+    vnns = {} if vnns is None else vnns
+    for name, rho in densities.items():
+        if not callable(rho) or not hasattr(rho, 'info'):
+            raise InputError(f'{name} must be a density function, e.g. f_2prm_fermi(r, ...)')
+    for name, vnn in vnns.items():
+        if not callable(vnn) or not hasattr(vnn, 'info'):
+            raise InputError(f'{name} must be an interaction function, e.g. v_m3y_reid_d(s)')
+    check_meshes(r=r, q=q, R=R, s=s)
+    for name, rho in densities.items():
+        shape = getattr(rho(), 'shape', ())
+        if batch and len(shape) == 2 and shape[1] == len(r):
+            continue
+        if len(shape) > 1 and not batch:
+            raise InputError(f'{name} is a stack of densities {shape}, it is not supported here: '
+                             'calculate the samples one by one')
+        if shape != r.shape:
+            raise InputError(f'{name} {shape} is not a density on the r mesh {r.shape}')
+    for name, vnn in vnns.items():
+        shape = getattr(vnn(), 'shape', ())
+        if shape != s.shape:
+            raise InputError(f'{name} {shape} is not an interaction on the s mesh {s.shape}')
+
+def check_xdm3yn(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name, vnn_name, batch=False, u_ex_iter=None):
+    """
+    Validates the inputs of the Xdm3yn potentials before the transforms,
+    see check_folding. u_ex_iter (the finite range exchange) must be a
+    positive integer.
+    Returns the parameters of dd_name - vnn_name (c, alpha, beta, gamma, n, K),
+    see v_xdm3yn_cabgn.
+    """
+    if vnn_name not in ('reid', 'paris'):
+        raise InteractionError(f"unknown vnn_name '{vnn_name}': use 'reid' or 'paris'")
+    c, a, b, g, n, K, implemented = v_xdm3yn_cabgn(dd_name=dd_name, vnn_name=vnn_name)
+    if not implemented:
+        raise InteractionError(f'{dd_name}_{vnn_name}: (C={c}, alpha={a}, beta={b}, gamma={g}, n={n}) is not implemented yet.')
+    # the density dependence is chosen by the name, see u_xdm3yn_d
+    dd_term_counts(dd_name)
+    if u_ex_iter is not None and (int(u_ex_iter) != u_ex_iter or u_ex_iter < 1):
+        raise InputError(f'u_ex_iter = {u_ex_iter} must be a positive integer')
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, e_lab=e_lab, a_proj=a_proj, batch=batch)
+    return c, a, b, g, n, K
+
+def check_coulomb(u_coul):
+    """
+    Raises InputError unless u_coul is u_coul_ucs() or u_coul_bifold_d/q().
+    """
+    if not (callable(u_coul) and hasattr(u_coul, 'info')) and not (isinstance(u_coul, dict) and 'func_r' in u_coul):
+        raise InputError("Please use 'u_coul_ucs()' or 'u_coul_bifold_d()' for Coulomb potential.")
+
+#..........................................................................#
+#******** Density Dependent M3Y - Reid/Paris [B/C/D-DM3Y: Xdm3yn] *********#
+#..........................................................................#
+@profiled
+@attach_potential
+def u_xdm3yn_fr(e_lab, a_proj, a_targ, rho_p, rho_t, u_coul, r, q, R=None, s=None, Cs=1 / 36, dd_name='bdm3y1', vnn_name='reid', u_ex_iter=8, q_tol=None, backend='simpson',
+                progress=None, cancel=None):
+    """
+    progress: callback(stage, fraction, eta) or Progress, e.g. print_progress
+    cancel  : CancelToken stopping the calculation with Cancelled, see progress.py
+    """
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    # the exchange part is checked before the direct part is calculated
+    check_xdm3yn(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name, vnn_name, u_ex_iter=u_ex_iter)
+    if not a_targ > 0:
+        raise InputError(f'a_targ = {a_targ} must be positive')
+    check_coulomb(u_coul)
+
+    # the direct and the exchange parts report in proportion to their estimated run times
+    progress = as_progress(progress, cancel)
+    parts = {'direct': None, 'exchange': None}
+    if progress is not None:
+        times = estimate(r, q, R, s, dd_name, 'fr', backend.name, u_ex_iter)['times']
+        parts = progress.stages({'direct': times['direct'], 'exchange': sum(times.values()) - times['direct']})
+
+    u_d  = u_xdm3yn_d(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name=dd_name, vnn_name=vnn_name, q_tol=q_tol, backend=backend,
+                      progress=parts['direct'])
+    u_ex = u_xdm3yn_ex_fr(e_lab, a_proj, a_targ, rho_p, rho_t, u_d['func_r']['u_R'], u_coul, r, q, R, s, Cs=Cs,
+                          dd_name=dd_name, vnn_name=vnn_name, u_ex_iter=u_ex_iter, q_tol=q_tol, backend=backend,
+                          progress=parts['exchange'])
+    u_R = u_d['func_r']['u_R'] + u_ex['func_r']['u_R']
+    u_R_vol2 = u_d['func_i']['u_R'][0]['vol2'] + u_ex['func_i']['u_R'][0]['vol2']
+    u_R_vol4 = u_d['func_i']['u_R'][0]['vol4'] + u_ex['func_i']['u_R'][0]['vol4']
+    u_R_msr = u_R_vol4/u_R_vol2
+    u_R_info = {'name': f'u_{dd_name}_{vnn_name}_fr', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr}
+
+    u_q = pi4 * backend.fourier(u_R, R, q)
+    return {'func_i': {'total': {'u_R': [u_R_info]}, 'direct': u_d['func_i'], 'exchange': u_ex['func_i']},
+            'func_r': {'total': {'u_R': u_R},        'direct': u_d['func_r'], 'exchange': u_ex['func_r']},
+            'func_q': {'total': {'u_R': u_q},        'direct': u_d['func_q'], 'exchange': u_ex['func_q']}}
+
+@profiled
+@attach_potential
+def u_xdm3yn_zr(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, dd_name='bdm3y1', vnn_name='reid', q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+
+    u_d  = u_xdm3yn_d(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name=dd_name, vnn_name=vnn_name, q_tol=q_tol, backend=backend)
+    u_ex = u_xdm3yn_ex_zr(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name=dd_name, vnn_name=vnn_name, q_tol=q_tol, backend=backend)
+    u_R = u_d['func_r']['u_R'] + u_ex['func_r']['u_R']
+    u_R_vol2 = u_d['func_i']['u_R'][0]['vol2'] + u_ex['func_i']['u_R'][0]['vol2']
+    u_R_vol4 = u_d['func_i']['u_R'][0]['vol4'] + u_ex['func_i']['u_R'][0]['vol4']
+    u_R_msr = u_R_vol4/u_R_vol2
+    u_R_info = {'name': f'u_{dd_name}_{vnn_name}_zr', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr}
+
+    u_q = pi4 * backend.fourier(u_R, R, q)
+    return {'func_i': {'total': {'u_R': [u_R_info]}, 'direct': u_d['func_i'], 'exchange': u_ex['func_i']},
+            'func_r': {'total': {'u_R': u_R},        'direct': u_d['func_r'], 'exchange': u_ex['func_r']},
+            'func_q': {'total': {'u_R': u_q},        'direct': u_d['func_q'], 'exchange': u_ex['func_q']}}
+
+
+@profiled
+@attach_potential
+def u_xdm3yn_d(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, dd_name='bdm3y1', vnn_name='reid', q_tol=None, backend='simpson',
+               progress=None, cancel=None):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+
+    c, a, b, g, n, K = check_xdm3yn(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name, vnn_name, batch=True)
+
+    if vnn_name == 'reid':
+        gE = 1 - 0.002 * e_lab/a_proj
+        vnn = v_m3y_reid_d(s)
+    else: # vnn_name == 'paris'
+        gE = 1 - 0.003 * e_lab / a_proj
+        vnn = v_m3y_paris_d(s)
+
+    # progress is reported (and cancel is checked) after each part
+    progress = as_progress(progress, cancel)
+    if progress is not None:
+        progress.update('direct', 0.0)
+        backend = ProgressBackend(backend, {'inverse': progress}, {'inverse': dd_term_counts(dd_name)[1]}, 'direct')
+
+    u_d_part1 = u_bifold_d(rho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+
+    if 'dim3y' in dd_name:
+        gE = None
+        u_d_part2 = 0
+        u_d_part3 = 0
+        u_d_part4 = 0
+        u_R = u_d_part1['func_r']['u_R']
+        u_q = u_d_part1['func_q']['u_R']
+    elif 'ddm3y' in dd_name:
+        frho_p_dd = f_rho_dd(r, rho_p, beta=b)
+        frho_t_dd = f_rho_dd(r, rho_t, beta=b)
+
+        u_d_part2 = u_bifold_d(frho_p_dd, frho_t_dd, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part3 = 0
+        u_d_part4 = 0
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] + a * u_d_part2['func_r']['u_R'])
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] + a * u_d_part2['func_q']['u_R'])
+    elif 'cdm3y' in dd_name:
+        frho_p_dd = f_rho_dd(r, rho_p, beta=b)
+        frho_t_dd = f_rho_dd(r, rho_t, beta=b)
+        frho_p_bd = f_rho_bd(r, rho_p, n=1)
+        frho_t_bd = f_rho_bd(r, rho_t, n=1)
+
+        u_d_part2 = u_bifold_d(frho_p_dd, frho_t_dd, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part3 = u_bifold_d(frho_p_bd, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_d(rho_p, frho_t_bd, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] + a * u_d_part2['func_r']['u_R'] -
+                        g*(u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] + a * u_d_part2['func_q']['u_R'] -
+                        g*(u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R']))
+    elif 'bdm3y1' in dd_name:
+        frho_p = f_rho_bd(r, rho_p, n=1)
+        frho_t = f_rho_bd(r, rho_t, n=1)
+
+        u_d_part2 = 0
+        u_d_part3 = u_bifold_d(frho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_d(rho_p, frho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] - g * (u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] - g * (u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R']))
+    elif 'bdm3y2' in dd_name:
+        frho_p1 = f_rho_bd(r, rho_p, n=1)
+        frho_t1 = f_rho_bd(r, rho_t, n=1)
+        frho_p2 = f_rho_bd(r, rho_p, n=2)
+        frho_t2 = f_rho_bd(r, rho_t, n=2)
+
+        u_d_part2 = 0
+        u_d_part3 = u_bifold_d(frho_p2, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_d(rho_p, frho_t2, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part5 = u_bifold_d(frho_p1, frho_t1, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] - g * (u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R'] + 2*u_d_part5['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] - g * (u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R'] + 2*u_d_part5['func_q']['u_R']))
+    elif 'bdm3y3' in dd_name:
+        frho_p1 = f_rho_bd(r, rho_p, n=1)
+        frho_t1 = f_rho_bd(r, rho_t, n=1)
+        frho_p2 = f_rho_bd(r, rho_p, n=2)
+        frho_t2 = f_rho_bd(r, rho_t, n=2)
+        frho_p3 = f_rho_bd(r, rho_p, n=3)
+        frho_t3 = f_rho_bd(r, rho_t, n=3)
+
+        u_d_part2 = 0
+        u_d_part3 = u_bifold_d(frho_p3, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_d(rho_p, frho_t3, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part5 = u_bifold_d(frho_p2, frho_t1, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part6 = u_bifold_d(frho_p1, frho_t2, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] - g * (u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R'] + 3*u_d_part5['func_r']['u_R'] + 3*u_d_part6['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] - g * (u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R'] + 3*u_d_part5['func_q']['u_R'] + 3*u_d_part6['func_q']['u_R']))
+    else:
+        raise InteractionError(f"unknown dd_name '{dd_name}'")
+
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+    u_R_info = {'name': f'u_{dd_name}_{vnn_name}_d', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr,
+                'c':c, 'alpha':a, 'beta':b, 'gamma':g, 'n':n, 'gE':gE}
+
+    if 'dim3y' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q']}}
+    elif 'ddm3y' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part2': u_d_part2['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part2': u_d_part2['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part2': u_d_part2['func_q']}}
+    elif 'cdm3y' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part2': u_d_part2['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part2': u_d_part2['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part2': u_d_part2['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q']}}
+    elif 'bdm3y1' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q']}}
+    elif 'bdm3y2' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i'], 'part5': u_d_part5['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r'], 'part5': u_d_part5['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q'], 'part5': u_d_part5['func_q']}}
+    elif 'bdm3y3' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i'], 'part5': u_d_part5['func_i'], 'part6': u_d_part6['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r'], 'part5': u_d_part5['func_r'], 'part6': u_d_part6['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q'], 'part5': u_d_part5['func_q'], 'part6': u_d_part6['func_q']}}
+
+
+@profiled
+@attach_potential
+def u_xdm3yn_ex_fr(e_lab, a_proj, a_targ, rho_p, rho_t, u_d, u_coul_dict, r, q, R=None, s=None,
+                   Cs=1/36, dd_name='bdm3y1', vnn_name='reid', u_ex_iter=8, q_tol=None, backend='simpson',
+                   progress=None, cancel=None):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+
+    # folded charge densities to obtain Coulomb
+    # or uniformly charged spheres to obtain Coulomb
+    check_coulomb(u_coul_dict)
+    if callable(u_coul_dict):
+        u_coul = u_coul_dict()
+        u_coul_info = u_coul_dict.info
+    else:
+        u_coul = u_coul_dict['func_r']['u_R']
+        u_coul_info = u_coul_dict['func_i']#['u_R']
+
+    c, a, b, g, n, K = check_xdm3yn(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name, vnn_name, u_ex_iter=u_ex_iter)
+
+    if vnn_name == 'reid':
+        gE = 1 - 0.002 * e_lab/a_proj
+        vnn = v_m3y_reid_ex_fr(s)
+    else: # vnn_name == 'paris'
+        gE = 1 - 0.003 * e_lab / a_proj
+        vnn = v_m3y_paris_ex_fr(s)
+
+    # progress is reported (and cancel is checked) after each fqs transform
+    # and after each R-block of gRs and u_ex, see ProgressBackend
+    progress = as_progress(progress, cancel)
+    if progress is not None:
+        progress.update('exchange', 0.0)
+        est = estimate(r, q, R, s, dd_name, 'fr', backend.name, u_ex_iter)
+        stages = progress.stages({op: est['times'][op] for op in ('fqs', 'gRs', 'u_ex')})
+        backend = ProgressBackend(backend, stages, est['counts'], 'exchange')
+
+    a_total = a_proj + a_targ
+    ecm = e_lab * a_targ / a_total
+    a_reduced = a_targ * a_proj / a_total
+
+    rho_p_name = rho_p.info[0]['name']
+    rho_t_name = rho_t.info[0]['name']
+    check_f_names = ['f_external', 'f_internet', 'f_ripl']
+
+    with stage('k_fermi'):
+        kf_p = k_fermi_spline(r, rho_p(), Cs=Cs) if any([ci in rho_p_name for ci in check_f_names]) else k_fermi(r, rho_p(), Cs=Cs)
+        kf_t = k_fermi_spline(r, rho_t(), Cs=Cs) if any([ci in rho_t_name for ci in check_f_names]) else k_fermi(r, rho_t(), Cs=Cs)
+
+    rho_pq = pi4 * backend.fourier(rho_p(), r, q)
+    rho_tq = pi4 * backend.fourier(rho_t(), r, q)
+    vnn_q  = pi4 * backend.fourier(vnn(), s, q)
+
+    # fqs and gRs are calculated up to q[nq - 1], see q_cutoff
+    # vnn is folded in s space, so only the densities (fqs at s = 0) bound dFqs
+    nq = len(q) if q_tol is None else q_cutoff(q, rho_pq * rho_tq, q_tol)
+    q_ex = q[:nq]
+
+    fa = pi4 * backend.fqs(rho_p(), r, kf_p(), s, q_ex)
+    fA = pi4 * backend.fqs(rho_t(), r, kf_t(), s, q_ex)
+
+    if 'dim3y' in dd_name:
+        gE = None
+        dFqs = fa * fA
+    elif 'ddm3y' in dd_name:
+        frho_p_dd = f_rho_dd(r, rho_p, beta=b)
+        frho_t_dd = f_rho_dd(r, rho_t, beta=b)
+
+        fa_exp = pi4 * backend.fqs(frho_p_dd(), r, kf_p(), s, q_ex)
+        fA_exp = pi4 * backend.fqs(frho_t_dd(), r, kf_t(), s, q_ex)
+
+        dFqs = fa * fA + a * (fa_exp * fA_exp)
+    elif 'cdm3y' in dd_name:
+        frho_p_dd = f_rho_dd(r, rho_p, beta=b)
+        frho_t_dd = f_rho_dd(r, rho_t, beta=b)
+        frho_p_bd = f_rho_bd(r, rho_p, n=1)
+        frho_t_bd = f_rho_bd(r, rho_t, n=1)
+        fa_exp = pi4 * backend.fqs(frho_p_dd(), r, kf_p(), s, q_ex)
+        fA_exp = pi4 * backend.fqs(frho_t_dd(), r, kf_t(), s, q_ex)
+        fa2 = pi4 * backend.fqs(frho_p_bd(), r, kf_p(), s, q_ex)
+        fA2 = pi4 * backend.fqs(frho_t_bd(), r, kf_t(), s, q_ex)
+        dFqs = fa * fA + a * (fa_exp * fA_exp) - g* (fa2 * fA + fa * fA2)
+    elif 'bdm3y1' in dd_name:
+        frho_p_bd = f_rho_bd(r, rho_p, n=1)
+        frho_t_bd = f_rho_bd(r, rho_t, n=1)
+        fa2 = pi4 * backend.fqs(frho_p_bd(), r, kf_p(), s, q_ex)
+        fA2 = pi4 * backend.fqs(frho_t_bd(), r, kf_t(), s, q_ex)
+
+        dFqs = fa * fA - g * (fa2 * fA + fa * fA2)
+    elif 'bdm3y2' in dd_name:
+        frho_p_bd1 = f_rho_bd(r, rho_p, n=1)
+        frho_t_bd1 = f_rho_bd(r, rho_t, n=1)
+        frho_p_bd2 = f_rho_bd(r, rho_p, n=2)
+        frho_t_bd2 = f_rho_bd(r, rho_t, n=2)
+
+        fa2 = pi4 * backend.fqs(frho_p_bd1(), r, kf_p(), s, q_ex)
+        fA2 = pi4 * backend.fqs(frho_t_bd1(), r, kf_t(), s, q_ex)
+        fa3 = pi4 * backend.fqs(frho_p_bd2(), r, kf_p(), s, q_ex)
+        fA3 = pi4 * backend.fqs(frho_t_bd2(), r, kf_t(), s, q_ex)
+
+        dFqs = fa * fA - g * (fa3 * fA + 2*fa2*fA2 + fa * fA3)
+    elif 'bdm3y3' in dd_name:
+        frho_p_bd1 = f_rho_bd(r, rho_p, n=1)
+        frho_t_bd1 = f_rho_bd(r, rho_t, n=1)
+        frho_p_bd2 = f_rho_bd(r, rho_p, n=2)
+        frho_t_bd2 = f_rho_bd(r, rho_t, n=2)
+        frho_p_bd3 = f_rho_bd(r, rho_p, n=3)
+        frho_t_bd3 = f_rho_bd(r, rho_t, n=3)
+
+        fa2 = pi4 * backend.fqs(frho_p_bd1(), r, kf_p(), s, q_ex)
+        fA2 = pi4 * backend.fqs(frho_t_bd1(), r, kf_t(), s, q_ex)
+        fa3 = pi4 * backend.fqs(frho_p_bd2(), r, kf_p(), s, q_ex)
+        fA3 = pi4 * backend.fqs(frho_t_bd2(), r, kf_t(), s, q_ex)
+        fa4 = pi4 * backend.fqs(frho_p_bd3(), r, kf_p(), s, q_ex)
+        fA4 = pi4 * backend.fqs(frho_t_bd3(), r, kf_t(), s, q_ex)
+
+        dFqs = fa * fA - g * (fa4 * fA + 3*fa3*fA2 + 3*fa2*fA3 + fa * fA4)
+    else:
+        raise InteractionError(f"unknown dd_name '{dd_name}'")
+
+    dGRs = pi2_inv * backend.gRs(dFqs, R, s, q_ex)
+    track_arrays(dFqs=dFqs, dGRs=dGRs)
+
+    u_nuc = u_coul + u_d
+    u_ex = 0
+    for i in range(u_ex_iter):
+        count('k_local_iterations')
+        k2_local_mom_direct = 2 * mu_c2 * a_reduced / hbc / hbc * (ecm - (u_nuc + u_ex))
+        # abs is not exist in original definition
+        # it is here for keep k_local real valued!
+        k_local = sqrt( abs(k2_local_mom_direct) ) / a_reduced
+        if c==None:
+            # density independent finite range exchange potential
+            u_ex = pi4 * backend.u_ex(dGRs, k_local, vnn(), R, s)
+        else:
+            u_ex = c * gE * pi4 * backend.u_ex(dGRs, k_local, vnn(), R, s)
+
+    u_R = u_ex
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+    u_R_info = {'name': f'u_{dd_name}_{vnn_name}_ex_fr', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr,
+                'c':c, 'alpha':a, 'beta':b, 'gamma':g, 'n':n, 'gE':gE, 'q_max': q[nq - 1]}
+
+    u_q = pi4 * backend.fourier(u_R, R, q)
+    kf_pq = pi4 * backend.fourier(kf_p(), r, q)
+    kf_tq = pi4 * backend.fourier(kf_t(), r, q)
+
+    return {'func_i': {'u_R': [u_R_info], 'rho_p':rho_p.info, 'rho_t':rho_t.info,
+                       'vnn':vnn.info,    'kf_p': kf_p.info,  'kf_t': kf_t.info, 'u_coul': u_coul_info},
+            'func_r': {'u_R': u_R,        'rho_p':rho_p(),    'rho_t':rho_t(),
+                       'vnn':vnn(),       'kf_p': kf_p(),     'kf_t': kf_t(),    'u_coul': u_coul},
+            'func_q': {'u_R': u_q, 'rho_p': rho_pq, 'rho_t': rho_tq, 'vnn': vnn_q, 'kf_p': kf_pq, 'kf_t': kf_tq}}
+
+@profiled
+@attach_potential
+def u_xdm3yn_ex_zr(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, dd_name='bdm3y1', vnn_name='reid', q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+
+    c, a, b, g, n, K = check_xdm3yn(e_lab, a_proj, rho_p, rho_t, r, q, R, s, dd_name, vnn_name, batch=True)
+
+    if vnn_name == 'reid':
+        gE = 1 - 0.002 * e_lab/a_proj
+        vnn = v_m3y_reid_ex_zr(s, e_lab, a_proj, L=0)
+    else: # vnn_name == 'paris'
+        gE = 1 - 0.003 * e_lab / a_proj
+        vnn = v_m3y_paris_ex_zr(s, e_lab, a_proj, L=0)
+
+
+    u_d_part1 = u_bifold_ex_zr(rho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+
+    if 'dim3y' in dd_name:
+        gE = None
+        u_d_part2 = 0
+        u_d_part3 = 0
+        u_d_part4 = 0
+        u_R = u_d_part1['func_r']['u_R']
+        u_q = u_d_part1['func_q']['u_R']
+    elif 'ddm3y' in dd_name:
+        frho_p_dd = f_rho_dd(r, rho_p, beta=b)
+        frho_t_dd = f_rho_dd(r, rho_t, beta=b)
+        u_d_part2 = u_bifold_ex_zr(frho_p_dd, frho_t_dd, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part3 = 0
+        u_d_part4 = 0
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] + a * u_d_part2['func_r']['u_R'])
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] + a * u_d_part2['func_q']['u_R'])
+    elif 'cdm3y' in dd_name:
+        frho_p_dd = f_rho_dd(r, rho_p, beta=b)
+        frho_t_dd = f_rho_dd(r, rho_t, beta=b)
+        frho_p_bd = f_rho_bd(r, rho_p, n=1)
+        frho_t_bd = f_rho_bd(r, rho_t, n=1)
+
+        u_d_part2 = u_bifold_ex_zr(frho_p_dd, frho_t_dd, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part3 = u_bifold_ex_zr(frho_p_bd, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_ex_zr(rho_p, frho_t_bd, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] + a * u_d_part2['func_r']['u_R'] -
+                        g*(u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] + a * u_d_part2['func_q']['u_R'] -
+                        g*(u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R']))
+    elif 'bdm3y1' in dd_name:
+        frho_p = f_rho_bd(r, rho_p, n=1)
+        frho_t = f_rho_bd(r, rho_t, n=1)
+
+        u_d_part2 = 0
+        u_d_part3 = u_bifold_ex_zr(frho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_ex_zr(rho_p, frho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] - g * (u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] - g * (u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R']))
+    elif 'bdm3y2' in dd_name:
+        frho_p1 = f_rho_bd(r, rho_p, n=1)
+        frho_t1 = f_rho_bd(r, rho_t, n=1)
+        frho_p2 = f_rho_bd(r, rho_p, n=2)
+        frho_t2 = f_rho_bd(r, rho_t, n=2)
+
+        u_d_part2 = 0
+        u_d_part3 = u_bifold_ex_zr(frho_p2, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_ex_zr(rho_p, frho_t2, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part5 = u_bifold_ex_zr(frho_p1, frho_t1, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] - g * (u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R'] + 2*u_d_part5['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] - g * (u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R'] + 2*u_d_part5['func_q']['u_R']))
+    elif 'bdm3y3' in dd_name:
+        frho_p1 = f_rho_bd(r, rho_p, n=1)
+        frho_t1 = f_rho_bd(r, rho_t, n=1)
+        frho_p2 = f_rho_bd(r, rho_p, n=2)
+        frho_t2 = f_rho_bd(r, rho_t, n=2)
+        frho_p3 = f_rho_bd(r, rho_p, n=3)
+        frho_t3 = f_rho_bd(r, rho_t, n=3)
+
+        u_d_part2 = 0
+        u_d_part3 = u_bifold_ex_zr(frho_p3, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part4 = u_bifold_ex_zr(rho_p, frho_t3, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part5 = u_bifold_ex_zr(frho_p2, frho_t1, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_d_part6 = u_bifold_ex_zr(frho_p1, frho_t2, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+        u_R = c*gE * (u_d_part1['func_r']['u_R'] - g * (u_d_part3['func_r']['u_R'] + u_d_part4['func_r']['u_R'] + 3*u_d_part5['func_r']['u_R'] + 3*u_d_part6['func_r']['u_R']))
+        u_q = c*gE * (u_d_part1['func_q']['u_R'] - g * (u_d_part3['func_q']['u_R'] + u_d_part4['func_q']['u_R'] + 3*u_d_part5['func_q']['u_R'] + 3*u_d_part6['func_q']['u_R']))
+
+    else:
+        raise InteractionError(f"unknown dd_name '{dd_name}'")
+
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+    u_R_info = {'name': f'u_{dd_name}_{vnn_name}_ex_zr', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr,
+                'c':c, 'alpha':a, 'beta':b, 'gamma':g, 'n':n, 'gE':gE}
+    if 'dim3y' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q']}}
+    elif 'ddm3y' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part2': u_d_part2['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part2': u_d_part2['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part2': u_d_part2['func_q']}}
+    elif 'cdm3y' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part2': u_d_part2['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part2': u_d_part2['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part2': u_d_part2['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q']}}
+    elif 'bdm3y1' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q']}}
+    elif 'bdm3y2' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i'], 'part5': u_d_part5['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r'], 'part5': u_d_part5['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q'], 'part5': u_d_part5['func_q']}}
+    elif 'bdm3y3' in dd_name:
+        return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part3': u_d_part3['func_i'], 'part4': u_d_part4['func_i'], 'part5': u_d_part5['func_i'], 'part6': u_d_part6['func_i']},
+                'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part3': u_d_part3['func_r'], 'part4': u_d_part4['func_r'], 'part5': u_d_part5['func_r'], 'part6': u_d_part6['func_r']},
+                'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part3': u_d_part3['func_q'], 'part4': u_d_part4['func_q'], 'part5': u_d_part5['func_q'], 'part6': u_d_part6['func_q']}}
+
+
+#### LOCAL FERMI MOMENTUM
+@volumes
+def k_fermi(r, f, Cs=1/36):
+    """Calculates local momentum of 'f' function.
+    """
+    if (f > 0).all():
+        # the derivatives of ln(f) keep the relative precision
+        # of the derivatives at the tail of f, e.g. ln(f) of a
+        # Gaussian density is differentiated exactly
+        ln_f = log(f)
+        dln_f = f_der1(r, ln_f)
+        df = f * dln_f
+        ddf = f * (f_der2(r, ln_f) + dln_f * dln_f)
+    else:
+        df = f_der1(r, f)
+        ddf = f_der2(r, f)
+    return _k_fermi(r, f, df, ddf, Cs)
+
+@njit
+def _k_fermi(r, f, df, ddf, Cs):
+    kf1 = power(3*pi_sqr/2 * f, 2/3)
+    kf2_num = 5*Cs*power(df, 2)
+    kf2_denom = 3*power(f, 2)
+    kf3_num = 5*ddf
+    kf3_denom = 36*f
+
+    kf_sqr = kf1 + kf2_num/kf2_denom +  kf3_num/kf3_denom
+    kf = sqrt(kf_sqr)
+    return kf
+
+@volumes
+def k_fermi_spline(r, f, Cs=1/36):
+    """Calculates local momentum when 'f' functions is one oft the 'f_external', 'f_internet' and 'f_ripl' functions.
+    Spline is necessary to smooth the derivatives of the 'f' function.
+    The density and its derivatives are taken from one quintic spline (see f_spline_fit).
+    """
+    f_fit = f_spline_fit(r, f, k=5)
+    return _k_fermi(r, f_fit(r), f_fit(r, 1), f_fit(r, 2), Cs)
+#..........................................................................#
+#******** Density Dependent M3Y - Reid/Paris [B/C/D-DM3Y: Xdm3yn] *********#
+#..........................................................................#
+
+
+#..........................................................................#
+#****************** Density Dependent M3Y - Reid [DDM3Y] ******************#
+#..........................................................................#
+@profiled
+@attach_potential
+def u_ddm3y_reid_zr(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, e_lab=e_lab, a_proj=a_proj, batch=True)
+
+    u_d = u_ddm3y_reid_d(e_lab, a_proj, rho_p, rho_t, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_ex = u_ddm3y_reid_ex_zr(e_lab, a_proj, rho_p, rho_t, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_R = u_d['func_r']['u_R'] + u_ex['func_r']['u_R']
+    u_q = u_d['func_q']['u_R'] + u_ex['func_q']['u_R']
+    u_R_vol2 = u_d['func_i']['u_R'][0]['vol2'] + u_ex['func_i']['u_R'][0]['vol2']
+    u_R_vol4 = u_d['func_i']['u_R'][0]['vol4'] + u_ex['func_i']['u_R'][0]['vol4']
+    u_R_msr = u_R_vol4/u_R_vol2
+    u_R_info = {'name': 'u_ddm3y_reid_zr', 'L': 0, 'norm': None, 'renorm': 1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr}
+
+    return {'func_i': {'total': {'u_R': [u_R_info]}, 'direct': u_d['func_i'], 'exchange': u_ex['func_i']},
+            'func_r': {'total': {'u_R': u_R},        'direct': u_d['func_r'], 'exchange': u_ex['func_r']},
+            'func_q': {'total': {'u_R': u_q},        'direct': u_d['func_q'], 'exchange': u_ex['func_q']}}
+
+
+@profiled
+@attach_potential
+def u_ddm3y_reid_d(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, e_lab=e_lab, a_proj=a_proj, batch=True)
+
+    # DDM3Y zero range direct part
+    # DDM3Y energy dependent parameters
+    c, a, b = v_ddm3y_reid_cab(e_lab, a_proj)
+
+    frho_p = f_rho_dd(r, rho_p, beta=b)
+    frho_t = f_rho_dd(r, rho_t, beta=b)
+    vnn = v_m3y_reid_d(s)
+
+    u_d_part1 = u_bifold_d(rho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_d_part2 = u_bifold_d(frho_p, frho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+
+    u_R = c*u_d_part1['func_r']['u_R'] + c*a*u_d_part2['func_r']['u_R']
+    u_q = c*u_d_part1['func_q']['u_R'] + c*a*u_d_part2['func_q']['u_R']
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+    u_R_info = {'name': 'u_ddm3y_reid_d', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr,
+                'c':c, 'alpha':a, 'beta':b}
+
+    return {'func_i': {'u_R': [u_R_info], 'part1': u_d_part1['func_i'], 'part2': u_d_part2['func_i']},
+            'func_r': {'u_R': u_R,        'part1': u_d_part1['func_r'], 'part2': u_d_part2['func_r']},
+            'func_q': {'u_R': u_q,        'part1': u_d_part1['func_q'], 'part2': u_d_part2['func_q']}}
+
+
+@profiled
+@attach_potential
+def u_ddm3y_reid_ex_zr(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, e_lab=e_lab, a_proj=a_proj, batch=True)
+
+    # DDM3Y zero range exchange part
+    # DDM3Y energy dependent parameters
+    c, a, b = v_ddm3y_reid_cab(e_lab, a_proj)
+
+    frho_p = f_rho_dd(r, rho_p, beta=b)
+    frho_t = f_rho_dd(r, rho_t, beta=b)
+    vnn = v_m3y_reid_ex_zr(r,e_lab, a_proj)
+
+    u_e_part1 = u_bifold_ex_zr(rho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_e_part2 = u_bifold_ex_zr(frho_p, frho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+
+    u_R = c*u_e_part1['func_r']['u_R'] + c*a*u_e_part2['func_r']['u_R']
+    u_q = c*u_e_part1['func_q']['u_R'] + c*a*u_e_part2['func_q']['u_R']
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+    u_R_info = {'name': 'u_ddm3y_reid_ex_zr', 'L': 0, 'norm': None, 'renorm':1.0,
+                'vol2': u_R_vol2, 'vol4': u_R_vol4, 'msr': u_R_msr,
+                'c':c, 'alpha':a, 'beta':b}
+    return {'func_i': {'u_R': [u_R_info], 'part1': u_e_part1['func_i'], 'part2': u_e_part2['func_i']},
+            'func_r': {'u_R': u_R,        'part1': u_e_part1['func_r'], 'part2': u_e_part2['func_r']},
+            'func_q': {'u_R': u_q,        'part1': u_e_part1['func_q'], 'part2': u_e_part2['func_q']}}
+#..........................................................................#
+#****************** Density Dependent M3Y - Reid [DDM3Y] ******************#
+#..........................................................................#
+
+
+#..........................................................................#
+#****************** Density Independent M3Y - Reid/Paris ******************#
+#..........................................................................#
+@profiled
+@attach_potential
+def u_m3y_reid_zr(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+    
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, e_lab=e_lab, a_proj=a_proj, batch=True)
+
+    vnn_d = v_m3y_reid_d(s)
+    vnn_ex = v_m3y_reid_ex_zr(r, e_lab, a_proj, L=0)
+    u_m3y_zr_dict = u_bifold_zr(rho_p, rho_t, vnn_d, vnn_ex, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_m3y_zr_dict['func_i']['total']['u_R'][0]['name'] = 'u_m3y_reid_zr'
+    return u_m3y_zr_dict
+
+@profiled
+@attach_potential
+def u_m3y_paris_zr(e_lab, a_proj, rho_p, rho_t, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, e_lab=e_lab, a_proj=a_proj, batch=True)
+
+    vnn_d = v_m3y_paris_d(s)
+    vnn_ex = v_m3y_paris_ex_zr(r, e_lab, a_proj, L=0)
+    u_m3y_zr_dict = u_bifold_zr(rho_p, rho_t, vnn_d, vnn_ex, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_m3y_zr_dict['func_i']['total']['u_R'][0]['name'] = 'u_m3y_paris_zr'
+    return u_m3y_zr_dict
+
+
+@profiled
+@attach_potential
+def u_bifold_zr(rho_p, rho_t, vnn_d, vnn_ex, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, {'vnn_d': vnn_d}, batch=True)
+
+    u_d_dict = u_bifold_d(rho_p, rho_t, vnn_d, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_ex_zr_dict = u_bifold_ex_zr(rho_p, rho_t, vnn_ex, r, q, R, s, q_tol=q_tol, backend=backend)
+    u_R = u_d_dict['func_r']['u_R'] + u_ex_zr_dict['func_r']['u_R']
+    u_q = u_d_dict['func_q']['u_R'] + u_ex_zr_dict['func_q']['u_R']
+    u_R_vol2 = u_d_dict['func_i']['u_R'][0]['vol2'] + u_ex_zr_dict['func_i']['u_R'][0]['vol2']
+    u_R_vol4 = u_d_dict['func_i']['u_R'][0]['vol4'] + u_ex_zr_dict['func_i']['u_R'][0]['vol4']
+    u_R_msr = u_R_vol4/u_R_vol2
+    u_R_info = {'name':'u_bifold_zr', 'L':0, 'norm': None, 'renorm':1.0,
+                'vol2':u_R_vol2, 'vol4':u_R_vol4, 'msr':u_R_msr}
+    return {'func_i': {'total': {'u_R': [u_R_info]}, 'direct': u_d_dict['func_i'], 'exchange': u_ex_zr_dict['func_i']},
+            'func_r': {'total': {'u_R': u_R},        'direct': u_d_dict['func_r'], 'exchange': u_ex_zr_dict['func_r']},
+            'func_q': {'total': {'u_R': u_q},        'direct': u_d_dict['func_q'], 'exchange': u_ex_zr_dict['func_q']}}
+
+@profiled
+@attach_potential
+def u_bifold_d(rho_p, rho_t, vnn, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, {'vnn': vnn}, batch=True)
+
+    rho_pq = fourier_density(rho_p, r, q, backend.fourier)
+    rho_tq = fourier_density(rho_t, r, q, backend.fourier)
+    vnn_q  = pi4 * backend.fourier(vnn(), s, q)
+
+    u_q = rho_pq * rho_tq * vnn_q
+    # u_q is negligible beyond q[nq - 1] for q_tol, see q_cutoff
+    nq = len(q) if q_tol is None else q_cutoff(q, u_q, q_tol)
+    u_R = pi2_inv * backend.inverse(u_q[..., :nq], q[:nq], R)
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+
+    u_R_info = {'name':'u_direct', 'L':0, 'norm': None, 'renorm':1.0,
+                'vol2':u_R_vol2, 'vol4':u_R_vol4, 'msr':u_R_msr, 'q_max': q[nq - 1]}
+    return {'func_i': {'u_R': [u_R_info], 'rho_p': rho_p.info, 'rho_t': rho_t.info, 'vnn': vnn.info},
+            'func_r': {'u_R': u_R,        'rho_p': rho_p(),    'rho_t': rho_t(),    'vnn': vnn()},
+            'func_q': {'u_R': u_q,        'rho_p': rho_pq,     'rho_t': rho_tq,     'vnn': vnn_q}}
+
+
+@profiled
+@attach_potential
+def du_bifold_d(rho_p, rho_t, vnn, r, q, d_rho_p=None, d_rho_t=None, R=None, s=None, q_tol=None,
+                backend='simpson'):
+    """
+    u_bifold_d and its derivatives with respect to the density parameters.
+    d_rho_p, d_rho_t: density_derivatives(...) of rho_p and rho_t, or None
+
+    The folding is linear in each density, so the transforms of the
+    derivatives of one density are multiplied by the (cached) transforms
+    of the other density and vnn. All the derivatives take one batched
+    Fourier and one batched inverse transform.
+
+    result['jacobian']: ``names`` [('rho_p', 'V0'), ...], ``du_R`` (Nparams x NR)
+    and ``du_q`` (Nparams x Nq)
+    """
+    R = r.copy() if R is None else R
+    u = u_bifold_d(rho_p, rho_t, vnn, r, q, R, s, q_tol=q_tol, backend=backend)
+    backend = get_backend(backend)
+    func_q = u['func_q']
+    nq = int((q <= u['func_i']['u_R'][0]['q_max']).sum())
+
+    names, d_rho, partner = [], [], []
+    for name, d, rho_q in (('rho_p', d_rho_p, func_q['rho_t']), ('rho_t', d_rho_t, func_q['rho_p'])):
+        if d is None:
+            continue
+        names += [(name, parameter) for parameter in d['names']]
+        d_rho.append(d['d_rho'])
+        partner += [rho_q] * len(d['names'])
+    if not names:
+        raise InputError('there are no derivatives: give d_rho_p and/or d_rho_t')
+
+    with stage('fourier'):
+        d_rho_q = pi4 * backend.fourier(concatenate(d_rho), r, q)
+    du_q = d_rho_q * array(partner) * func_q['vnn']
+    with stage('inverse'):
+        du_R = pi2_inv * backend.inverse(du_q[:, :nq], q[:nq], R)
+    u['jacobian'] = {'names': names, 'du_R': du_R, 'du_q': du_q}
+    return u
+
+
+@profiled
+@attach_potential
+def u_bifold_ex_zr(rho_p, rho_t, vnn, r, q, R=None, s=None, q_tol=None, backend='simpson'):
+
+    R = r.copy() if R is None else R
+    s = r.copy() if s is None else s
+    backend = get_backend(backend)
+    check_folding(r, q, R, s, {'rho_p': rho_p, 'rho_t': rho_t}, batch=True)
+    # the zero range vnn is a constant (J00), it is not on the s mesh
+    if not callable(vnn) or not hasattr(vnn, 'info'):
+        raise InputError('vnn must be an interaction function, e.g. v_m3y_reid_ex_zr(s, e_lab, a_proj)')
+
+    rho_pq = fourier_density(rho_p, r, q, backend.fourier)
+    rho_tq = fourier_density(rho_t, r, q, backend.fourier)
+    vnn_q  = vnn()[0] + 0*q
+
+    u_q = rho_pq * rho_tq * vnn_q
+    # u_q is negligible beyond q[nq - 1] for q_tol, see q_cutoff
+    nq = len(q) if q_tol is None else q_cutoff(q, u_q, q_tol)
+    u_R = pi2_inv * backend.inverse(u_q[..., :nq], q[:nq], R)
+    u_R_vol2, u_R_vol4, u_R_msr = vol_msr(R, u_R)
+
+    u_R_info = {'name':'u_exchange_zr', 'L':0, 'norm': None, 'renorm':1.0,
+                'vol2':u_R_vol2, 'vol4':u_R_vol4, 'msr':u_R_msr, 'q_max': q[nq - 1]}
+    return {'func_i': {'u_R': [u_R_info], 'rho_p': rho_p.info, 'rho_t': rho_t.info, 'vnn': vnn.info},
+            'func_r': {'u_R': u_R,        'rho_p': rho_p(),    'rho_t': rho_t(),    'vnn': vnn()},
+            'func_q': {'u_R': u_q,        'rho_p': rho_pq,     'rho_t': rho_tq,     'vnn': vnn_q}}
+#..........................................................................#
+#****************** Density Independent M3Y - Reid/Paris ******************#
+#..........................................................................#
+
+
+# the folding functions that take a backend
+backend_functions = ['u_coul_bifold_d', 'u_coul_bifold_q', 'u_xdm3yn_fr', 'u_xdm3yn_zr', 'u_xdm3yn_d',
+                     'u_xdm3yn_ex_fr', 'u_xdm3yn_ex_zr', 'u_ddm3y_reid_zr', 'u_ddm3y_reid_d',
+                     'u_ddm3y_reid_ex_zr', 'u_m3y_reid_zr', 'u_m3y_paris_zr', 'u_bifold_zr',
+                     'u_bifold_d', 'du_bifold_d', 'u_bifold_ex_zr']
+
+def with_backend(func, backend):
+    """
+    Returns func using backend by default, backend= still works per call.
+    """
+    @wraps(func)
+    def func_backend(*args, **kwargs):
+        kwargs.setdefault('backend', backend)
+        return func(*args, **kwargs)
+    return func_backend
+
+def bind_backend(namespace, backend):
+    """
+    Binds the folding functions in namespace (e.g. globals() of a module)
+    to backend, e.g. bind_backend(globals(), 'filon').
+    """
+    for name in backend_functions:
+        namespace[name] = with_backend(globals()[name], backend)
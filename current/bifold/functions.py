@@ -18,11 +18,14 @@
 """
 This module provides the necessary functions for structure and reactions.
 """
-from .simpson.integrals import simpson
+from .simpson.integrals import simpson, simpson_batch, integrate
+from .matematik import is_uniform
 from .constants import *
+from .errors import DataFormatError, InputError
 
 from numpy import (exp, loadtxt, interp, arange, append, array,
-                   power, ndarray)
+                   power, ndarray, asarray, cos, sinc,
+                   ndim, broadcast_arrays)
 from io import StringIO
 
 from html.parser import HTMLParser
@@ -61,14 +64,16 @@ def _strip_once(value):
     return s.get_data()
 
 def volumes_int(r, f, norm=None, L=0, name='', **kwargs):
+    # f could be a stack of functions (Nf x Nr), see batch_params
+    # r could be a non-uniform mesh, see mesh_gl
     rL2 = power(r, L + 2)
     integrand2 = f * rL2
     integrand4 = integrand2 * rL2
-    vol2 = pi4 * simpson(integrand2, r)
-    vol4 = pi4 * simpson(integrand4, r)
+    vol2 = pi4 * integrate(integrand2, r)
+    vol4 = pi4 * integrate(integrand4, r)
     msr = vol4/vol2
 
-    if norm == None:
+    if norm is None:
         renorm = 1.0
     elif L == 0:
         renorm = norm / vol2
@@ -105,8 +110,14 @@ def volumes(func):
         r = list(args)[0]
         fr = func(*args, **kwargs)
 
-        if func_name!= 'f_dirac_delta':
+        # r[0] ~ 0 correction is needed only for the uniform meshes
+        # the non-uniform meshes (see mesh_gl) do not include r = 0
+        if func_name == 'f_dirac_delta' or not is_uniform(r):
+            pass
+        elif fr.ndim == 1:
             fr = append(f_0(r, fr), fr[1:])
+        else:
+            fr = append(f_0(r, fr.T).reshape(-1, 1), fr[:, 1:], axis=1)
 
         kkeys = kwargs.keys()
         #norm = None if not 'norm' in (kkeys:=kwargs.keys()) else kwargs['norm']
@@ -130,12 +141,37 @@ def volumes(func):
             fv = volumes_int(r, fr, norm=norm, L=L, name=func_name)
 
 
-        fr *= fv['renorm']
+        fr *= fv['renorm'] if fr.ndim == 1 else asarray(fv['renorm']).reshape(-1, 1)
         return keep_info([fr, [fv]])
     return inner
 
 
+def batch_params(*params):
+    """
+    Broadcasts the parameters of a function to column vectors (Nsamples x 1)
+    if any of them is an array, so f(r, *params) gives a stack of
+    functions (Nsamples x Nr). Scalar parameters are returned unchanged.
+    """
+    if all(ndim(p) == 0 for p in params):
+        return params
+    return [p.reshape(-1, 1) for p in broadcast_arrays(*[asarray(p, dtype=float) for p in params])]
+
+
+def fourier_density(f, r, q, fourier):
+    """
+    Calculates 4 pi int f(r) j_0(qr) r^2 dr using the analytic Fourier
+    transform of f if it is known (e.g. f_sog) otherwise using the
+    numerical "fourier" function (fourier_with_simpson, fourier_with_filon).
+    """
+    if f.fq is not None:
+        return f.fq(q)
+    return pi4 * fourier(f(), r, q)
+
+
 class keep_info:
+    # analytic Fourier transform q -> 4 pi int f(r) j_0(qr) r^2 dr, if it is known
+    fq = None
+
     def __init__(self, value):
         if isinstance(value, int) or isinstance(value, float) or isinstance(value, ndarray):
             self.value = value
@@ -215,7 +251,9 @@ class keep_info:
             return False
 
     def copy(self):
-        return keep_info((self.value, [*self.info]))
+        f_copy = keep_info((self.value, [*self.info]))
+        f_copy.fq = self.fq
+        return f_copy
         
     def pinfo(self):
         """prints info"""
@@ -274,11 +312,15 @@ def f_2prm_fermi(r, V0, R, a, **kwargs):
     R  : radius or turning point
     a  : diffuseness
 
+    Parameters could be arrays (Nsamples) to obtain a (Nsamples x Nr)
+    stack of functions, each row is normalised separately (see batch_params).
+
     Returns
     -------
     float
         ``f`` values
     """
+    V0, R, a = batch_params(V0, R, a)
     return V0/(1 + exp((r-R)/a))
 
 @volumes
@@ -294,11 +336,15 @@ def f_3prm_fermi(r, V0, w, R, a, **kwargs):
     a  : diffuseness
     w  : mostly defines shape of interior region
 
+    Parameters could be arrays (Nsamples) to obtain a (Nsamples x Nr)
+    stack of functions, each row is normalised separately (see batch_params).
+
     Returns
     -------
     float
         ``f`` values
     """
+    V0, w, R, a = batch_params(V0, w, R, a)
     return  (1 + w*r*r) * V0/(1 + exp((r-R)/a))
 
 @volumes
@@ -312,11 +358,15 @@ def f_2prm_gaussian(r, V0, a, **kwargs):
     V0 : depth or strength
     a  : diffuseness
 
+    Parameters could be arrays (Nsamples) to obtain a (Nsamples x Nr)
+    stack of functions, each row is normalised separately (see batch_params).
+
     Returns
     -------
     float
         ``f`` values
     """
+    V0, a = batch_params(V0, a)
     ra = r/a
     return V0*exp(-ra*ra)
 
@@ -332,29 +382,170 @@ def f_3prm_gaussian(r, V0, w, a, **kwargs):
     a  : diffuseness
     w  : mostly defines shape of interior region
 
+    Parameters could be arrays (Nsamples) to obtain a (Nsamples x Nr)
+    stack of functions, each row is normalised separately (see batch_params).
+
     Returns
     -------
     float
         ``f`` values
     """
+    V0, w, a = batch_params(V0, w, a)
     ra = r/a
     return (1 + w*r*r) * V0*exp(-ra*ra)
 
-@volumes
-def f_sog(r, Ris, Qis, RP, Ze=1, **kwargs):
-    # ATOMIC DATA AND NUCLEAR DATA TABLES 36,495536 (1987)
-    # H.DE VRIES, C.W.DE JAGER, and C.DE VRIES
-    # Sum-of-Gaussians
+def d_f_2prm_fermi(r, V0, R, a):
+    """Derivatives of f_2prm_fermi with respect to V0, R and a (3 x Nr)."""
+    f1 = 1/(1 + exp((r-R)/a))
+    # e/(1 + e)^2 = f1 (1 - f1), e = exp((r-R)/a)
+    df1 = f1*(1 - f1)/a
+    return array([f1, V0*df1, V0*df1*(r-R)/a])
+
+def d_f_3prm_fermi(r, V0, w, R, a):
+    """Derivatives of f_3prm_fermi with respect to V0, w, R and a (4 x Nr)."""
+    dV0, dR, da = d_f_2prm_fermi(r, V0, R, a)
+    wr2 = 1 + w*r*r
+    return array([wr2*dV0, r*r*V0*dV0, wr2*dR, wr2*da])
+
+def d_f_2prm_gaussian(r, V0, a):
+    """Derivatives of f_2prm_gaussian with respect to V0 and a (2 x Nr)."""
+    ra = r/a
+    g = exp(-ra*ra)
+    return array([g, 2*V0*g*ra*ra/a])
+
+def d_f_3prm_gaussian(r, V0, w, a):
+    """Derivatives of f_3prm_gaussian with respect to V0, w and a (3 x Nr)."""
+    dV0, da = d_f_2prm_gaussian(r, V0, a)
+    wr2 = 1 + w*r*r
+    return array([wr2*dV0, r*r*V0*dV0, wr2*da])
+
+# the analytic derivatives of the density functions and their parameters
+d_functions = {f_2prm_fermi: (d_f_2prm_fermi, ('V0', 'R', 'a')),
+               f_3prm_fermi: (d_f_3prm_fermi, ('V0', 'w', 'R', 'a')),
+               f_2prm_gaussian: (d_f_2prm_gaussian, ('V0', 'a')),
+               f_3prm_gaussian: (d_f_3prm_gaussian, ('V0', 'w', 'a'))}
+
+def density_derivatives(func, r, *params, norm=None, L=0):
+    """
+    Derivatives of the density func(r, *params, norm=norm, L=L) with respect
+    to its parameters, e.g. density_derivatives(f_2prm_fermi, r, 0.169, 3.60, 0.523).
+    A normalised density (norm) keeps its norm, so its V0 derivative is zero.
+    The parameters are scalars.
+
+    Returns
+    -------
+    dict
+        ``names`` of the parameters and ``d_rho`` (Nparams x Nr)
+    """
+    if func not in d_functions:
+        raise InputError('analytic derivatives are known only for f_2prm_fermi, f_3prm_fermi, '
+                         'f_2prm_gaussian and f_3prm_gaussian')
+    d_func, names = d_functions[func]
+    if any(ndim(p) > 0 for p in params):
+        raise InputError('density_derivatives takes scalar parameters')
+
+    d_rho = d_func(r, *params)
+    # the same r ~ 0 correction as the density, see volumes
+    if is_uniform(r):
+        d_rho = append(f_0(r, d_rho.T).reshape(-1, 1), d_rho[:, 1:], axis=1)
+    if norm is not None:
+        # rho = norm g / I(g): d rho = renorm (dg - g I(dg) / I(g))
+        g = func(r, *params)()
+        vol_g = volumes_int(r, g, L=L)['vol2']
+        vol_d = volumes_int(r, d_rho, L=L)['vol2']
+        renorm = volumes_int(r, g, norm=norm, L=L)['renorm']
+        d_rho = renorm*(d_rho - g*(vol_d/vol_g).reshape(-1, 1))
+    return {'names': names, 'd_rho': d_rho}
+
+def f_sog(r, Ris, Qis, RP, Ze=1, norm=None, L=0, **kwargs):
+    """Calculates the Sum-of-Gaussians (SOG) charge density
+    :math:`\rho(r) = Z_e \sum_i A_i (\exp{-((r-R_i)/\gamma)^2} + \exp{-((r+R_i)/\gamma)^2})`.
+
+    All the terms are evaluated at once. vol2 and vol4 are calculated
+    analytically (for L = 0) and the analytic Fourier transform is
+    attached to the result, see f_sog_q().
+
+    Parameters
+    ----------
+    r   : f(r)
+    Ris : positions of the Gaussians
+    Qis : charge fractions of the Gaussians
+    RP  : rms radius of the Gaussians
+    Ze  : total charge
+
+    Returns
+    -------
+    keep_info
+        ``f`` values
+
+    Reference:
+    ATOMIC DATA AND NUCLEAR DATA TABLES 36,495536 (1987)
+    H.DE VRIES, C.W.DE JAGER, and C.DE VRIES
+    """
     gamma = sqrt(2/3) * RP
     gamma2 = gamma * gamma
     gamma3 = gamma2 * gamma
-    rho_sog = 0
-    for  Ri, Qi in zip(Ris, Qis):
-        Ai =  Qi/ (pi2_32 * gamma3 * (1 + 2* Ri * Ri/gamma2))
-        r_m = (r - Ri) / gamma
-        r_p = (r + Ri) / gamma
-        rho_sog += Ai * (exp(-r_m * r_m) + exp(-r_p * r_p))
-    return Ze * rho_sog
+    Ri = asarray(Ris, dtype=float).reshape(-1, 1)
+    Qi = asarray(Qis, dtype=float)
+
+    Ai = Qi / (pi2_32 * gamma3 * (1 + 2 * Ri[:, 0] * Ri[:, 0] / gamma2))
+    r_m = (r - Ri) / gamma
+    r_p = (r + Ri) / gamma
+    fr = Ze * (Ai @ (exp(-r_m * r_m) + exp(-r_p * r_p)))
+
+    if L == 0:
+        vol2, vol4 = sog_volumes(Ris, Qis, RP, Ze=Ze)
+        renorm = 1.0 if norm is None else norm / vol2
+        fv = {'name': 'f_sog', 'L': L, 'norm': norm, 'renorm': renorm,
+              'vol2': vol2 * renorm, 'vol4': vol4 * renorm, 'msr': vol4 / vol2}
+    else:
+        fv = volumes_int(r, fr, norm=norm, L=L, name='f_sog')
+
+    fr *= fv['renorm']
+    f_sog_info = keep_info([fr, [fv]])
+    f_sog_info.fq = lambda q: fv['renorm'] * f_sog_q(q, Ris, Qis, RP, Ze=Ze)
+    return f_sog_info
+
+def sog_volumes(Ris, Qis, RP, Ze=1):
+    """Calculates vol2 and vol4 of the Sum-of-Gaussians density analytically.
+    :math:`vol2 = 4 \pi \int \rho r^2 dr = Z_e \sum_i Q_i`
+    :math:`vol4 = 4 \pi \int \rho r^4 dr =
+    Z_e \sum_i Q_i \frac{R_i^4 + 3 R_i^2 \gamma^2 + 3 \gamma^4/4}{R_i^2 + \gamma^2/2}`
+
+    Returns
+    -------
+    float, float
+        ``vol2``, ``vol4``
+    """
+    gamma = sqrt(2/3) * RP
+    gamma2 = gamma * gamma
+    Ri2 = asarray(Ris, dtype=float) ** 2
+    Qi = asarray(Qis, dtype=float)
+
+    vol2 = Ze * Qi.sum()
+    vol4 = Ze * (Qi * (Ri2 * Ri2 + 3 * Ri2 * gamma2 + 0.75 * gamma2 * gamma2) / (Ri2 + gamma2 / 2)).sum()
+    return float(vol2), float(vol4)
+
+def f_sog_q(q, Ris, Qis, RP, Ze=1):
+    """Calculates the Fourier transform of the Sum-of-Gaussians density
+    :math:`\rho(q) = 4 \pi \int \rho(r) j_0(q r) r^2 dr`
+    :math:`= Z_e \exp{(-q^2 \gamma^2/4)} \sum_i \frac{Q_i}{1 + 2 R_i^2/\gamma^2}
+    (\cos{q R_i} + \frac{2 R_i^2}{\gamma^2} \frac{\sin{q R_i}}{q R_i})`.
+
+    Returns
+    -------
+    array
+        ``f`` values in momentum space
+    """
+    gamma = sqrt(2/3) * RP
+    gamma2 = gamma * gamma
+    Ri = asarray(Ris, dtype=float)
+    Qi = asarray(Qis, dtype=float)
+    qRi = q.reshape(-1, 1) * Ri
+
+    ci = 2 * Ri * Ri / gamma2
+    fq_terms = (cos(qRi) + ci * sinc(qRi / pi)) @ (Qi / (1 + ci))
+    return Ze * exp(-q * q * gamma2 / 4) * fq_terms
 
 @volumes
 def f_rho_dd(r, rho, **kwargs):
@@ -420,8 +611,16 @@ def f_external(r, external_data, norm=None, L=0, data_format=0, msg=False):
         e_data = external_data[e_name]
         external_data = e_name
     else:
-        print('improper data in \'f_external()\': use a file or a dict with the correct format')
-        quit()
+        raise DataFormatError('improper data in \'f_external()\': use a file or a dict with the correct format')
+
+    data_format_msgs = {
+        0: '\thorizontal:\tr\tf(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tr\tf(r)\n\t|\t|\n\tV\tV',
+        1: '\thorizontal:\tdr\tr0\tf(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tdr\n\tr0\n\tf(r)\n\t|\n\tV',
+        2: '\thorizontal:\tn\tdr\tr0\tf(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tn\n\tdr\n\tr0\n\tf(r)\n\t|\n\tV',
+        3: '\thorizontal:\tr\tfn(r)\tfp(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tr\tfn(r)\tfp(r)\n\t|\t|\t\t|\n\tV\tV\t\tV'}
+    if data_format not in data_format_msgs:
+        raise DataFormatError(f'unrecognized data format for: {external_data}')
+    data_format_msg = data_format_msgs[data_format]
 
     try:
         file = array([])
@@ -430,12 +629,8 @@ def f_external(r, external_data, norm=None, L=0, data_format=0, msg=False):
                 file = append(file, loadtxt(StringIO(e_i)))
 
         if data_format == 0:
-            data_format_msg = \
-                '\thorizontal:\tr\tf(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tr\tf(r)\n\t|\t|\n\tV\tV'
             f_interp = interp(r, file[::2], file[1::2])
         elif data_format == 1:
-            data_format_msg = \
-                '\thorizontal:\tdr\tr0\tf(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tdr\n\tr0\n\tf(r)\n\t|\n\tV'
             dr, r0 = file[:2]
             fr_file = file[2:]
             r_file = arange(r0, r0 + len(fr_file)*dr, dr)
@@ -443,22 +638,14 @@ def f_external(r, external_data, norm=None, L=0, data_format=0, msg=False):
             if int(dr)>0:
                 raise ValueError
         elif data_format == 2:
-            data_format_msg = \
-                '\thorizontal:\tn\tdr\tr0\tf(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tn\n\tdr\n\tr0\n\tf(r)\n\t|\n\tV'
             n, dr, r0 = file[:3]
             r_file = arange(r0, r0 + n*dr, dr)
             f_interp = interp(r, r_file, file[3:])
         elif data_format == 3:
-            data_format_msg = \
-                '\thorizontal:\tr\tfn(r)\tfp(r) --> \n\n\t-- OR --\n\n\tvertical:\n\tr\tfn(r)\tfp(r)\n\t|\t|\t\t|\n\tV\tV\t\tV'
             f_interp = interp(r, file[::3], file[1::3] + file[2::3])
-        else:
-            print(f'unrecognized data format for: {external_data}')
-            quit()
     except ValueError:
-        print(f'check data format for: {external_data}')
-        print(f'correct format must be:\n\t# title (optional)\n{data_format_msg} \nfor data_format = {data_format}.')
-        quit()
+        raise DataFormatError(f'check data format for: {external_data}\n'
+                              f'correct format must be:\n\t# title (optional)\n{data_format_msg} \nfor data_format = {data_format}.')
 
     if msg==True:
         print(f'\nbe sure the correct format used for {external_data}:')
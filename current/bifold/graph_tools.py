@@ -21,6 +21,8 @@ This module contains the plot tools for BiFold.
 
 from matplotlib import pyplot as plt
 from random import randint
+from .errors import PotentialError
+from .print_tools import check_printable
 
 LINE_STYLES = ['solid', 'dashed', 'dashdot', 'dotted']
 COLORS = 'krbgcmy'
@@ -482,24 +484,20 @@ def plot_all(u, r, q, R=None, s=None, title=''):
     And, if a file name given to "file" variable all output will be written to the file.
     '''
 
+    check_printable(u)
     if title!='':
         print_title(title=title, omit=omit)
 
-    QUIT = False
     try:
         name = u['func_i']['u_R'][0]['name']
     except KeyError:
         name = u['func_i']['total']['u_R'][0]['name']
 
-    if name in ['u_direct', 'u_exchange_zr']:
+    if name in ['u_direct', 'u_exchange_zr', 'u_coul_bifold_d', 'u_coul_bifold_q']:
         plot_bifold(u, r, q, R=R, s=s)
     elif name in ['u_bifold_zr', 'u_m3y_reid_zr', 'u_m3y_paris_zr']:
         plot_bifold_di(u, r, q, R=R, s=s)
     elif 'dim3y' in name or 'ddm3y' in name or 'bdm3y' in name or 'cdm3y' in name:
         plot_bifold_dd(u, r, q, R=R, s=s)
     else:
-        print(f'Something went wrong while printing! {name} is undefined.')
-        QUIT = True
-
-    if QUIT:
-        quit()
+        raise PotentialError(f'Something went wrong while plotting! {name} is undefined.')
@@ -20,6 +20,7 @@ This module contains the interactions.
 """
 
 from .functions import *
+from .errors import EnergyRangeError, InteractionError
 from numpy import polyval, array
 
 @volumes
@@ -184,8 +185,7 @@ def v_ddm3y_reid_cab(e_lab, a_proj):
 
     ea = e_lab/a_proj
     if  not 2.5<ea<90.5:
-        print(f'e_lab/a_proj ={ea:9.4f} MeV/nucleon must be between 2.5 MeV - 90.5 MeV per nucleon')
-        quit()
+        raise EnergyRangeError(f'e_lab/a_proj ={ea:9.4f} MeV/nucleon must be between 2.5 MeV - 90.5 MeV per nucleon')
     return polyval(poly_c, ea), polyval(poly_alpha, ea), polyval(poly_beta, ea)
 #..........................................................................#
 #****************** Density Dependent M3Y - Reid [DDM3Y] ******************#
@@ -228,6 +228,10 @@ def v_xdm3yn_cabgn(dd_name='bdm3y1', vnn_name='reid'):
             'cdm3y5': (0.2728, 3.7367, 1.8294, 3.0,  1,   241,    True),
             'cdm3y6': (0.2658, 3.8033, 1.4099, 4.0,  1,   252,    True)
         }}
+    if vnn_name not in params_dict:
+        raise InteractionError(f"unknown vnn_name '{vnn_name}': use one of {list(params_dict)}")
+    if dd_name not in params_dict[vnn_name]:
+        raise InteractionError(f"'{dd_name}' is undefined for {vnn_name}: use one of {list(params_dict[vnn_name])}")
     return params_dict[vnn_name][dd_name]
 #..........................................................................#
 #******** Density Dependent M3Y - Reid/Paris [B/C/D-DM3Y: Xdm3yn] *********#
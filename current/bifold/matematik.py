@@ -21,9 +21,68 @@ reaction calculations.
 """
 
 from numpy import (sin, cos, arange, append, array,
-                   sqrt, power, interp, polyval)
+                   sqrt, power, interp, polyval, zeros,
+                   tan, arctan, sinh, cosh, maximum, pi,
+                   full, concatenate, ndarray, asarray,
+                   ascontiguousarray, array_equal)
+from numpy.polynomial.legendre import leggauss
 from scipy.interpolate import make_interp_spline as spline
+from scipy.sparse import coo_matrix
 from numba import njit
+from collections import OrderedDict
+from hashlib import blake2b
+from .errors import MeshError
+
+
+class LRUCache(OrderedDict):
+    """
+    A dict keeping only the maxsize most recently used entries,
+    e.g. the cached kernels and splines of the meshes.
+    """
+    def __init__(self, maxsize=32):
+        super().__init__()
+        self._maxsize = maxsize
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        self._maxsize = maxsize
+        self.trim()
+
+    def trim(self):
+        while len(self) > self._maxsize:
+            self.popitem(last=False)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        self.trim()
+
+def array_key(*arrays):
+    """
+    A short hash of the arrays (shapes, types and values) to be used as a cache key.
+    """
+    h = blake2b(digest_size=16)
+    for a in arrays:
+        a = ascontiguousarray(a)
+        h.update(f'{a.shape}{a.dtype}'.encode())
+        h.update(a)
+    return h.hexdigest()
+
+# the kernel matrices of the transforms for each pair of meshes, shared by
+# filon_kernel and the kernel backends, kernel_cache.maxsize sets the limit
+kernel_cache = LRUCache(16)
 
 
 def mesh(r_min, r_max, dr):
@@ -35,42 +94,481 @@ def mesh(r_min, r_max, dr):
         r_space = arange(r_min, r_max + 2*dr, dr)
     return r_space
 
+class Mesh(ndarray):
+    """
+    A non-uniform mesh carrying its quadrature: the weights w, the points
+    t in [-1, 1] and their weights wt (see mesh_gl, mesh_cc and with_weights).
+    The quadrature is kept by the copies and the pickles of the mesh
+    (e.g. a mesh sent to a worker process), the results of the
+    calculations with the mesh are plain arrays.
+    """
+    def __new__(cls, points, quad):
+        obj = asarray(points, dtype=float).view(cls)
+        quad['r'] = array(obj, copy=True).view(ndarray)
+        obj.quad = quad
+        return obj
+
+    def __array_finalize__(self, obj):
+        self.quad = getattr(obj, 'quad', None)
+
+    def __array_wrap__(self, arr, context=None, return_scalar=False):
+        arr = arr.view(ndarray)
+        return arr[()] if return_scalar else arr
+
+    def __reduce__(self):
+        rebuild, args, state = super().__reduce__()
+        return rebuild, args, (state, self.quad)
+
+    def __setstate__(self, state):
+        state, self.quad = state
+        super().__setstate__(state)
+
+# quadratures of the plain array copies of the meshes (e.g. asarray(mesh)), see mesh_quad
+_mesh_quads = LRUCache(64)
+
+def mesh_quad(r):
+    """
+    Returns the quadrature of a mesh created by mesh_gl, mesh_cc or
+    with_weights (see Mesh), None for the other meshes.
+    """
+    quad = getattr(r, 'quad', None)
+    if quad is not None and quad['r'].shape == r.shape and array_equal(quad['r'], r):
+        return quad
+    if is_uniform(r):
+        return None
+    return _mesh_quads.get(array_key(r))
+
+def _new_mesh(points, quad):
+    r = Mesh(points, quad)
+    _mesh_quads[array_key(r)] = quad
+    return r
+
+def with_weights(r, w=None):
+    """
+    Returns the non-uniform mesh r with the quadrature weights w,
+    the composite Simpson weights (see simpson_weights_nonuniform) by
+    default, which integrate from r[0] to r[-1].
+    """
+    r = asarray(r, dtype=float)
+    w = simpson_weights_nonuniform(r) if w is None else asarray(w, dtype=float)
+    if w.shape != r.shape:
+        raise MeshError(f'{len(w)} weights for {len(r)} mesh points')
+    return _new_mesh(r, {'w': w})
+
+def mesh_gl(r_min, r_max, n, mapping='linear', scale=None):
+    """
+    mesh_gl: creates a non-uniform mesh with n Gauss-Legendre points
+    between r_min and r_max. The end points are not included.
+
+    The Gauss-Legendre points t in (-1, 1) are mapped using u = (t + 1)/2:
+    mapping == 'linear': r = r_min + (r_max - r_min) u
+    mapping == 'tan'   : r = r_min + (r_max - r_min) tan(scale u)/tan(scale),  0 < scale < pi/2 [default 1.2]
+    mapping == 'sinh'  : r = r_min + (r_max - r_min) sinh(scale u)/sinh(scale), scale > 0      [default 2.0]
+    'tan' and 'sinh' put more points at small r.
+
+    The quadrature weights are carried by the mesh (see Mesh),
+    so that all the integrations and transforms use them, see mesh_weights().
+    """
+    t, wt = leggauss(n)
+    u = (t + 1) / 2
+    length = r_max - r_min
+
+    if mapping == 'linear':
+        r_space = r_min + length * u
+        dr_du = length + 0 * u
+    elif mapping == 'tan':
+        scale = 1.2 if scale is None else scale
+        r_space = r_min + length * tan(scale * u) / tan(scale)
+        dr_du = length * scale / tan(scale) / cos(scale * u)**2
+    elif mapping == 'sinh':
+        scale = 2.0 if scale is None else scale
+        r_space = r_min + length * sinh(scale * u) / sinh(scale)
+        dr_du = length * scale * cosh(scale * u) / sinh(scale)
+    else:
+        raise MeshError(f"unknown mapping '{mapping}' for mesh_gl: use 'linear', 'tan' or 'sinh'")
+
+    return _new_mesh(r_space, {'w': wt / 2 * dr_du, 't': t, 'wt': wt})
+
+def mesh_cc(r_min, r_max, n):
+    """
+    mesh_cc: creates a non-uniform mesh with n Clenshaw-Curtis (Chebyshev
+    extreme) points between r_min and r_max, the end points are included.
+    n should be odd, so that every other point is also a Clenshaw-Curtis
+    mesh (see integrate_cc for the error estimate).
+
+    The quadrature weights are carried by the mesh (see Mesh),
+    so that all the integrations and transforms use them, see mesh_weights().
+    """
+    t, wt = cc_weights(n)
+    r_space = r_min + (r_max - r_min) * (t + 1) / 2
+
+    # barycentric weights of the Chebyshev extreme points
+    lam = (-1.0) ** arange(n)
+    lam[0], lam[-1] = lam[0] / 2, lam[-1] / 2
+
+    return _new_mesh(r_space, {'w': wt * (r_max - r_min) / 2, 't': t, 'wt': wt, 'lam': lam})
+
+def cc_weights(n):
+    """
+    Clenshaw-Curtis points t (ascending) and weights in [-1, 1] for n points.
+    """
+    N = n - 1
+    j = arange(n)
+    t = -cos(j * pi / N)
+    wt = zeros(n)
+    for k in range(1, N // 2 + 1):
+        b = 1.0 if 2 * k == N else 2.0
+        wt += b / (4 * k * k - 1) * cos(2 * k * j * pi / N)
+    wt = (1 - wt) * 2 / N
+    wt[0], wt[-1] = wt[0] / 2, wt[-1] / 2
+    return t, wt
+
+def mesh_weights(r):
+    """
+    Returns the quadrature weights of the r mesh: int f dr = sum(w * f)
+    Simpson 1/3 weights for a uniform mesh (see mesh()),
+    Gauss-Legendre weights for a mesh created by mesh_gl(),
+    Clenshaw-Curtis weights for a mesh created by mesh_cc(),
+    the given weights for a mesh created by with_weights().
+    Other non-uniform meshes raise MeshError: their weights are not known
+    (e.g. the Gauss-Legendre meshes exclude the end points).
+    """
+    quad = mesh_quad(r)
+    if quad is not None:
+        return quad['w']
+    if is_uniform(r):
+        return simpson_weights(r)
+    raise MeshError('the quadrature weights of the non-uniform mesh are not known: '
+                    'create it with mesh_gl, mesh_cc or with_weights')
+
+def q_cutoff(q, f_q, tol=1e-6):
+    """
+    Returns the number of q points to keep: beyond them |f_q| stays
+    below tol * max|f_q|, e.g. f_q = rho_pq * rho_tq * vnn_q.
+    The number is odd, so the truncated uniform mesh q[:n] can be
+    used by Simpson and Filon rules. Non-uniform meshes are not truncated.
+    f_q can be stacked (Nsamples x Nq), the envelope of all samples is used.
+    """
+    nq = len(q)
+    if not is_uniform(q):
+        return nq
+    f_abs = abs(array(f_q)).reshape(-1, nq).max(axis=0)
+    # envelope from the end: the largest |f_q| at q and beyond
+    f_env = maximum.accumulate(f_abs[::-1])[::-1]
+    n = int((f_env > tol * f_env[0]).sum()) + 1
+    n = max(n + (n + 1) % 2, 3)
+    return min(n, nq)
+
+def mesh_gl_der(r):
+    """
+    Returns the first and second order differentiation matrices (D1, D2)
+    of a mesh created by mesh_gl() or mesh_cc(), otherwise None.
+
+    f(r(t)) is differentiated as a polynomial of the Gauss-Legendre
+    (Clenshaw-Curtis) points t (barycentric Lagrange interpolation) and then
+    df/dr = f_t / r_t and d^2f/dr^2 = (f_tt - f_r r_tt) / r_t^2.
+    """
+    gl = mesh_quad(r)
+    if gl is None or 't' not in gl:
+        return None
+    if 'D1' not in gl:
+        t, wt = gl['t'], gl['wt']
+        # barycentric weights of the Gauss-Legendre points
+        lam = gl['lam'] if 'lam' in gl else (-1.0) ** arange(len(t)) * sqrt((1 - t * t) * wt)
+        dt = t.reshape(-1, 1) - t.reshape(1, -1)
+        dt[dt == 0] = 1
+        Dt = lam.reshape(1, -1) / lam.reshape(-1, 1) / dt
+        Dt[range(len(t)), range(len(t))] = 0
+        Dt[range(len(t)), range(len(t))] = -Dt.sum(axis=1)
+        Dtt = Dt @ Dt
+
+        r_t = Dt @ r
+        r_tt = Dtt @ r
+        D1 = Dt / r_t.reshape(-1, 1)
+        D2 = (Dtt - r_tt.reshape(-1, 1) * D1) / (r_t * r_t).reshape(-1, 1)
+        gl['D1'], gl['D2'] = D1, D2
+    return gl['D1'], gl['D2']
+
 @njit
-def f_der1(r_mesh, f_mesh):
+def is_uniform(r):
     """
-    Calculates first order derivative of a one dimensional function
-    using central difference method.
-    :math: `df(r)/dr = (f(r + dr) - f(r - dr)) / dr / 2`
+    Checks whether the mesh points are equally spaced.
     """
-    dr = r_mesh[1] - r_mesh[0]
-    fr = lambda r: interp(r, r_mesh, f_mesh)
-    dfr = (fr(r_mesh + dr) - fr(r_mesh - dr)) / dr / 2
-    return dfr
+    dr = r[1] - r[0]
+    for i in range(1, r.shape[0] - 1):
+        if abs(r[i + 1] - r[i] - dr) > 1e-8 * abs(dr):
+            return False
+    return True
 
 @njit
+def simpson_weights(r):
+    """
+    Simpson 1/3 weights of the uniform r mesh:
+    simpson(f, r) == sum(simpson_weights(r) * f)
+    """
+    dr = r[1] - r[0]
+    w = zeros(r.shape)
+    w[0] += 1
+    w[-1] += 1
+    w[1::2] += 4
+    w[2:-1:2] += 2
+    return w * dr/3
+
+@njit
+def simpson_weights_nonuniform(r):
+    """
+    Composite Simpson weights of a non-uniform r mesh.
+    A parabola is fitted to each pair of intervals.
+    The last interval is integrated by trapezoidal rule
+    if the number of the mesh points is even.
+    """
+    w = zeros(r.shape)
+    n = r.shape[0]
+    for i in range(0, n - 2, 2):
+        h0 = r[i + 1] - r[i]
+        h1 = r[i + 2] - r[i + 1]
+        h01 = h0 + h1
+        w[i] += h01 / 6 * (2 - h1 / h0)
+        w[i + 1] += h01 * h01 * h01 / h0 / h1 / 6
+        w[i + 2] += h01 / 6 * (2 - h0 / h1)
+    if n % 2 == 0:
+        h = r[-1] - r[-2]
+        w[-2] += h / 2
+        w[-1] += h / 2
+    return w
+
+def f_der1(r_mesh, f_mesh):
+    """
+    Calculates first order derivative of a one dimensional function.
+    Uniform meshes use the finite difference matrices of fd_matrix()
+    (fourth order central differences, one-sided at the end points).
+
+    The derivative is spectral for a mesh_gl() mesh (see mesh_gl_der)
+    and three point formulas are used for the other non-uniform meshes
+    (see f_der1_nonuniform).
+    """
+    der_gl = mesh_gl_der(r_mesh)
+    if der_gl is not None:
+        return der_gl[0] @ f_mesh
+    if not is_uniform(r_mesh):
+        return f_der1_nonuniform(r_mesh, f_mesh)
+    return f_der1_uniform(r_mesh, f_mesh)
+
 def f_der2(r_mesh, f_mesh):
     """
-    Calculates second order derivative of a one dimensional function
-    using central difference method.
-    :math: `d^2f(r)/dr^2 = (f(r + dr) - 2 f(r)  + f(r - dr)) / dr / dr`
+    Calculates second order derivative of a one dimensional function.
+    Uniform meshes use the finite difference matrices of fd_matrix()
+    (fourth order central differences, one-sided at the end points).
+
+    The derivative is spectral for a mesh_gl() mesh (see mesh_gl_der)
+    and three point formulas are used for the other non-uniform meshes
+    (see f_der2_nonuniform).
     """
-    dr = r_mesh[1] - r_mesh[0]
-    fr = lambda r: interp(r, r_mesh, f_mesh)
-    dfr = (fr(r_mesh + dr) + fr(r_mesh - dr) - 2 * fr(r_mesh)) / dr / dr
-    return dfr
+    der_gl = mesh_gl_der(r_mesh)
+    if der_gl is not None:
+        return der_gl[1] @ f_mesh
+    if not is_uniform(r_mesh):
+        return f_der2_nonuniform(r_mesh, f_mesh)
+    return f_der2_uniform(r_mesh, f_mesh)
+
+@njit
+def fd_weights(x0, x, m):
+    """
+    Finite difference weights of the derivatives up to order m at x0
+    for the points x (Fornberg's algorithm):
+    d^k f(x0)/dx^k ~ sum(fd_weights(x0, x, m)[k] * f(x))
+    """
+    n = x.shape[0]
+    c = zeros((m + 1, n))
+    c[0, 0] = 1
+    c1 = 1.0
+    c4 = x[0] - x0
+    for i in range(1, n):
+        mn = min(i, m)
+        c2 = 1.0
+        c5 = c4
+        c4 = x[i] - x0
+        for j in range(i):
+            c3 = x[i] - x[j]
+            c2 = c2 * c3
+            if j == i - 1:
+                for k in range(mn, 0, -1):
+                    c[k, i] = c1 * (k * c[k - 1, i - 1] - c5 * c[k, i - 1]) / c2
+                c[0, i] = -c1 * c5 * c[0, i - 1] / c2
+            for k in range(mn, 0, -1):
+                c[k, j] = (c4 * c[k, j] - k * c[k - 1, j]) / c3
+            c[0, j] = c4 * c[0, j] / c3
+        c1 = c2
+    return c
+
+# finite difference matrices of the uniform meshes
+_fd_matrices = {}
+
+def fd_matrix(n, dr, der=1, order=4):
+    """
+    Sparse (banded) matrix of the der'th derivative on a uniform mesh
+    of n points with step dr:  f_der(r) = fd_matrix(len(r), dr, der) @ f(r)
+
+    The central differences have the accuracy O(dr^order) (order is even),
+    and the points near the ends use one-sided stencils of the same accuracy.
+    """
+    key = (n, float(dr), der, order)
+    if key not in _fd_matrices:
+        half = (der + 1) // 2 - 1 + order // 2
+        width = der + order
+        x = arange(n) * 1.0
+        central = fd_weights(0.0, arange(-half, half + 1) * 1.0, der)[der]
+
+        rows, cols, vals = [], [], []
+        for i in range(n):
+            if half <= i < n - half:
+                j = arange(i - half, i + half + 1)
+                c = central
+            else:
+                j0 = 0 if i < half else n - width
+                j = arange(j0, j0 + width)
+                c = fd_weights(x[i], x[j], der)[der]
+            rows.append(full(len(j), i))
+            cols.append(j)
+            vals.append(c)
+        matrix = coo_matrix((concatenate(vals) / dr ** der, (concatenate(rows), concatenate(cols))), shape=(n, n))
+        _fd_matrices[key] = matrix.tocsr()
+    return _fd_matrices[key]
+
+def f_der1_uniform(r_mesh, f_mesh, order=4):
+    return fd_matrix(len(r_mesh), r_mesh[1] - r_mesh[0], 1, order) @ f_mesh
+
+def f_der2_uniform(r_mesh, f_mesh, order=4):
+    return fd_matrix(len(r_mesh), r_mesh[1] - r_mesh[0], 2, order) @ f_mesh
+
+@njit
+def f_der1_nonuniform(r, f):
+    """
+    Calculates first order derivative on a non-uniform mesh
+    using the derivative of the parabola passing through
+    three neighbouring points (one-sided at the end points).
+    """
+    n = r.shape[0]
+    df = zeros(n)
+    for i in range(1, n - 1):
+        h1 = r[i] - r[i - 1]
+        h2 = r[i + 1] - r[i]
+        df[i] = (- h2 / h1 / (h1 + h2) * f[i - 1]
+                 + (h2 - h1) / h1 / h2 * f[i]
+                 + h1 / h2 / (h1 + h2) * f[i + 1])
+
+    for i, i1, i2 in ((0, 1, 2), (n - 1, n - 2, n - 3)):
+        x0, x1, x2 = r[i], r[i1], r[i2]
+        df[i] = (f[i] * (2*x0 - x1 - x2) / (x0 - x1) / (x0 - x2)
+                 + f[i1] * (x0 - x2) / (x1 - x0) / (x1 - x2)
+                 + f[i2] * (x0 - x1) / (x2 - x0) / (x2 - x1))
+    return df
+
+@njit
+def f_der2_nonuniform(r, f):
+    """
+    Calculates second order derivative on a non-uniform mesh
+    using the parabola passing through three neighbouring points.
+    The end points take the values of their neighbours.
+    """
+    n = r.shape[0]
+    ddf = zeros(n)
+    for i in range(1, n - 1):
+        h1 = r[i] - r[i - 1]
+        h2 = r[i + 1] - r[i]
+        ddf[i] = 2 * (f[i - 1] / h1 / (h1 + h2) - f[i] / h1 / h2 + f[i + 1] / h2 / (h1 + h2))
+    ddf[0] = ddf[1]
+    ddf[-1] = ddf[-2]
+    return ddf
 
 
 @njit
 def j_hat_1(r):
     """
-    Calculates j_hat_1 = j_n(1, r) * 3/r
+    Calculates j_hat_1 = j_n(1, r) * 3/r, see j_hat_1_scalar
     """
-    r3 = power(r, 3)
+    j_hat = r.copy()
+    for i in range(*j_hat.shape,):
+        j_hat[i] = j_hat_1_scalar(r[i])
+    return j_hat
 
-    # keep away r = r_min ~ 0 (1e-18)
-    # this may cause true_divide or ZeroDivision
-    j_hat = 3*(sin(r) - r * cos(r))/r3
-    j_hat[0] = 1.0
+@njit
+def j_0_scalar(x):
+    """
+    Calculates j(0, x) = sin(x)/x
+    """
+    if abs(x) < 1e-8:
+        return 1.0
+    return sin(x) / x
+
+@njit
+def j_hat_1_scalar(x):
+    """
+    Calculates j_hat_1 = j_n(1, x) * 3/x for a single x.
+    sin(x) - x cos(x) cancels for small x, so the Taylor series
+    j_hat_1 = 3 sum_k (-1)^k (2k+2) x^2k / (2k+3)! is used for |x| < 0.5
+    (the relative error is below 1e-15 everywhere).
+    """
+    if abs(x) < 0.5:
+        x2 = x * x
+        return 1 + x2*(-1/10 + x2*(1/280 + x2*(-1/15120 + x2*(1/1330560 +
+                   x2*(-1/172972800 + x2*(1/31135104000))))))
+    return 3 * (sin(x) - x * cos(x)) / (x * x * x)
+
+@njit
+def j_hat_1_der_scalar(x):
+    """
+    Calculates d j_hat_1(x)/dx = 3 (j_0(x) - j_hat_1(x)) / x
+    """
+    if abs(x) < 0.5:
+        x2 = x * x
+        return x*(-2/10 + x2*(4/280 + x2*(-6/15120 + x2*(8/1330560 +
+                  x2*(-10/172972800 + x2*(12/31135104000))))))
+    return 3 * (sin(x) / x - j_hat_1_scalar(x)) / x
+
+# tables of j_hat_1 and its derivative on [0, x_max] for each step dx
+_j_hat_1_tables = {}
+
+def j_hat_1_table(x_max, dx=0.01):
+    """
+    Returns the tables (j_hat_1, d j_hat_1/dx) on the uniform mesh
+    [0, dx, 2dx, ...] covering [0, x_max], see j_hat_1_interp.
+    The tables are kept for each dx and extended when needed.
+    """
+    table = _j_hat_1_tables.get(dx)
+    if table is None or (len(table[0]) - 2) * dx < x_max:
+        x = arange(int(x_max / dx) + 3) * dx
+        table = (j_hat_1(x), j_hat_1_der(x))
+        _j_hat_1_tables[dx] = table
+    return table
+
+@njit
+def j_hat_1_der(x):
+    dj_hat = x.copy()
+    for i in range(*dj_hat.shape,):
+        dj_hat[i] = j_hat_1_der_scalar(x[i])
+    return dj_hat
+
+@njit
+def j_hat_1_interp(x, f_tab, df_tab, dx):
+    """
+    Cubic Hermite interpolation of j_hat_1 from the tables of j_hat_1_table.
+    The error is about 1e-11 for dx = 0.01.
+    """
+    u = abs(x) / dx
+    i = int(u)
+    if i >= f_tab.shape[0] - 1:
+        return j_hat_1_scalar(x)
+    t = u - i
+    t1 = 1 - t
+    return ((1 + 2*t) * t1 * t1 * f_tab[i] + t * t1 * t1 * dx * df_tab[i] +
+            t * t * (3 - 2*t) * f_tab[i + 1] - t * t * t1 * dx * df_tab[i + 1])
+
+@njit
+def j_hat_1_tabulated(x, f_tab, df_tab, dx):
+    j_hat = x.copy()
+    for i in range(*j_hat.shape,):
+        j_hat[i] = j_hat_1_interp(x[i], f_tab, df_tab, dx)
     return j_hat
 
 @njit
@@ -158,18 +656,44 @@ def f_spline(r_mesh, f_mesh, skip=None, f_mirror=1):
     Reference:
     https://docs.scipy.org/doc/scipy/reference/generated/scipy.interpolate.make_interp_spline.html
     """
+    # cubic spline (n = 3)
+    f_smoothed = spline(*f_mirrored(r_mesh, f_mesh, skip, f_mirror), k=3)
+    return f_smoothed(r_mesh)
+
+
+def f_mirrored(r_mesh, f_mesh, skip=None, f_mirror=1):
+    """
+    Returns every skip'th point of the function mirrored around r=0,
+    see f_spline.
+    """
     if skip == None:
         skip = int(len(r_mesh) * 2.5 / 100)
+    skip = max(skip, 1)
 
     # the function mirrored around r=0
     # therefore new range is between -r_mesh to r_mesh
     # f_mirror = 1 or -1 for even and odd functions, respectively.
     r_new = append(-r_mesh[::skip][1:][::-1], r_mesh[::skip])
     f_new = append(f_mirror * f_mesh[::skip][1:][::-1], f_mesh[::skip])
+    return r_new, f_new
 
-    # cubic spline (n = 3)
-    f_smoothed = spline(r_new, f_new, k=3)
-    return f_smoothed(r_mesh)
+
+# splines of f_spline_fit for the recently used functions
+_spline_fits = LRUCache(32)
+
+def f_spline_fit(r_mesh, f_mesh, skip=None, f_mirror=1, k=5):
+    """
+    Fits one B-spline of degree k to the function (see f_spline for skip and f_mirror)
+    and returns the spline object, so that the function and its derivatives are
+    evaluated from the same fit: spl(r), spl(r, 1), spl(r, 2).
+    The splines of the recently used functions are kept, keyed by a hash of
+    the mesh and the function (see array_key).
+    """
+    key = (array_key(r_mesh, f_mesh), skip, f_mirror, k)
+    spl = _spline_fits.get(key)
+    if spl is None:
+        spl = _spline_fits[key] = spline(*f_mirrored(r_mesh, f_mesh, skip, f_mirror), k=k)
+    return spl
 
 
 def f_extrapolate(r, r_min, r_max, f_poly_val):
@@ -186,121 +710,5 @@ def f_extrapolate(r, r_min, r_max, f_poly_val):
 #******** Tools for error analysis *********#
 #..........................................................................#
 
-def stdev(data):
-    """
-    data : 1D array
-    mean : mean of the "data"
-    stdev: standard deviation of the "data"
-
-    returns:
-    mean, stdev
-    """
-    n = len(data)
-    mean = sum(data) / n
-    distance = mean - data
-    stdev = sqrt(sum(distance ** 2) / n)
-    return mean, stdev
-
-def mafe(yr, yc):
-    """
-    yr   : reference values (array)
-    yc   : comapred values (array)
-    n    : data number (integer)
-    merr : mafe (Mean absolute fractional error) (float)
-    serr : standard deviation of merr
-    ferr : fractional individual errors
-
-    ferr = abs(1 - yc/yr)
-    merr = 1/n sum(ferr)
-
-    returns:
-    merr, serr, ferr
-
-    Reference:
-    https://en.wikipedia.org/wiki/Mean_absolute_percentage_error
-    """
-    ferr = abs(1 - yc / yr)
-    merr, serr = stdev(ferr)
-    return merr, serr, ferr
-
-def mape(yr, yc):
-    """
-    yr    : reference values (array)
-    yc    : comapred values (array)
-    mperr : mape (Mean absolute percentage error) (float)
-    sperr : standard deviation of mperr
-    fperr : percentage individual errors
-
-
-    mperr, sperr, fperr = 100 * mafe_err(yr, yc)
-
-    returns:
-    mperr, sperr, fperr
-
-    Reference:
-    https://en.wikipedia.org/wiki/Mean_absolute_percentage_error
-    """
-    return tuple([100 * m for m in mafe(yr, yc)])
-    
-def mse(yr, yc):
-    """
-    yr        : reference values (array)
-    yc        : comapred values (array)
-    mse_val   : mean squared error (mse)
-    mse_dev   : standard deviation of mse
-    distance2 : squared difference of yr and yc 
-    
-    returns:
-    mse_val, mse_dev, distance2
-
-    Reference:
-    https://en.wikipedia.org/wiki/Mean_squared_error
-    """
-    distance = yr - yc
-    distance2 = distance * distance
-    mse_val, mse_dev = stdev(distance2)
-    
-    return mse_val, mse_dev, distance2
-
-def rmse(yr, yc):
-    """
-    yr         : reference values (array)
-    yc         : comapred values (array)
-    rmse_val   : root mean squared error (rmse)
-    rmse_dev   : standard deviation of rmse
-    distance2  : squared difference of yr and yc 
-    
-    returns:
-    rmse_val, rmse_dev, distance2
-
-    Reference:
-    https://en.wikipedia.org/wiki/Root-mean-square_deviation
-    """
-    
-    mse_val, mse_dev, distance2 = mse(yr, yc)
-    rmse_val = sqrt(mse_val)
-    rmse_dev = sqrt(mse_dev)
-    return rmse_val, rmse_dev, distance2
-
-def wmse(yr, yc):
-    """
-    yr         : reference values (array)
-    yc         : comapred values (array)
-    wmse_val   : weighted mean squared error (wmse)
-    wmse_dev   : standard deviation of wmse
-    wdistance2 : weighted and squared difference of yr and yc 
-    
-    returns:
-    wmse_val, wmse_dev, wdistance2
-
-    Reference:
-    Equation 38 in CPC 181 (1) (2010) 168–182.
-    https://doi.org/10.1016/j.cpc.2009.09.007  
-    """
-    distance = yr - yc
-    weight = yr + yc
-    wdistance = distance/weight
-    wdistance2 = wdistance * wdistance
-    wmse_val, wmse_dev = stdev(wdistance2)
-    
-    return wmse_val, wmse_dev, wdistance2    
\ No newline at end of file
+# the comparison metrics are vectorised over stacks of curves, see metrics.py
+from .metrics import stdev, mafe, mape, mse, rmse, wmse, r_window, compare
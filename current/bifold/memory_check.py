@@ -0,0 +1,188 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the memory accounting of the folding calculations:
+
+MemoryTracker: the peak memory (tracemalloc) of each stage of a profiled
+               calculation and the sizes of the large arrays, see
+               time_check.profile_on(memory=True)
+estimate     : a dry-run estimate of the peak memory and the run time
+               of a folding calculation from the mesh sizes and dd_name
+"""
+
+import tracemalloc
+from .errors import InteractionError
+
+# the exchange and direct terms of each density dependence
+# (fqs transforms of the FR exchange, u_bifold_d parts of the direct part)
+dd_terms = {'dim3y': (2, 1), 'ddm3y': (4, 2), 'cdm3y': (6, 4),
+            'bdm3y1': (4, 3), 'bdm3y2': (6, 4), 'bdm3y3': (8, 5)}
+
+# seconds per unit of work of each integral (see estimate and calibrate):
+# fourier: Nr Nq, fqs: Nr Ns Nq, gRs: NR Ns Nq, u_ex: NR Ns
+costs = {'simpson': {'fourier': 2.0e-8, 'fqs': 1.9e-8, 'gRs': 6.0e-10, 'u_ex': 2.3e-8},
+         'filon':   {'fourier': 1.7e-9, 'fqs': 6.0e-10, 'gRs': 1.1e-10, 'u_ex': 6.3e-8}}
+
+
+class MemoryTracker:
+    """
+    Peak traced memory of the nested stages of a calculation.
+    The peak of a stage includes the peaks of its sub-stages.
+    tracemalloc is started if it is not running and stopped by stop().
+    """
+    def __init__(self):
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        self.stages = {}
+        self.arrays = {}
+        self.peaks = []
+        self.base = tracemalloc.get_traced_memory()[0]
+
+    def enter(self, key):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.peaks:
+            self.peaks[-1][1] = max(self.peaks[-1][1], peak)
+        tracemalloc.reset_peak()
+        self.peaks.append([current, current])
+
+    def exit(self, key):
+        start, peak = self.peaks.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if self.peaks:
+            self.peaks[-1][1] = max(self.peaks[-1][1], peak)
+        stage = self.stages.setdefault(key, {'peak': 0, 'increase': 0})
+        stage['peak'] = max(stage['peak'], peak - self.base)
+        stage['increase'] = max(stage['increase'], peak - start)
+
+    def track(self, key, **arrays):
+        stage = self.arrays.setdefault(key, {})
+        for name, array in arrays.items():
+            stage[name] = stage.get(name, 0) + int(array.nbytes)
+
+    def stop(self):
+        if self.started and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self.started = False
+
+    def report(self):
+        return {'peak': max([s['peak'] for s in self.stages.values()], default=0),
+                'stages': {k: dict(v) for k, v in self.stages.items()},
+                'arrays': {k: dict(v) for k, v in self.arrays.items()}}
+
+
+def dd_term_counts(dd_name):
+    """
+    Returns the number of the fqs transforms and of the direct parts of dd_name.
+    """
+    try:
+        return next(terms for name, terms in dd_terms.items() if name in dd_name)
+    except StopIteration:
+        raise InteractionError(f"unknown dd_name '{dd_name}': use one of {list(dd_terms)}")
+
+def mesh_len(x):
+    return x if isinstance(x, int) else len(x)
+
+def estimate(r, q, R=None, s=None, dd_name='bdm3y1', exchange='fr', backend='simpson', u_ex_iter=8):
+    """
+    Estimates the peak memory of the large arrays and the run time of
+    u_xdm3yn_fr (exchange='fr') or u_xdm3yn_zr (exchange='zr') before
+    the calculation. r, q, R, s could be the meshes or their sizes.
+    The run times use the costs of the backend ('simpson' or 'filon'),
+    see calibrate() to measure them on the current machine.
+
+    Returns
+    -------
+    dict
+        ``peak_bytes``, ``peak_mb``, ``time`` (s), ``times`` (s, of the
+        direct part and of each exchange integral), ``arrays`` (bytes of the
+        largest arrays alive at the same time) and ``counts`` of the integrals
+    """
+    nr, nq = mesh_len(r), mesh_len(q)
+    nR = nr if R is None else mesh_len(R)
+    ns = nr if s is None else mesh_len(s)
+    n_fqs, n_direct = dd_term_counts(dd_name)
+    cost = costs[backend if backend in costs else 'simpson']
+    float_bytes = 8
+
+    # direct part: 3 transforms and 1 inverse transform for each part
+    counts = {'fourier': 4 * n_direct + 1, 'fqs': 0, 'gRs': 0, 'u_ex': 0}
+    times = {'direct': counts['fourier'] * cost['fourier'] * nr * nq}
+    arrays = {'direct': float_bytes * (4 * nq + 2 * nR)}
+
+    if exchange == 'fr':
+        counts['fourier'] += 6
+        counts['fqs'] = n_fqs
+        counts['gRs'] = 1
+        counts['u_ex'] = u_ex_iter
+        times['fourier'] = 6 * cost['fourier'] * nr * nq
+        times['fqs'] = n_fqs * cost['fqs'] * nr * ns * nq
+        times['gRs'] = cost['gRs'] * nR * ns * nq
+        times['u_ex'] = u_ex_iter * cost['u_ex'] * nR * ns
+        # the fqs results, dFqs and the temporaries of the dFqs expression
+        arrays['fqs'] = float_bytes * n_fqs * nq * ns
+        arrays['dFqs'] = float_bytes * 3 * nq * ns
+        if backend != 'simpson':
+            # j_hat_1(g(r) s) and the kernel matrices
+            arrays['fqs_kernels'] = float_bytes * (3 * ns * nr + nq * nr + nR * nq)
+        arrays['dGRs'] = float_bytes * 2 * nR * ns
+    else:
+        counts['fourier'] += 2 * n_direct + 1
+        times['fourier'] = (2 * n_direct + 1) * cost['fourier'] * nr * nq
+
+    peak = sum(arrays.values())
+    return {'peak_bytes': peak, 'peak_mb': peak / 2**20, 'time': sum(times.values()), 'times': times,
+            'arrays': arrays, 'counts': counts}
+
+def calibrate(backends=('simpson', 'filon'), dr=0.1, dq=0.04):
+    """
+    Measures the costs of the integrals (see costs) on the current machine
+    with a profiled u_xdm3yn_fr calculation and updates them.
+    """
+    from .constants import zero
+    from .matematik import mesh
+    from .functions import f_2prm_fermi
+    from .folding import u_xdm3yn_fr, u_coul_ucs
+    from .time_check import profiling
+
+    r = mesh(zero, 10, dr)
+    q = mesh(zero, 3, dq)
+    nr, nq = len(r), len(q)
+    nR = ns = nr
+    rho = f_2prm_fermi(r, 0.181, 2.525, 0.450)
+    u_coul = u_coul_ucs(r, 5.42, 8, 8)
+    work = {'fourier': nr * nq, 'fqs': nr * ns * nq, 'gRs': nR * ns * nq, 'u_ex': nR * ns}
+
+    for backend in backends:
+        # JIT compilation
+        u_xdm3yn_fr(250., 16, 16, rho, rho, u_coul, r, q, Cs=1/4, backend=backend)
+        with profiling():
+            u = u_xdm3yn_fr(250., 16, 16, rho, rho, u_coul, r, q, Cs=1/4, backend=backend)
+        stages = u['profile']['stages']
+        cost = costs.setdefault(backend, {})
+        for op in work:
+            op_stages = [v for k, v in stages.items() if k.split('/')[-1] == op]
+            calls = sum(v['calls'] for v in op_stages)
+            if calls:
+                cost[op] = sum(v['time'] for v in op_stages) / calls / work[op]
+    return costs
+
+def print_estimate(est):
+    print(f"peak memory: {est['peak_mb']:10.3f} MB, run time: {est['time']:10.3e} s")
+    for name, size in est['arrays'].items():
+        print(f'  {name:<12s} {size / 2**20:10.3f} MB')
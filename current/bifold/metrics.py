@@ -0,0 +1,207 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the tools for error analysis.
+
+All metrics work along the last axis, so the compared values could be
+a single curve (NR) or a stack of curves (Ncurves x NR) compared to
+one reference curve (NR) or to a stack of references (Ncurves x NR).
+The results are given for each curve.
+
+mask   : boolean array (NR or Ncurves x NR), only the points with True
+         are used, e.g. r_window(R, 1, 8)
+weights: weights of the points (NR or Ncurves x NR)
+"""
+
+from numpy import (abs, asarray, broadcast_to, ones, sqrt, where)
+
+
+def r_window(R, r_min=None, r_max=None):
+    """
+    Returns the mask of the points r_min <= R <= r_max.
+    """
+    mask = ones(R.shape, dtype=bool)
+    if r_min is not None:
+        mask &= R >= r_min
+    if r_max is not None:
+        mask &= R <= r_max
+    return mask
+
+def _weights(shape, weights=None, mask=None):
+    w = ones(shape) if weights is None else broadcast_to(asarray(weights, dtype=float), shape)
+    if mask is not None:
+        w = where(broadcast_to(mask, shape), w, 0.0)
+    return w
+
+def stdev(data, weights=None, mask=None):
+    """
+    data : array (NR or Ncurves x NR)
+    mean : (weighted) mean of the "data" along the last axis
+    stdev: (weighted) standard deviation of the "data" along the last axis
+
+    returns:
+    mean, stdev
+    """
+    data = asarray(data, dtype=float)
+    if weights is None and mask is None:
+        mean = data.mean(axis=-1)
+        distance = mean[..., None] - data
+        stdev = sqrt((distance * distance).mean(axis=-1))
+        return mean, stdev
+
+    w = _weights(data.shape, weights, mask)
+    # the excluded points could be inf or nan, e.g. yc/yr for yr = 0
+    data = where(w > 0, data, 0.0)
+    w_sum = w.sum(axis=-1)
+    mean = (w * data).sum(axis=-1) / w_sum
+    distance = mean[..., None] - data
+    stdev = sqrt((w * distance * distance).sum(axis=-1) / w_sum)
+    return mean, stdev
+
+def _pair(yr, yc):
+    yr = asarray(yr, dtype=float)
+    yc = asarray(yc, dtype=float)
+    return yr, yc
+
+def mafe(yr, yc, weights=None, mask=None):
+    """
+    yr   : reference values (array)
+    yc   : comapred values (array)
+    merr : mafe (Mean absolute fractional error) (float or array)
+    serr : standard deviation of merr
+    ferr : fractional individual errors
+
+    ferr = abs(1 - yc/yr)
+    merr = 1/n sum(ferr)
+
+    returns:
+    merr, serr, ferr
+
+    Reference:
+    https://en.wikipedia.org/wiki/Mean_absolute_percentage_error
+    """
+    yr, yc = _pair(yr, yc)
+    with_mask = yr if mask is None else where(mask, yr, 1.0)
+    ferr = abs(1 - yc / with_mask)
+    merr, serr = stdev(ferr, weights, mask)
+    return merr, serr, ferr
+
+def mape(yr, yc, weights=None, mask=None):
+    """
+    yr    : reference values (array)
+    yc    : comapred values (array)
+    mperr : mape (Mean absolute percentage error) (float or array)
+    sperr : standard deviation of mperr
+    fperr : percentage individual errors
+
+
+    mperr, sperr, fperr = 100 * mafe_err(yr, yc)
+
+    returns:
+    mperr, sperr, fperr
+
+    Reference:
+    https://en.wikipedia.org/wiki/Mean_absolute_percentage_error
+    """
+    return tuple([100 * m for m in mafe(yr, yc, weights, mask)])
+
+def mse(yr, yc, weights=None, mask=None):
+    """
+    yr        : reference values (array)
+    yc        : comapred values (array)
+    mse_val   : mean squared error (mse)
+    mse_dev   : standard deviation of mse
+    distance2 : squared difference of yr and yc
+
+    returns:
+    mse_val, mse_dev, distance2
+
+    Reference:
+    https://en.wikipedia.org/wiki/Mean_squared_error
+    """
+    yr, yc = _pair(yr, yc)
+    distance = yr - yc
+    distance2 = distance * distance
+    mse_val, mse_dev = stdev(distance2, weights, mask)
+    return mse_val, mse_dev, distance2
+
+def rmse(yr, yc, weights=None, mask=None):
+    """
+    yr         : reference values (array)
+    yc         : comapred values (array)
+    rmse_val   : root mean squared error (rmse)
+    rmse_dev   : standard deviation of rmse
+    distance2  : squared difference of yr and yc
+
+    returns:
+    rmse_val, rmse_dev, distance2
+
+    Reference:
+    https://en.wikipedia.org/wiki/Root-mean-square_deviation
+    """
+    mse_val, mse_dev, distance2 = mse(yr, yc, weights, mask)
+    rmse_val = sqrt(mse_val)
+    rmse_dev = sqrt(mse_dev)
+    return rmse_val, rmse_dev, distance2
+
+def wmse(yr, yc, weights=None, mask=None):
+    """
+    yr         : reference values (array)
+    yc         : comapred values (array)
+    wmse_val   : weighted mean squared error (wmse)
+    wmse_dev   : standard deviation of wmse
+    wdistance2 : weighted and squared difference of yr and yc
+
+    returns:
+    wmse_val, wmse_dev, wdistance2
+
+    Reference:
+    Equation 38 in CPC 181 (1) (2010) 168–182.
+    https://doi.org/10.1016/j.cpc.2009.09.007
+    """
+    yr, yc = _pair(yr, yc)
+    distance = yr - yc
+    weight = yr + yc
+    if mask is not None:
+        weight = where(mask, weight, 1.0)
+    wdistance = distance / weight
+    wdistance2 = wdistance * wdistance
+    wmse_val, wmse_dev = stdev(wdistance2, weights, mask)
+    return wmse_val, wmse_dev, wdistance2
+
+metric_functions = {'mafe': mafe, 'mape': mape, 'mse': mse, 'rmse': rmse, 'wmse': wmse}
+
+def compare(yr, yc, R=None, r_min=None, r_max=None, weights=None, mask=None,
+            metrics=('mafe', 'mape', 'mse', 'rmse', 'wmse')):
+    """
+    Compares the curves yc (NR or Ncurves x NR) with the reference(s) yr
+    using all the metrics in one call. If R is given, only the points
+    r_min <= R <= r_max are used (see r_window) together with mask.
+
+    returns:
+    dict
+        {metric: (value, dev)} for each metric, the values are given for each curve
+    """
+    if R is not None:
+        window = r_window(asarray(R), r_min, r_max)
+        mask = window if mask is None else mask & window
+    results = {}
+    for name in metrics:
+        value, dev, _ = metric_functions[name](yr, yc, weights, mask)
+        results[name] = (value, dev)
+    return results
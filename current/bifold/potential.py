@@ -0,0 +1,206 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the folded potentials as functions of R,
+e.g. for the reaction codes:
+
+u = u_xdm3yn_fr(...)
+pot = u['potential']             # the total potential, see attach_potential
+pot(R), pot(R, 1), pot(R, 2)     # U(R), U'(R), U''(R) at any R
+
+For stacks of densities (see batch_params) u['potential'] is the list of
+the Potentials of the samples.
+
+The potential is a spline (cubic or quintic) of the folded values.
+Beyond R_max it is continued by the analytic tail
+U(R) = A exp(-kappa R) + C / R, matched to the value and the slope at R_max.
+If U(R) does not decay at R_max (U' U >= 0), the 'exp' tail is matched to
+the value only, with kappa = 1 / tail_diffuseness (a warning is given).
+The spline is evaluated by numba, also from njit code:
+
+@njit
+def f(x, breaks, coefs, tail):
+    return u_value(x, breaks, coefs, tail, 0)
+
+f(5.0, *pot.data)
+"""
+
+from .matematik import f_mirrored, spline
+from .errors import InputError
+from scipy.interpolate import PPoly
+from numpy import array, asarray, diff, exp, zeros, searchsorted, ndarray
+from functools import wraps
+from inspect import signature
+from warnings import warn
+from numba import njit
+
+# the decay length (fm) of the 'exp' tails that cannot be matched to the slope
+tail_diffuseness = 0.65
+
+
+@njit
+def u_value(x, breaks, coefs, tail, der=0):
+    """
+    The der'th derivative (0, 1, 2) of the potential at x.
+    breaks, coefs: the piecewise polynomial (scipy.interpolate.PPoly order)
+    tail         : (A, kappa, C) of the tail beyond breaks[-1]
+    """
+    if x > breaks[-1]:
+        a, kappa, c = tail[0], tail[1], tail[2]
+        if der == 0:
+            return a * exp(-kappa * x) + c / x
+        elif der == 1:
+            return -kappa * a * exp(-kappa * x) - c / (x * x)
+        return kappa * kappa * a * exp(-kappa * x) + 2 * c / (x * x * x)
+
+    n = breaks.shape[0] - 1
+    i = searchsorted(breaks, x, 'right') - 1
+    i = min(max(i, 0), n - 1)
+    t = x - breaks[i]
+    k = coefs.shape[0] - 1
+    value = 0.0
+    for m in range(k + 1 - der):
+        p = k - m
+        # d^der/dt^der t^p = p (p - 1) ... (p - der + 1) t^(p - der)
+        factor = 1.0
+        for j in range(der):
+            factor *= p - j
+        value = value * t + coefs[m, i] * factor
+    return value
+
+@njit
+def u_values(x, breaks, coefs, tail, der=0):
+    values = zeros(x.shape[0])
+    for i in range(x.shape[0]):
+        values[i] = u_value(x[i], breaks, coefs, tail, der)
+    return values
+
+
+class Potential:
+    """
+    A folded potential U(R) as a function of R, see the module docstring.
+    R, u_R: the mesh and the folded potential
+    k     : the degree of the spline, 3 (cubic) or 5 (quintic)
+    tail  : 'exp' (nuclear potentials), 'coulomb' (C / R) or 'zero'
+    The spline is fitted at the first call.
+    """
+    def __init__(self, R, u_R, k=5, tail='exp'):
+        if k not in (3, 5):
+            raise InputError(f'k = {k}: use 3 (cubic) or 5 (quintic) splines')
+        if tail not in ('exp', 'coulomb', 'zero'):
+            raise InputError(f"unknown tail '{tail}': use 'exp', 'coulomb' or 'zero'")
+        self.R = asarray(R, dtype=float)
+        self.u_R = asarray(u_R, dtype=float)
+        self.k = k
+        self.tail_kind = tail
+        self._data = None
+
+    @property
+    def R_max(self):
+        return self.R[-1]
+
+    @property
+    def data(self):
+        """
+        (breaks, coefs, tail): the arguments of u_value and u_values.
+        """
+        if self._data is None:
+            # U(R) is even in R, see f_mirrored
+            pp = PPoly.from_spline(spline(*f_mirrored(self.R, self.u_R, skip=1), k=self.k))
+            # the knots of the B-spline are repeated at the ends
+            keep = diff(pp.x) > 0
+            breaks = array(list(pp.x[:-1][keep]) + [pp.x[-1]])
+            coefs = pp.c[:, keep].copy()
+            self._data = (breaks, coefs, self.fit_tail(breaks, coefs))
+        return self._data
+
+    def fit_tail(self, breaks, coefs):
+        tail = zeros(3)
+        R_max = breaks[-1]
+        u = u_value(R_max, breaks, coefs, tail, 0)
+        du = u_value(R_max, breaks, coefs, tail, 1)
+        if self.tail_kind == 'coulomb':
+            tail[2] = u * R_max
+        elif self.tail_kind == 'exp' and u != 0:
+            tail[1] = -du / u
+            if not tail[1] > 0:
+                tail[1] = 1 / tail_diffuseness
+                warn(f'Potential: U(R) does not decay at R_max = {R_max} (U = {u:.4e}, dU/dR = {du:.4e}), '
+                     f'the tail is matched to the value with the decay length {tail_diffuseness} fm: '
+                     'extend the R mesh', RuntimeWarning, stacklevel=2)
+            tail[0] = u * exp(tail[1] * R_max)
+        return tail
+
+    def __call__(self, R, der=0):
+        if isinstance(R, ndarray):
+            return u_values(R.astype(float).ravel(), *self.data, der).reshape(R.shape)
+        return u_value(float(R), *self.data, der)
+
+    def d1(self, R):
+        return self(R, 1)
+
+    def d2(self, R):
+        return self(R, 2)
+
+    def __repr__(self):
+        return f"Potential(NR={len(self.R)}, R_max={self.R_max}, k={self.k}, tail='{self.tail_kind}')"
+
+
+def potential(u, part='total', R=None, k=5, tail=None):
+    """
+    Returns the Potential of a result of the folding functions
+    (a list of the Potentials of the samples for stacks of densities).
+    part: 'total', 'direct' or 'exchange' for the potentials with parts
+    R   : the R mesh of the result, u['potential'].R by default
+    tail: 'coulomb' for the Coulomb potentials, 'exp' otherwise by default
+    """
+    func_r = u['func_r']
+    u_R = func_r[part]['u_R'] if part in func_r and isinstance(func_r[part], dict) else func_r['u_R']
+    if R is None:
+        pot = u['potential']
+        R = (pot[0] if isinstance(pot, list) else pot).R
+    if tail is None:
+        func_i = u['func_i'][part] if part in u['func_i'] and isinstance(u['func_i'][part], dict) else u['func_i']
+        tail = 'coulomb' if 'coul' in func_i['u_R'][0]['name'] else 'exp'
+    if u_R.ndim > 1:
+        return [Potential(R, u_Ri, k=k, tail=tail) for u_Ri in u_R]
+    return Potential(R, u_R, k=k, tail=tail)
+
+def attach_potential(func):
+    """
+    Attaches the total potential of the result of func as result['potential']
+    (see Potential), a list of the Potentials of the samples for stacks of
+    densities. The spline is fitted when it is used for the first time.
+    """
+    func_signature = signature(func)
+    tail = 'coulomb' if 'coul' in func.__name__ else 'exp'
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        result = func(*args, **kwargs)
+        arguments = func_signature.bind_partial(*args, **kwargs).arguments
+        R = arguments.get('R')
+        R = arguments['r'] if R is None else R
+        func_r = result['func_r']
+        u_R = func_r['total']['u_R'] if 'total' in func_r else func_r['u_R']
+        if isinstance(u_R, ndarray) and u_R.ndim == 1:
+            result['potential'] = Potential(R, u_R, tail=tail)
+        elif isinstance(u_R, ndarray) and u_R.ndim == 2:
+            result['potential'] = [Potential(R, u_Ri, tail=tail) for u_Ri in u_R]
+        return result
+    return inner
@@ -19,6 +19,8 @@
 This module contains the printing tools for BiFold.
 """
 
+from .errors import InputError, PotentialError
+
 
 DASHED = '- ' * 47
 SOLID = '─' * 50
@@ -42,6 +44,26 @@ def print_subsection(val, fmts='10s', l_left='───────', l_right=DA
     print(f'{omit}{n_l}{omit}{l_left}{val:{fmts}}{l_right}')
 
 
+def is_batched(u):
+    '''
+    True if u is the result of stacks of densities (Nsamples x Nr, see batch_params).
+    '''
+    if not isinstance(u, dict):
+        return getattr(u(), 'ndim', 1) > 1
+    func_r = u['func_r']
+    u_R = func_r['total']['u_R'] if 'total' in func_r else func_r['u_R']
+    return getattr(u_R, 'ndim', 1) > 1
+
+def check_printable(u):
+    '''
+    Raises InputError for the results of stacks of densities, they are
+    printed (plotted) sample by sample.
+    '''
+    if is_batched(u):
+        raise InputError('u is a stack of potentials (Nsamples x NR), it cannot be printed or plotted: '
+                         'calculate the samples one by one')
+
+
 def print_bifold_logo(omit=''):
     # https://textkool.com/en/ascii-art-generator?hl=default&vl=default&font=Doh&text=BF
     name_bifold = \
@@ -175,7 +197,7 @@ def print_func_info(key, val):
                 elif isinstance(vi, float):
                     line = f'{ki:>5s} = {vi:<8.3f}'
                     print(line, end=' ')
-                elif vi!=None:
+                elif vi is not None:
                     line = f'{ki:>5s} : {str(vi):<13s}'
                     print(line, end=' ')
         print()
@@ -352,6 +374,7 @@ def print_all(u, r, q, R=None, s=None, title='', show='u_R_short', info=True, fi
     show == 'all_short' show everything calculated in a summarized format
     '''
 
+    check_printable(u)
     if file is not None:
         import sys
         orig_stdout = sys.stdout
@@ -364,7 +387,7 @@ def print_all(u, r, q, R=None, s=None, title='', show='u_R_short', info=True, fi
     if title!='':
         print_title(title=title, omit=omit)
 
-    QUIT = False
+    error = None
     try:
         name = u['func_i']['u_R'][0]['name']
     except KeyError:
@@ -372,7 +395,7 @@ def print_all(u, r, q, R=None, s=None, title='', show='u_R_short', info=True, fi
     except TypeError:
         name = 'unnamed'
 
-    if name in ['u_direct', 'u_exchange_zr', 'u_coul_bifold_d']:
+    if name in ['u_direct', 'u_exchange_zr', 'u_coul_bifold_d', 'u_coul_bifold_q']:
         print_bifold(u, r, q, R=R, s=s, show=show, info=info, ncol=ncol, fmt=fmt, omit=omit, data_format=data_format)
     elif name in ['u_bifold_zr', 'u_m3y_reid_zr', 'u_m3y_paris_zr']:
         print_bifold_di(u, r, q, R=R, s=s, show=show, info=info, ncol=ncol, fmt=fmt, omit=omit, data_format=data_format)
@@ -381,15 +404,14 @@ def print_all(u, r, q, R=None, s=None, title='', show='u_R_short', info=True, fi
     elif name == 'unnamed':
         print_func(u, r, show=show, info=info, ncol=ncol, fmt=fmt, omit=omit, data_format=data_format)
     else:
-        print(f'Something went wrong while printing! {name} is undefined.')
-        QUIT = True
+        error = f'Something went wrong while printing! {name} is undefined.'
 
     if file is not None:
         sys.stdout = orig_stdout
         f.close()
 
-    if QUIT:
-        quit()
+    if error is not None:
+        raise PotentialError(error)
 
 
 def print_potentials(u, r, q, R=None, s=None, title='', show='u_R', info=False, file=None,
@@ -0,0 +1,128 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains the progress reports and the cooperative
+cancellation of the long folding calculations, e.g.
+
+token = CancelToken()
+u = u_xdm3yn_fr(..., progress=print_progress, cancel=token)
+
+token.cancel() (e.g. from another thread) stops the calculation at the
+next check with Cancelled. The checks are done between the R-blocks of
+the exchange integrals and between the parts of the direct potential,
+see ProgressBackend.
+"""
+
+from time import perf_counter
+from threading import Event
+from .errors import Cancelled
+
+
+class CancelToken:
+    """
+    Cancels a running calculation at its next check.
+    condition: an optional function, the calculation is cancelled
+               when it returns True, e.g. lambda: os.path.exists('STOP')
+    """
+    def __init__(self, condition=None):
+        self.event = Event()
+        self.condition = condition
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        if not self.event.is_set() and self.condition is not None and self.condition():
+            self.event.set()
+        return self.event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled('the calculation is cancelled')
+
+
+class Progress:
+    """
+    Reports the progress of a calculation: callback(stage, fraction, eta)
+    is called with the fraction done of the whole calculation (0 - 1) and
+    the estimated remaining time (s, None at the beginning).
+    A part of the calculation reports in its own span of the fraction,
+    see span and stages. cancel is checked at every update.
+    block: the number of R points integrated between two updates
+    """
+    def __init__(self, callback=None, cancel=None, block=32):
+        self.callback = callback
+        self.cancel = cancel
+        self.block = block
+        self.start = perf_counter()
+        self.lo, self.hi = 0.0, 1.0
+
+    def span(self, lo, hi):
+        """
+        Returns the progress of a part taking the fractions lo - hi of this one.
+        """
+        part = Progress.__new__(Progress)
+        part.__dict__.update(self.__dict__)
+        part.lo = self.lo + (self.hi - self.lo) * lo
+        part.hi = self.lo + (self.hi - self.lo) * hi
+        return part
+
+    def stages(self, weights):
+        """
+        Splits the progress into consecutive stages in proportion to the
+        weights (e.g. the estimated run times), returns {stage: Progress}.
+        """
+        total = sum(weights.values()) or 1.0
+        stages, lo = {}, 0.0
+        for name, weight in weights.items():
+            hi = lo + weight / total
+            stages[name] = self.span(lo, hi)
+            lo = hi
+        return stages
+
+    def check(self):
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def update(self, stage, fraction):
+        self.check()
+        if self.callback is None:
+            return
+        done = self.lo + (self.hi - self.lo) * min(max(fraction, 0.0), 1.0)
+        elapsed = perf_counter() - self.start
+        eta = max(elapsed * (1 - done) / done, 0.0) if done > 0 else None
+        self.callback(stage, done, eta)
+
+
+def as_progress(progress=None, cancel=None):
+    """
+    Returns a Progress from a callback or a Progress, None if there is
+    neither a progress nor a cancel token.
+    """
+    if isinstance(progress, Progress):
+        if cancel is not None:
+            progress.cancel = cancel
+        return progress
+    if progress is None and cancel is None:
+        return None
+    return Progress(progress, cancel)
+
+def print_progress(stage, fraction, eta):
+    eta = '-' if eta is None else f'{eta:8.1f} s'
+    print(f'\r{stage:<24s} {100 * fraction:6.2f} %   ETA: {eta}', end='' if fraction < 1 else '\n', flush=True)
@@ -0,0 +1,163 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module contains higher order integrators with error estimates:
+Boole's rule, Romberg extrapolation and Clenshaw-Curtis quadrature.
+All integrators work along the last axis of f, so f could be a single
+function or a stack of functions (Nf x Nr).
+"""
+
+from .matematik import mesh, mesh_cc, simpson_weights, mesh_quad
+from numpy import abs, array, zeros
+from numba import njit
+from .errors import MeshError
+
+
+@njit
+def boole_weights(r):
+    """
+    Boole's rule weights of the uniform r mesh (odd number of points).
+    If (len(r) - 1) is not a multiple of 4, the last two intervals
+    are integrated by Simpson 1/3 rule.
+    """
+    n = r.shape[0]
+    dr = r[1] - r[0]
+    m = (n - 1) // 4 * 4
+    w = zeros(n)
+    for i in range(0, m, 4):
+        w[i] += 7
+        w[i + 1] += 32
+        w[i + 2] += 12
+        w[i + 3] += 32
+        w[i + 4] += 7
+    w = w * 2 * dr / 45
+    if m < n - 1:
+        w[m] += dr / 3
+        w[m + 1] += 4 * dr / 3
+        w[m + 2] += dr / 3
+    return w
+
+def boole(f, r):
+    """
+    Integrates f over the uniform r mesh using Boole's rule.
+    The error is estimated by the difference from Simpson 1/3 rule,
+    which is an upper estimate for Boole's rule.
+
+    Returns
+    -------
+    value, error
+    """
+    value = f @ boole_weights(r)
+    return value, abs(value - f @ simpson_weights(r))
+
+def romberg(f, r, max_levels=5):
+    """
+    Integrates f over the uniform r mesh using Romberg extrapolation
+    of trapezoidal rules with steps dr, 2dr, 4dr, ... The number of
+    levels is limited by max_levels and by the largest power of 2
+    dividing len(r) - 1, e.g. 2^k + 1 points allow k + 1 levels.
+    The error is estimated by the difference of the last two diagonal
+    elements of the Romberg table.
+
+    Returns
+    -------
+    value, error
+    """
+    f = array(f, dtype=float)
+    n = r.shape[0] - 1
+    levels = 1
+    while levels < max_levels and n % (2 ** levels) == 0:
+        levels += 1
+
+    # trapezoidal rules with the coarsest step first
+    table = []
+    for k in range(levels):
+        step = 2 ** (levels - 1 - k)
+        fk = f[..., ::step]
+        h = (r[1] - r[0]) * step
+        table.append([h * (fk.sum(axis=-1) - (fk[..., 0] + fk[..., -1]) / 2)])
+
+    for k in range(1, levels):
+        for j in range(1, k + 1):
+            rich = table[k][j - 1] + (table[k][j - 1] - table[k - 1][j - 1]) / (4 ** j - 1)
+            table[k].append(rich)
+
+    value = table[-1][-1]
+    error = abs(value - table[-2][-2]) if levels > 1 else abs(value - f @ simpson_weights(r))
+    return value, error
+
+def integrate_cc(f, r):
+    """
+    Integrates f over a mesh created by mesh_cc() using Clenshaw-Curtis
+    quadrature. The error is estimated by the difference from the
+    Clenshaw-Curtis quadrature on every other point of the mesh.
+
+    Returns
+    -------
+    value, error
+    """
+    cc = mesh_quad(r)
+    if cc is None or 'lam' not in cc:
+        raise MeshError('integrate_cc needs a mesh created by mesh_cc()')
+    value = f @ cc['w']
+    if len(r) % 2 == 0:
+        return value, abs(value)
+
+    r_half = r[::2]
+    cc_half = mesh_quad(r_half)
+    if cc_half is None or 'lam' not in cc_half:
+        cc_half = mesh_quad(mesh_cc(r[0], r[-1], len(r_half)))
+    return value, abs(value - f[..., ::2] @ cc_half['w'])
+
+def integrator_tradeoff(func, r_min, r_max, n_points=(17, 33, 65, 129, 257), exact=None):
+    """
+    Accuracy per mesh point of the integrators for int func(r) dr:
+    Simpson, Boole, Romberg (uniform meshes) and Clenshaw-Curtis.
+    func is a function of the r mesh, e.g. lambda r: r*r * f_2prm_fermi(r, 0.17, 3.6, 0.52)().
+    If exact is None, Clenshaw-Curtis with 4 x max(n_points) points is used.
+
+    Returns
+    -------
+    list of dict
+        ``method``, ``n``, ``value``, ``error_estimate``, ``error``
+    """
+    if exact is None:
+        r_exact = mesh_cc(r_min, r_max, 4 * max(n_points) + 1)
+        exact = integrate_cc(func(r_exact), r_exact)[0]
+
+    report = []
+    for n in n_points:
+        dr = (r_max - r_min) / (n - 1)
+        r = mesh(r_min, r_max - dr / 2, dr)
+        f = func(r)
+        r_cc = mesh_cc(r_min, r_max, n)
+        value_s = f @ simpson_weights(r)
+        results = {'simpson': (value_s, abs(value_s - boole(f, r)[0])),
+                   'boole': boole(f, r),
+                   'romberg': romberg(f, r),
+                   'clenshaw_curtis': integrate_cc(func(r_cc), r_cc)}
+        for method, (value, error_estimate) in results.items():
+            report.append({'method': method, 'n': len(r) if method != 'clenshaw_curtis' else n,
+                           'value': float(value), 'error_estimate': float(error_estimate),
+                           'error': float(abs(value - exact))})
+    return report
+
+def print_tradeoff(report):
+    print(f"{'method':>16s} {'n':>6s} {'value':>22s} {'error_estimate':>16s} {'error':>12s}")
+    for ri in report:
+        print(f"{ri['method']:>16s} {ri['n']:6d} {ri['value']:22.15e} {ri['error_estimate']:16.3e} {ri['error']:12.3e}")
@@ -0,0 +1,342 @@
+# Copyright (C) 2022 Mesut Karakoç <mesutkarakoc@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+This module calculates the elastic scattering of spin zero nuclei with
+the folded potentials:
+
+U(R) = N_R u_nuc(R) + i W(R) + u_coul(R)
+
+u = u_xdm3yn_fr(...)
+el = elastic(e_lab, a_proj, a_targ, z_proj, z_targ, u, u_coul, n_r=1.0, w=0.8, theta=theta)
+el['ratio']     # cross section / Rutherford cross section
+
+W(R) = w u_nuc(R) if w is a number, otherwise w is a function of R,
+e.g. woods_saxon(...). The radial equations of all partial waves are
+solved at once with Numerov's method (numba) and matched to the
+Coulomb functions (Steed's method) at r_match.
+"""
+
+from .constants import hbc, mu_c2, e2, pi
+from .potential import Potential
+from .errors import InputError
+from numpy import (arange, array, asarray, ceil, cos, exp, log, sin, sqrt, zeros,
+                   arctan, radians, cumsum, abs, isfinite, complex128)
+from scipy.special import loggamma
+from numba import njit
+
+
+#..........................................................................#
+#************************* Coulomb wave functions *************************#
+#..........................................................................#
+@njit
+def coulomb_fg(eta, rho, l_max):
+    """
+    Regular and irregular Coulomb functions F_L(eta, rho), G_L(eta, rho)
+    and their derivatives (d/drho) for L = 0 ... l_max by Steed's method:
+    CF1 gives F'/F at a large L where F has no zeros, F is recurred down
+    to L = 0, CF2 gives (G' + iF')/(G + iF) at L = 0 and the Wronskian
+    normalises F and G. G is recurred up.
+    Reference: A. R. Barnett, Comput. Phys. Commun. 27 (1982) 147.
+    """
+    acc = 1e-16
+    tiny = 1e-300
+    # F_l_top has no zeros below its turning point
+    l_top = max(l_max, int(eta + rho) + 10)
+
+    # CF1: f = F'_L / F_L = S_{L+1} - R_{L+1}^2 / (S_{L+1} + S_{L+2} - R_{L+2}^2 / ...)
+    l = l_top + 1.0
+    f = l / rho + eta / l
+    if f == 0:
+        f = tiny
+    c, d = f, 0.0
+    for i in range(1, 100000):
+        s1 = (l + i - 1) / rho + eta / (l + i - 1)
+        s2 = (l + i) / rho + eta / (l + i)
+        a = -(1 + eta * eta / ((l + i - 1) * (l + i - 1)))
+        b = s1 + s2
+        d = b + a * d
+        if d == 0:
+            d = tiny
+        c = b + a / c
+        if c == 0:
+            c = tiny
+        d = 1 / d
+        delta = c * d
+        f *= delta
+        if abs(delta - 1) < acc:
+            break
+
+    # F down to L = 0: F_{L-1} = (S_L F_L + F'_L) / R_L, F'_{L-1} = S_{L-1} F_{L-1} - R_L F_L
+    F = zeros(l_top + 1)
+    dF = zeros(l_top + 1)
+    F[l_top] = 1e-30
+    dF[l_top] = f * F[l_top]
+    for L in range(l_top, 0, -1):
+        s = L / rho + eta / L
+        r = sqrt(1 + eta * eta / (L * L))
+        F[L - 1] = (s * F[L] + dF[L]) / r
+        dF[L - 1] = s * F[L - 1] - r * F[L]
+        if abs(F[L - 1]) > 1e250:
+            F[L - 1:] *= 1e-250
+            dF[L - 1:] *= 1e-250
+
+    # CF2 at L = 0: p + iq = i (1 - eta / rho) + (i / rho) a_1 / (b_1 + a_2 / (b_2 + ...))
+    # a_k = (i eta + k - 1) (i eta + k), b_k = 2 (rho - eta + k i)
+    t = tiny + 0j
+    c2, d2 = t, 0j
+    for k in range(1, 100000):
+        a2 = (1j * eta + k - 1) * (1j * eta + k)
+        b2 = 2 * (rho - eta + k * 1j)
+        d2 = b2 + a2 * d2
+        if d2 == 0:
+            d2 = tiny
+        c2 = b2 + a2 / c2
+        if c2 == 0:
+            c2 = tiny
+        d2 = 1 / d2
+        delta2 = c2 * d2
+        t *= delta2
+        if abs(delta2 - 1) < acc:
+            break
+    pq = 1j * (1 - eta / rho) + 1j / rho * t
+    p, q = pq.real, pq.imag
+
+    # the Wronskian F' G - F G' = 1
+    f0 = dF[0] / F[0]
+    gamma = (f0 - p) / q
+    F0 = 1 / sqrt(q * (1 + gamma * gamma))
+    if F[0] < 0:
+        F0 = -F0
+    scale = F0 / F[0]
+
+    G = zeros(l_max + 1)
+    dG = zeros(l_max + 1)
+    G[0] = gamma * F0
+    dG[0] = p * G[0] - q * F0
+    # G up: G_{L+1} = (S_{L+1} G_L - G'_L) / R_{L+1}, G'_{L+1} = R_{L+1} G_L - S_{L+1} G_{L+1}
+    for L in range(l_max):
+        s = (L + 1) / rho + eta / (L + 1)
+        r = sqrt(1 + eta * eta / ((L + 1) * (L + 1)))
+        G[L + 1] = (s * G[L] - dG[L]) / r
+        dG[L + 1] = r * G[L] - s * G[L + 1]
+    return F[:l_max + 1] * scale, G, dF[:l_max + 1] * scale, dG
+
+def coulomb_phases(eta, l_max):
+    """
+    Coulomb phase shifts sigma_L = arg Gamma(L + 1 + i eta), L = 0 ... l_max
+    """
+    sigma_0 = loggamma(1 + 1j * eta).imag
+    L = arange(1, l_max + 1)
+    return sigma_0 + append_zero(cumsum(arctan(eta / L)))
+
+def append_zero(x):
+    y = zeros(len(x) + 1)
+    y[1:] = x
+    return y
+
+#..........................................................................#
+#***************************** Numerov method *****************************#
+#..........................................................................#
+@njit
+def numerov(v, R, L, k2, n1, n2):
+    """
+    Solves u'' = (L(L+1)/R^2 + v(R) - k^2) u for all L at once,
+    v = 2 mu U(R) / hbar^2 (complex) on the uniform mesh R = h, 2h, ...
+    Returns u(R[n1]) / u(R[n2]) of each L.
+    """
+    h2 = (R[1] - R[0]) ** 2 / 12
+    ratio = zeros(L.shape[0], dtype=complex128)
+    for iL in range(L.shape[0]):
+        ll = L[iL] * (L[iL] + 1)
+        # u(0) = 0, the scale of u is arbitrary
+        # w(0) is not needed since u(0) = 0
+        u_prev, u = 0j, 1e-20 + 0j
+        w_prev = 0j
+        w = 1 - h2 * (ll / (R[0] * R[0]) + v[0] - k2)
+        u1 = 0j
+        for n in range(1, n2 + 1):
+            w_next = 1 - h2 * (ll / (R[n] * R[n]) + v[n] - k2)
+            u_next = ((12 - 10 * w) * u - w_prev * u_prev) / w_next
+            u_prev, u = u, u_next
+            w_prev, w = w, w_next
+            if n == n1:
+                u1 = u
+            if abs(u) > 1e200:
+                u_prev *= 1e-200
+                u *= 1e-200
+                u1 *= 1e-200
+        ratio[iL] = u1 / u
+    return ratio
+
+
+def as_potential(u, R=None, tail='exp'):
+    """
+    Returns the Potential of a folding result, of a Potential or of the
+    values of a potential on the mesh R (e.g. u_coul_ucs(R, ...)).
+    """
+    if isinstance(u, Potential):
+        return u
+    if isinstance(u, dict):
+        if isinstance(u.get('potential'), list):
+            raise InputError("the result is a stack of potentials: use u['potential'][i] of a sample")
+        if 'potential' in u:
+            return u['potential']
+        raise InputError('the result has no potential, see attach_potential')
+    values = u() if callable(u) else u
+    if R is None or len(values) != len(R):
+        raise InputError('the values of the potential need the mesh R of the folded potential')
+    return Potential(R, values, tail=tail)
+
+def woods_saxon(w0, r_w, a_w, a_proj, a_targ):
+    """
+    W(R) = -w0 / (1 + exp((R - R_w) / a_w)), R_w = r_w (a_proj^1/3 + a_targ^1/3)
+    """
+    R_w = r_w * (a_proj ** (1 / 3) + a_targ ** (1 / 3))
+    return lambda R: -w0 / (1 + exp((R - R_w) / a_w))
+
+def legendre_table(l_max, x):
+    """
+    P_L(x) for L = 0 ... l_max (rows) at x (columns).
+    """
+    P = zeros((l_max + 1, len(x)))
+    P[0] = 1
+    if l_max > 0:
+        P[1] = x
+    for L in range(1, l_max):
+        P[L + 1] = ((2 * L + 1) * x * P[L] - L * P[L - 1]) / (L + 1)
+    return P
+
+def amplitudes(S, sigma, k, eta, theta):
+    """
+    Coulomb and nuclear scattering amplitudes (fm) at theta (radians).
+    """
+    L = arange(len(S))
+    s2 = sin(theta / 2) ** 2
+    f_c = -eta / (2 * k * s2) * exp(-1j * eta * log(s2) + 2j * sigma[0])
+    f_n = (((2 * L + 1) * exp(2j * sigma) * (S - 1)) @ legendre_table(len(S) - 1, cos(theta))) / (2j * k)
+    return f_c, f_n
+
+def kinematics(e_lab, a_proj, a_targ, z_proj, z_targ):
+    """
+    Returns e_cm (MeV), mu (MeV), k (fm^-1) and the Sommerfeld parameter eta.
+    """
+    if not e_lab > 0 or not a_proj > 0 or not a_targ > 0:
+        raise InputError('e_lab, a_proj and a_targ must be positive')
+    e_cm = e_lab * a_targ / (a_proj + a_targ)
+    mu = mu_c2 * a_proj * a_targ / (a_proj + a_targ)
+    k = sqrt(2 * mu * e_cm) / hbc
+    eta = z_proj * z_targ * e2 * mu / hbc / hbc / k
+    return e_cm, mu, k, eta
+
+def channel(k, eta, r_match, h=None, l_max=None):
+    """
+    The Numerov mesh R = h ... r_match, the matching points n1 < n2 and
+    the Coulomb functions at R[n1] and R[n2] (see coulomb_fg).
+    """
+    h = min(0.05, 0.1 / k) if h is None else h
+    l_max = int(ceil(k * r_match)) + 20 if l_max is None else l_max
+    n2 = int(round(r_match / h)) - 1
+    n1 = n2 - 5
+    R = h * arange(1, n2 + 2)
+    F1, G1, _, _ = coulomb_fg(eta, k * R[n1], l_max)
+    F2, G2, _, _ = coulomb_fg(eta, k * R[n2], l_max)
+    return R, arange(l_max + 1), n1, n2, (F1, G1, F2, G2)
+
+def s_matrix(v, R, L, k2, n1, n2, fg):
+    """
+    The S-matrix of v = 2 mu U(R) / hbar^2 on the mesh of channel.
+    """
+    F1, G1, F2, G2 = fg
+    ratio = numerov(v, R, L, k2, n1, n2)
+    # u = A (H-(kR) - S H+(kR)), H+- = G +- iF
+    S = ((G1 - 1j * F1) - ratio * (G2 - 1j * F2)) / ((G1 + 1j * F1) - ratio * (G2 + 1j * F2))
+    if not isfinite(S).all():
+        raise InputError('the S-matrix is not finite: check r_match, h and l_max')
+    return S
+
+def cross_sections(S, sigma, k, eta, theta, identical=False):
+    """
+    dsigma/dOmega (mb/sr) at theta (degrees) and its ratio to the
+    Rutherford (Mott for identical bosons) cross section.
+    """
+    t = radians(theta)
+    f_c, f_n = amplitudes(S, sigma, k, eta, t)
+    f = f_c + f_n
+    f_r = f_c
+    if identical:
+        f_c2, f_n2 = amplitudes(S, sigma, k, eta, pi - t)
+        f = f + f_c2 + f_n2
+        f_r = f_c + f_c2
+    # fm^2 = 10 mb
+    return 10 * abs(f) ** 2, abs(f) ** 2 / abs(f_r) ** 2
+
+def reaction_cross_section(S, k):
+    """
+    sigma_r (mb)
+    """
+    L = arange(len(S))
+    return 10 * pi / k / k * ((2 * L + 1) * (1 - abs(S) ** 2)).sum()
+
+def elastic(e_lab, a_proj, a_targ, z_proj, z_targ, u_nuc, u_coul=None, n_r=1.0, w=None,
+            theta=None, r_match=None, h=None, l_max=None, identical=False):
+    """
+    Elastic scattering with the optical potential
+    U(R) = n_r u_nuc(R) + i W(R) + u_coul(R)
+
+    u_nuc   : the result of a folding function, a Potential or the values on R
+    u_coul  : u_coul_ucs(R, ...) (values on the mesh of u_nuc), u_coul_bifold_d(...)
+              or a Potential, None: the point Coulomb potential
+    w       : a number (W = w u_nuc), a function W(R) (e.g. woods_saxon) or None (W = 0)
+    theta   : c.m. angles (degrees)
+    r_match : the matching radius (fm), R_max of u_nuc by default
+    h       : the Numerov step (fm), min(0.05, 0.1 / k) by default
+    l_max   : the highest partial wave, k r_match + 20 by default
+    identical: symmetrised amplitudes of identical bosons, the ratio is to Mott
+
+    Returns
+    -------
+    dict
+        ``L``, ``S`` (S-matrix), ``sigma`` (Coulomb phases), ``theta`` (degrees),
+        ``dsigma`` (mb/sr), ``ratio`` (to Rutherford / Mott), ``sigma_r`` (reaction, mb),
+        ``k`` (fm^-1), ``eta``, ``e_cm`` (MeV)
+    """
+    e_cm, mu, k, eta = kinematics(e_lab, a_proj, a_targ, z_proj, z_targ)
+    nuc = as_potential(u_nuc)
+    coul = None if u_coul is None else as_potential(u_coul, nuc.R, tail='coulomb')
+    theta = arange(1.0, 180.0, 1.0) if theta is None else asarray(theta, dtype=float)
+
+    r_match = nuc.R_max if r_match is None else r_match
+    R, L, n1, n2, fg = channel(k, eta, r_match, h, l_max)
+
+    U = n_r * nuc(R) + 0j
+    if w is not None:
+        U = U + 1j * (w(R) if callable(w) else w * nuc(R))
+    U = U + (z_proj * z_targ * e2 / R if coul is None else coul(R))
+    S = s_matrix(2 * mu / hbc / hbc * U, R, L, k * k, n1, n2, fg)
+    sigma = coulomb_phases(eta, L[-1])
+    dsigma, ratio = cross_sections(S, sigma, k, eta, theta, identical)
+    return {'L': L, 'S': S, 'sigma': sigma, 'theta': theta, 'dsigma': dsigma, 'ratio': ratio,
+            'sigma_r': reaction_cross_section(S, k), 'k': k, 'eta': eta, 'e_cm': e_cm}
+
+def chi2(y_calc, y_data, dy):
+    """
+    chi^2 per point of the calculated cross sections (or ratios)
+    and the measured ones with their errors.
+    """
+    y_calc, y_data, dy = asarray(y_calc), asarray(y_data), asarray(dy)
+    return float((((y_calc - y_data) / dy) ** 2).mean())
@@ -21,7 +21,7 @@ Simpson's integrations.
 """
 
 from ..time_check import timer
-from numpy import (sum)
+from numpy import (sum, zeros)
 from numba import njit
 from ..matematik import *
 
@@ -36,46 +36,169 @@ def simpson(f, r):
     using Simpson 1/3 rule.
     """
     dr = r[1] - r[0]
-    f_even = sum(f[:-1][2::2])
-    f_odd  = sum(f[1::2])
+    n = f.shape[0]
+    f_even = 0.0
+    f_odd = 0.0
+    for i in range(1, n - 1, 2):
+        f_odd += f[i]
+    for i in range(2, n - 1, 2):
+        f_even += f[i]
     return (f[0] + 2*f_even + 4*f_odd + f[-1]) * dr/3
 
+def integrate(f, r):
+    """
+    Calculates integrate of f function(s) over r using the quadrature
+    weights of the r mesh (see mesh_weights): Simpson 1/3 rule for a
+    uniform mesh and, e.g., Gauss-Legendre for a mesh_gl() mesh.
+    f could be a single function or a stack of functions (Nf x Nr).
+    """
+    return f @ mesh_weights(r)
+
+def simpson_batch(f, r):
+    """
+    Calculates integrate of f function(s) over r
+    using Simpson 1/3 rule along the last axis of f.
+    f could be a single function or a stack of functions (Nf x Nr).
+    """
+    return f @ simpson_weights(r)
+
 @njit
-def fourier_with_simpson(f, r, q, n=0):
+def _fourier_kernel(r, w, q, n=0):
+    w_r2 = w * r*r
+    kernel = q.reshape(-1, 1) * r.reshape(1, -1)
+    for i in range(q.shape[0]):
+        kernel[i, :] = w_r2 * j_n(n, q[i] * r)
+    return kernel
+
+def fourier_kernel(r, q, n=0):
+    """
+    Kernel matrix of the Fourier transform:
+    K[i, j] = w[j] * r[j]^2 * j_n(n, q[i] r[j])
+    so that fourier_with_simpson(f, r, q) == K @ f.
+    w are the quadrature weights of the r mesh, see mesh_weights().
+    """
+    return _fourier_kernel(r, mesh_weights(r), q, n)
+
+def fourier_with_simpson_batch(f, r, q, n=0):
+    """
+    Fourier transforms of a stack of functions (Nf x Nr) at once
+    with a single matrix product. Returns a (Nf x Nq) array.
+    """
+    return f @ fourier_kernel(r, q, n).T
+
+# Transforms with the quadrature weights of the meshes.
+# Simpson 1/3 weights are used for the uniform meshes.
+@njit
+def _fourier_w(f, r, w, q, n=0):
     fq = q.copy()
-    fr2 = f * r*r
+    fr2 = f * r*r * w
     for i in range(*fq.shape):
         qr = q[i] * r
-        fq[i] = simpson(fr2 * j_n(n, qr), r)
+        fq[i] = sum(fr2 * j_n(n, qr))
     return fq
 
-# @timer
+# Fused L=0 kernels: the quadrature weight, the function and sin(x)/x
+# are applied in a single pass without temporary arrays.
 @njit
-def u_ex_with_simpson(dGRs, k, vnn_ex, R, s, n=0):
+def _fourier_w0(f, r, w, q):
+    nr = r.shape[0]
+    fq = zeros(q.shape[0])
+    for i in range(q.shape[0]):
+        qi = q[i]
+        acc = 0.0
+        for j in range(nr):
+            acc += f[j] * r[j] * r[j] * w[j] * j_0_scalar(qi * r[j])
+        fq[i] = acc
+    return fq
+
+@njit
+def _u_ex_w0(dGRs, k, vnn_ex, R, s, w):
+    ns = s.shape[0]
+    u0_ex = zeros(R.shape[0])
+    for iR in range(R.shape[0]):
+        kR = k[iR]
+        acc = 0.0
+        for j in range(ns):
+            acc += dGRs[iR, j] * vnn_ex[j] * s[j] * s[j] * w[j] * j_0_scalar(kR * s[j])
+        u0_ex[iR] = acc
+    return u0_ex
+
+@njit
+def _fqs_w0(fr2, r, w, g, s, q, f_tab, df_tab, dx_tab):
+    nr, ns, nq = r.shape[0], s.shape[0], q.shape[0]
+    fqs = zeros((nq, ns))
+    # the only work array, reused for all s
+    f_s = zeros(nr)
+    for js in range(ns):
+        sj = s[js]
+        for ir in range(nr):
+            if dx_tab > 0:
+                j_hat = j_hat_1_interp(g[ir] * sj, f_tab, df_tab, dx_tab)
+            else:
+                j_hat = j_hat_1_scalar(g[ir] * sj)
+            f_s[ir] = fr2[ir] * r[ir] * r[ir] * w[ir] * j_hat
+        for iq in range(nq):
+            qi = q[iq]
+            acc = 0.0
+            for ir in range(nr):
+                acc += f_s[ir] * j_0_scalar(qi * r[ir])
+            fqs[iq, js] = acc
+    return fqs
+
+@njit
+def _gRs_w0(dFqs, R, s, q, w):
+    nR, ns, nq = R.shape[0], s.shape[0], q.shape[0]
+    grs = zeros((nR, ns))
+    for i in range(nR):
+        Ri = R[i]
+        for iq in range(nq):
+            c = q[iq] * q[iq] * w[iq] * j_0_scalar(q[iq] * Ri)
+            for j in range(ns):
+                grs[i, j] += dFqs[iq, j] * c
+    return grs
+
+def fourier_with_simpson(f, r, q, n=0):
+    if n == 0:
+        return _fourier_w0(f, r, mesh_weights(r), q)
+    return _fourier_w(f, r, mesh_weights(r), q, n)
+
+@njit
+def _u_ex_w(dGRs, k, vnn_ex, R, s, w, n=0):
     u0_ex = R.copy()
-    vnn_ex_s2 = vnn_ex * s*s
+    vnn_ex_s2 = vnn_ex * s*s * w
     for iR in range(*u0_ex.shape):
         ks = k[iR]*s
-        u0_ex[iR] = simpson(dGRs[iR, :] * vnn_ex_s2 * j_n(n, ks), s)
+        u0_ex[iR] = sum(dGRs[iR, :] * vnn_ex_s2 * j_n(n, ks))
     return u0_ex
 
 # @timer
-@njit
-def fqs_with_simpson(fr2, r, g, s, q):
-    fqs = q.reshape(-1, 1) * s.reshape(1, -1)
-    _, ns = fqs.shape
-    for j in range(ns):
-        fqs[:, j] = fourier_with_simpson(fr2 * j_hat_1(g * s[j]), r, q)
-    return fqs
+def u_ex_with_simpson(dGRs, k, vnn_ex, R, s, n=0):
+    if n == 0:
+        return _u_ex_w0(dGRs, k, vnn_ex, R, s, mesh_weights(s))
+    return _u_ex_w(dGRs, k, vnn_ex, R, s, mesh_weights(s), n)
 
 # @timer
+def fqs_with_simpson(fr2, r, g, s, q, table_dx=None):
+    """
+    table_dx: j_hat_1 is interpolated from a table with this step
+              (see j_hat_1_table) instead of being calculated
+    """
+    f_tab, df_tab = j_hat_1_table(abs(g).max() * abs(s).max(), table_dx) if table_dx else (zeros(0), zeros(0))
+    return _fqs_w0(fr2, r, mesh_weights(r), g, s, q, f_tab, df_tab, table_dx or 0.0)
+
 @njit
-def gRs_with_simpson(dFqs, R, s, q, n=0):
+def _gRs_w(dFqs, R, s, q, w, n=0):
     grs = R.reshape(-1, 1) * s.reshape(1, -1)
     nr, ns = grs.shape
-    q2 = q * q
+    q2 = q * q * w
     for i in range(nr):
         qR = q * R[i]
         for j in range(ns):
-            grs[i, j] = simpson( dFqs.T[j, :] * q2 * j_n(n, qR), q)
-    return grs
\ No newline at end of file
+            grs[i, j] = sum( dFqs.T[j, :] * q2 * j_n(n, qR))
+    return grs
+
+# @timer
+def gRs_with_simpson(dFqs, R, s, q, n=0):
+    if n == 0:
+        return _gRs_w0(dFqs, R, s, q, mesh_weights(q))
+    return _gRs_w(dFqs, R, s, q, mesh_weights(q), n)
@@ -1,5 +1,10 @@
 from time import perf_counter
-from numpy import log10, array, where
+from numpy import log10, array, where, ndarray
+from contextlib import contextmanager
+from functools import wraps
+from inspect import signature
+import json
+from .memory_check import MemoryTracker
 
 def convert_time(time_second):
     exponent = round(log10(time_second))
@@ -48,6 +53,193 @@ def timer_str(f):
     print(end - start)
     return result
 
+#..........................................................................#
+#******** Profiling of the folding calculations *********#
+#..........................................................................#
+
+# the profiling is switched on and off at runtime, see profile_on()
+_profiling = False
+_memory = False
+# the profile of the running calculation, None outside the calculations
+_profile = None
+_last_report = None
+
+class Profile:
+    """
+    Records the stages of a calculation: the wall-clock time and the number
+    of calls of each stage, the counters (e.g. the transforms of each kind)
+    and the mesh sizes. The stages are nested, e.g.
+    'u_xdm3yn_fr/u_xdm3yn_ex_fr/fqs' is the fqs transforms of the exchange part.
+    memory: the peak memory of each stage and the large arrays are recorded, see MemoryTracker
+    """
+    def __init__(self, memory=False):
+        self.memory = MemoryTracker() if memory else None
+        self.stages = {}
+        self.counts = {}
+        self.meshes = {}
+        self.path = []
+        self.start = perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        self.path.append(name)
+        key = '/'.join(self.path)
+        stage = self.stages.setdefault(key, {'time': 0.0, 'calls': 0})
+        if self.memory is not None:
+            self.memory.enter(key)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            stage['time'] += perf_counter() - start
+            stage['calls'] += 1
+            if self.memory is not None:
+                self.memory.exit(key)
+            self.path.pop()
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def mesh_sizes(self, **meshes):
+        for name, mesh in meshes.items():
+            if isinstance(mesh, ndarray):
+                self.meshes.setdefault(name, int(mesh.shape[-1]))
+
+    def track(self, **arrays):
+        if self.memory is not None:
+            self.memory.track('/'.join(self.path), **arrays)
+
+    def report(self):
+        report = {'time': perf_counter() - self.start,
+                  'stages': {k: dict(v) for k, v in self.stages.items()},
+                  'counts': dict(self.counts),
+                  'meshes': dict(self.meshes)}
+        if self.memory is not None:
+            report['memory'] = self.memory.report()
+        return report
+
+
+def profile_on(memory=False):
+    """
+    Switches the profiling on: every folding calculation attaches its
+    report (see Profile.report) to its result as result['profile'].
+    memory: the peak memory of each stage is recorded with tracemalloc
+            (slower), see memory_check.py
+    """
+    global _profiling, _memory
+    _profiling = True
+    _memory = memory
+
+def profile_off():
+    global _profiling, _memory
+    _profiling = False
+    _memory = False
+
+@contextmanager
+def profiling(memory=False):
+    """
+    with profiling():
+        u = u_xdm3yn_fr(...)
+    print_profile(u['profile'])
+    """
+    state = _profiling, _memory
+    profile_on(memory)
+    try:
+        yield
+    finally:
+        if state[0]:
+            profile_on(state[1])
+        else:
+            profile_off()
+
+def last_profile():
+    """
+    Returns the report of the last profiled calculation.
+    """
+    return _last_report
+
+@contextmanager
+def stage(name):
+    """
+    A stage of the running calculation, nothing is recorded if the profiling is off.
+    """
+    if _profile is None:
+        yield
+    else:
+        with _profile.stage(name):
+            yield
+
+def count(name, n=1):
+    if _profile is not None:
+        _profile.count(name, n)
+
+def track_arrays(**arrays):
+    """
+    Adds the sizes of the arrays to the running stage (memory profiling only).
+    """
+    if _profile is not None:
+        _profile.track(**arrays)
+
+def profiled(func):
+    """
+    Records func as a stage of the running calculation together with the
+    sizes of its meshes (r, q, R, s). The outermost profiled function
+    attaches the report to its result as result['profile'].
+    """
+    func_signature = signature(func)
+    mesh_names = [m for m in ('r', 'q', 'R', 's') if m in func_signature.parameters]
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        global _profile, _last_report
+        if not _profiling:
+            return func(*args, **kwargs)
+
+        outermost = _profile is None
+        if outermost:
+            _profile = Profile(memory=_memory)
+        try:
+            arguments = func_signature.bind_partial(*args, **kwargs).arguments
+            _profile.mesh_sizes(**{m: arguments.get(m) for m in mesh_names})
+            with _profile.stage(func.__name__):
+                result = func(*args, **kwargs)
+            if outermost:
+                _last_report = _profile.report()
+                if isinstance(result, dict):
+                    result['profile'] = _last_report
+        finally:
+            if outermost:
+                if _profile.memory is not None:
+                    _profile.memory.stop()
+                _profile = None
+        return result
+    return inner
+
+def print_profile(report):
+    print(f"total: {convert_time(report['time'])}")
+    print(f"meshes: " + ', '.join(f'{m} = {n}' for m, n in report['meshes'].items()))
+    for name, stage in report['stages'].items():
+        depth = name.count('/')
+        print(f"{'  ' * depth}{name.split('/')[-1]:<{32 - 2 * depth}s} {convert_time(stage['time'])} {stage['calls']:6d} calls")
+    for name, n in report['counts'].items():
+        print(f'{name}: {n}')
+    if 'memory' in report:
+        memory = report['memory']
+        print(f"peak memory: {memory['peak'] / 2**20:10.3f} MB")
+        for name, stage in memory['stages'].items():
+            depth = name.count('/')
+            print(f"{'  ' * depth}{name.split('/')[-1]:<{32 - 2 * depth}s} {stage['peak'] / 2**20:10.3f} MB"
+                  f" (+{stage['increase'] / 2**20:.3f} MB)")
+        for name, arrays in memory['arrays'].items():
+            print(f"{name}: " + ', '.join(f'{a} = {b / 2**20:.3f} MB' for a, b in arrays.items()))
+
+def save_profile(report, path):
+    """
+    Saves the report as a JSON file.
+    """
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
 if __name__=='__main__':
     @time_it()
     def for_loop():
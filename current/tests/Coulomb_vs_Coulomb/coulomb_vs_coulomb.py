@@ -33,4 +33,8 @@ rho_t_ch = f_3prm_fermi(r, 0.084933, -0.161/3.766**2, 3.766, 0.586)
 v_coul = v_coulomb(r)
 u_coul_df = u_coul_bifold_d(rho_p_ch, rho_t_ch, v_coul, r, q, R, s)
 print_all(u_coul_df, r, q, title='Coulomb potential using double folding model.')
-plot_potentials([u_coul, u_coul_df], R)
\ No newline at end of file
+
+# folding in momentum space with the exact long range tail
+u_coul_dfq = u_coul_bifold_q(rho_p_ch, rho_t_ch, r, q, R, s)
+print_all(u_coul_dfq, r, q, title='Coulomb potential using double folding model in momentum space.')
+plot_potentials([u_coul, u_coul_df, u_coul_dfq], R)
\ No newline at end of file
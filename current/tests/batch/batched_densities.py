@@ -0,0 +1,30 @@
+from bifold import *
+from bifold.errors import InputError
+
+# a stack of projectile densities (see batch_params) against the samples
+# calculated one by one, the Potentials of the samples and print_all
+r = mesh(zero, 15, 0.1)  # fm
+q = mesh(zero, 4, 0.05)  # fm^-1
+R = r
+vnn = f_yukawa(r, 7999., 4., 4.)
+radii = [2.4, 2.6, 2.8]
+rho_t = f_2prm_fermi(r, 0.169, 3.60, 0.523)
+
+u_batch = u_bifold_d(f_2prm_fermi(r, 0.1, array(radii), 0.45), rho_t, vnn, r, q)
+u_single = [u_bifold_d(f_2prm_fermi(r, 0.1, radius, 0.45), rho_t, vnn, r, q) for radius in radii]
+
+u_R_batch = u_batch['func_r']['u_R']
+u_R_single = array([u['func_r']['u_R'] for u in u_single])
+# the spline of each sample between the mesh points
+R_mid = R[:-1] + 0.05
+pot_batch = array([pot(R_mid) for pot in u_batch['potential']])
+pot_single = array([u['potential'](R_mid) for u in u_single])
+for i, radius in enumerate(radii):
+    print(f'R_p = {radius}  max|u_batch - u_single| = {abs(u_R_batch[i] - u_R_single[i]).max():10.4e}')
+
+try:
+    print_all(u_batch, r, q)
+except InputError as error:
+    print(f'print_all: {error}')
+else:
+    raise AssertionError('print_all printed a stack of potentials')
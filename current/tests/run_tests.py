@@ -1,13 +1,216 @@
+"""
+Runs the test scripts headless (Agg) in a process pool and compares
+their results numerically with the references:
+DFPOT calculations (bifold_vs_dfpot/.../dfpot_calc), analytical foldings
+and the digitized figures of the publications (f_extrapolate).
+
+python run_tests.py                  # all the scripts except the ones using the internet
+python run_tests.py --network        # including the scripts using f_ripl/f_internet
+python run_tests.py PhysRevC49 dfpot # only the scripts whose paths include the words
+python run_tests.py --json runtimes.json --workers 4
+
+A check passes if max|u - u_ref| <= atol + rtol * max|u_ref| in the R window.
+The tolerances of the digitized figures are wide, since the figures are read
+by eye (Engauge Digitizer) and fitted by polynomials. The direct and exchange
+parts of DFPOT differ by ~1 % (mostly near R = 0), their sums agree better.
+"""
+
 import os
-from bifold import print_title
-
-workdir = os.getcwd()
-for dirpath, dnames, fnames in os.walk("."):
-    for fname in fnames:
-        if fname.endswith(".py") and 'run_test' not in fname:
-            test_file = os.path.join(dirpath, fname)
-            print_title(title=test_file)
-            os.chdir(dirpath)
-            os.system(f'python {fname}')
-            os.chdir(workdir)
+import sys
+import json
+import argparse
+import traceback
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+# the scripts reading the nuclear densities from the internet
+network_scripts = ['NPA384_1982_65/alpha_58Ni_172_5MeV.py',
+                   'templates/python_files/input_bifold_plot_all.py',
+                   'templates/python_files/input_bifold_ddm3y.py']
+
+def check(label, value, reference, window=(0.1, 7.5), atol=0.0, rtol=0.0, R='R'):
+    return {'label': label, 'value': value, 'reference': reference, 'window': window,
+            'atol': atol, 'rtol': rtol, 'R': R}
+
+total, direct, exchange = "['func_r']['total']['u_R']", "['func_r']['direct']['u_R']", "['func_r']['exchange']['u_R']"
+
+# the numerical checks of each script: expressions evaluated in the namespace of the script
+checks = {
+    'batch/batched_densities.py': [
+        check(f'{label} sample {i} vs one by one', f'{batch}[{i}]', f'{single}[{i}]', (0.0, 15.0), atol=1e-10, rtol=1e-12,
+              R='R' if batch == 'u_R_batch' else 'R_mid')
+        for batch, single, label in (('u_R_batch', 'u_R_single', 'u_R'), ('pot_batch', 'pot_single', 'potential'))
+        for i in range(3)],
+    'bifold_vs_dfpot/a_40Ca_m3y_reid_paris/a_40Ca_141_7MeV.py': [
+        check('reid total vs dfpot',     'u1' + total,    'u1_dfpot.value',   (0.0, 10.0), atol=0.05, rtol=3e-3),
+        check('reid direct vs dfpot',    'u1' + direct,   'u1_dfpot_d.value', (0.0, 10.0), atol=0.1, rtol=1.5e-2),
+        check('reid exchange vs dfpot',  'u1' + exchange, 'u1_dfpot_e.value', (0.0, 10.0), atol=0.1, rtol=1.5e-2),
+        check('paris total vs dfpot',    'u2' + total,    'u2_dfpot.value',   (0.0, 10.0), atol=0.05, rtol=3e-3),
+        check('paris direct vs dfpot',   'u2' + direct,   'u2_dfpot_d.value', (0.0, 10.0), atol=0.1, rtol=1.5e-2),
+        check('paris exchange vs dfpot', 'u2' + exchange, 'u2_dfpot_e.value', (0.0, 10.0), atol=0.1, rtol=1.5e-2)],
+    'bifold_vs_dfpot/analytical_vs_numeric/alpha_alpha_gaussian/alpha_alpha.py': [
+        check('direct vs dfpot',        "u3['func_r']['u_R']", 'u2.value', (0.0, 10.0), atol=0.01, rtol=1e-3),
+        check('direct vs Buck et al.',  "u3['func_r']['u_R']", 'u1.value', (0.0, 10.0), atol=0.01, rtol=5e-3)],
+    'bifold_vs_dfpot/analytical_vs_numeric/yukawa/yukawa_function.py': [
+        # u_bf2 (q_max = 3) shows the truncation error of a short q mesh, it is not checked
+        check('q_max = 10 vs analytic', "u_bf1['func_r']['u_R']", 'u_f1 + u_f2', (0.0, 5.0), atol=0.05, rtol=1e-2, R='r')],
+    'Coulomb_vs_Coulomb/coulomb_vs_coulomb.py': [
+        check('bifold_q vs bifold_d',   "u_coul_dfq['func_r']['u_R']", "u_coul_df['func_r']['u_R']", (0.0, 10.0), atol=0.1, rtol=1e-3),
+        check('bifold_q vs ucs (tail)', "u_coul_dfq['func_r']['u_R']", 'u_coul()', (8.0, 10.0), atol=0.01, rtol=1e-3)],
+    'PhysLettB342_1995_6/a_40Ca_bdm3y1_141_7MeV.py': [
+        check('paris total vs fig. 1',    'u_paris' + total,    'u_fig1_total',      atol=5.0, rtol=0.05),
+        check('paris direct vs fig. 1',   'u_paris' + direct,   'u_fig1_paris_d',    atol=5.0, rtol=0.05),
+        check('paris exchange vs fig. 1', 'u_paris' + exchange, 'u_fig1_paris_exch', atol=5.0, rtol=0.05),
+        check('reid direct vs fig. 1',    'u_reid' + direct,    'u_fig1_reid_d',     atol=5.0, rtol=0.05),
+        check('reid exchange vs fig. 1',  'u_reid' + exchange,  'u_fig1_reid_exch',  atol=5.0, rtol=0.05)],
+    'PhysRevC49_1994_1652/fig2/o16o16_bdm3y1.py': [
+        check('total vs fig. 2', 'u_bdm3y1' + total, 'u_fig1_bdm3y1_t', atol=5.0, rtol=0.05)],
+    'PhysRevC49_1994_1652/fig2/o16o16_ddm3y1.py': [
+        check('total vs fig. 2', 'u_ddm3y1' + total, 'u_fig1_ddm3y1_t', atol=5.0, rtol=0.05)],
+    'PhysRevC49_1994_1652/fig5/o16o16_ddm3y1.py': [
+        check(f'total vs fig. 5 at {e} MeV', f'u_ddm3y1[{e}]' + total, f'u_fig1_ddm3y1_t[{e}]', atol=5.0, rtol=0.05)
+        for e in (160, 480, 960, 1440)],
+    'PhysRevLett74_1995_34/o16o16_bdm3y1.py': [
+        check(f'{part} vs fig. 1', 'u_bdm3y1' + path, f'u_fig1_bdm3y1_{part[0]}', atol=5.0, rtol=0.05)
+        for part, path in (('direct', direct), ('exchange', exchange), ('total', total))],
+    'PhysRevLett74_1995_34/o16o16_ddm3y1.py': [
+        check(f'{part} vs fig. 1', 'u_ddm3y1' + path, f'u_fig1_ddm3y1_{part[0]}', atol=5.0, rtol=0.05)
+        for part, path in (('direct', direct), ('exchange', exchange), ('total', total))],
+    'PhysRevLett74_1995_34/o16o16_bdm3yn.py': [
+        check(f'{dd} {part} vs fig. 1', f'u_{dd}' + path, f'u_fig1_{dd}_{part[0]}', atol=5.0, rtol=0.05)
+        for dd in ('bdm3y1', 'bdm3y2', 'bdm3y3')
+        for part, path in (('direct', direct), ('exchange', exchange), ('total', total))],
+    'PhysRevC56_1997_954/fig5/a_40Ca_bdm3y1_104MeV.py': [
+        check('total vs fig. 5', 'u_bdm3y1' + total, 'u_fig5_bdm3y1_t', (0.1, 5.0), atol=5.0, rtol=0.05)],
+    'PhysRevC56_1997_954/fig5/a_40Ca_cdm3y6_104MeV.py': [
+        check(f'{dd} total vs fig. 5', f'u_{dd}' + total, f'u_fig5_{dd}_t', (0.1, 5.0), atol=5.0, rtol=0.05)
+        for dd in ('cdm3y6', 'cdm3y4', 'cdm3y2', 'ddm3y1')],
+    'PhysRevC63_2001_034007/a_12C_cdm3y6_120MeV.py': [
+        check('total vs fig. 2', 'u_cdm3y6' + total, 'u_fig2_cdm3y6_t', atol=5.0, rtol=0.05)],
+    'scattering/coulomb_scattering.py': [
+        check('point Coulomb |S - 1|',     "1 + abs(el['S'] - 1)", '1 + 0*L', (0, 1e4), atol=1e-4, R='L'),
+        check('point Coulomb vs Mott',     "el['ratio']", '1 + 0*theta', (0, 180), atol=1e-4, R='theta'),
+        check('F_L (eta = 0) vs Bessel',   'F', 'F_bessel', (0, 10), atol=1e-10, R='l'),
+        check('G_L (eta = 0) vs Bessel',   'G', 'G_bessel', (0, 10), atol=1e-10, R='l'),
+        check('Wronskian of F_L and G_L',  'wronskian', '1 + 0*L', (0, 1e4), atol=1e-10, R='L')],
+    'sensitivity/density_derivatives.py': [
+        check(f'{name}{label} vs central differences', f'{du}[{i}]', f'{du}_fd[{i}]', (0.0, 15.0), atol=1e-5, rtol=1e-6)
+        for du, label in (('du', ''), ('du_norm', ' norm'))
+        for i, name in enumerate(['p V0', 'p R', 'p a', 't V0', 't R', 't a'])
+        # the V0 derivatives of the normalised densities are zero
+        if not (du == 'du_norm' and 'V0' in name)],
+}
+
+def find_scripts(words=(), network=False):
+    scripts = []
+    for dirpath, dnames, fnames in os.walk(test_dir):
+        dnames.sort()
+        for fname in sorted(fnames):
+            script = os.path.relpath(os.path.join(dirpath, fname), test_dir).replace(os.sep, '/')
+            if not fname.endswith('.py') or 'run_test' in fname or '.ipynb_checkpoints' in script:
+                continue
+            if script in network_scripts and not network:
+                continue
+            if words and not any(w in script for w in words):
+                continue
+            scripts.append(script)
+    return scripts
+
+def compare(namespace, c):
+    from numpy import asarray, abs, isfinite
+    from bifold.metrics import r_window
+
+    value = asarray(eval(c['value'], namespace), dtype=float)
+    reference = asarray(eval(c['reference'], namespace), dtype=float)
+    mask = r_window(asarray(namespace[c['R']]), *c['window'])
+    diff = abs(value - reference)[mask]
+    ref_max = abs(reference[mask]).max()
+    max_abs = float(diff.max())
+    tol = c['atol'] + c['rtol'] * ref_max
+    return {'label': c['label'], 'max_abs': max_abs, 'max_rel': max_abs / ref_max, 'tol': float(tol),
+            'ok': bool(isfinite(value[mask]).all() and max_abs <= tol)}
+
+def run_script(script):
+    """
+    Runs a script in its directory without showing the figures and returns
+    the checks and the run time. The output of the script is kept in the log.
+    """
+    import io
+    import runpy
+    import contextlib
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    path = os.path.join(test_dir, script)
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    log = io.StringIO()
+    result = {'script': script, 'ok': True, 'error': None, 'checks': []}
+
+    start = perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            namespace = runpy.run_path(path, run_name='__main__')
+    except BaseException:
+        # quit() in a script raises SystemExit
+        result.update(ok=False, error=traceback.format_exc(limit=3))
+        namespace = None
+    finally:
+        os.chdir(cwd)
+    result['time'] = perf_counter() - start
+    plt.close('all')
+
+    if namespace is not None:
+        for c in checks.get(script, []):
+            try:
+                result['checks'].append(compare(namespace, c))
+            except Exception:
+                result['checks'].append({'label': c['label'], 'ok': False, 'error': traceback.format_exc(limit=1)})
+        result['ok'] = all(c['ok'] for c in result['checks'])
+    result['log'] = log.getvalue()[-2000:]
+    return result
+
+def print_result(result):
+    status = 'ok' if result['ok'] else 'FAILED'
+    print(f"{status:<7s}{result['time']:9.2f} s  {result['script']}")
+    for c in result['checks']:
+        if 'max_abs' in c:
+            print(f"{'ok' if c['ok'] else 'FAILED':>14s}  {c['label']:<32s} max|diff| = {c['max_abs']:9.3e}"
+                  f"  rel = {c['max_rel']:9.3e}  tol = {c['tol']:9.3e}")
+        else:
+            print(f"{'FAILED':>14s}  {c['label']:<32s}\n{c['error']}")
+    if result['error']:
+        print(result['error'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='bifold test scripts')
+    parser.add_argument('words', nargs='*', help='run only the scripts whose paths include the words')
+    parser.add_argument('--network', action='store_true', help='include the scripts using the internet')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--json', default=None, help='JSON file of the checks and the run times')
+    args = parser.parse_args(argv)
+
+    scripts = find_scripts(args.words, args.network)
+    start = perf_counter()
+    results = []
+    # a new process for each script where it is supported (Python >= 3.11),
+    # otherwise the processes are reused and run_script restores the working directory
+    isolated = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=args.workers, **isolated) as pool:
+        for result in pool.map(run_script, scripts):
+            print_result(result)
+            results.append(result)
+    wall = perf_counter() - start
+
+    n_failed = sum(not r['ok'] for r in results)
+    print(f'\n{len(results) - n_failed} passed, {n_failed} failed in {wall:.2f} s')
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'wall_time': wall, 'results': results}, f, indent=2)
+    return 1 if n_failed else 0
 
+if __name__ == '__main__':
+    sys.exit(main())
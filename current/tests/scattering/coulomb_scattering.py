@@ -0,0 +1,21 @@
+from bifold import *
+from numpy import arange, array, abs
+from scipy.special import spherical_jn, spherical_yn
+
+# 16O + 16O at 250 MeV without the nuclear potential:
+# the point Coulomb potential gives S_L = 1 and the Mott cross section
+r = mesh(zero, 20, 0.1)  # fm
+el = elastic(250., 16, 16, 8, 8, Potential(r, 0*r), identical=True)
+L, theta = el['L'], el['theta']
+print(f"k = {el['k']:.4f} fm^-1, eta = {el['eta']:.4f}, max|S - 1| = {abs(el['S'] - 1).max():.3e}")
+
+# eta = 0: F_L and G_L are the Riccati-Bessel functions
+l = arange(6)
+rho = 7.3
+F, G, dF, dG = coulomb_fg(0.0, rho, 5)
+F_bessel = rho*spherical_jn(l, rho)
+G_bessel = -rho*spherical_yn(l, rho)
+
+# the Wronskian F'G - FG' = 1 with the Coulomb field
+F2, G2, dF2, dG2 = coulomb_fg(el['eta'], el['k']*r[-1], L[-1])
+wronskian = dF2*G2 - F2*dG2
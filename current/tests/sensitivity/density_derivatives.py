@@ -0,0 +1,42 @@
+from bifold import *
+from numpy import array
+
+# derivatives of the direct potential with respect to the density
+# parameters (du_bifold_d) against the central differences of u_bifold_d
+r = mesh(zero, 15, 0.1)  # fm
+q = mesh(zero, 4, 0.05)  # fm^-1
+vnn = f_yukawa(r, 7999., 4., 4.)
+p_prm, t_prm = (0.1, 2.6, 0.45), (0.169, 3.60, 0.523)
+
+def u_R(p, t, norm):
+    return u_bifold_d(f_2prm_fermi(r, *p, norm=norm), f_2prm_fermi(r, *t, norm=norm), vnn, r, q)['func_r']['u_R']
+
+def central_differences(norm, e=1e-6):
+    du = []
+    for i in range(3):
+        p1, p2 = list(p_prm), list(p_prm)
+        p1[i] += e
+        p2[i] -= e
+        du.append((u_R(p1, t_prm, norm) - u_R(p2, t_prm, norm))/2/e)
+    for i in range(3):
+        t1, t2 = list(t_prm), list(t_prm)
+        t1[i] += e
+        t2[i] -= e
+        du.append((u_R(p_prm, t1, norm) - u_R(p_prm, t2, norm))/2/e)
+    return array(du)
+
+def jacobian(norm):
+    u = du_bifold_d(f_2prm_fermi(r, *p_prm, norm=norm), f_2prm_fermi(r, *t_prm, norm=norm), vnn, r, q,
+                    density_derivatives(f_2prm_fermi, r, *p_prm, norm=norm),
+                    density_derivatives(f_2prm_fermi, r, *t_prm, norm=norm))
+    return u['jacobian']['du_R']
+
+R = r
+du = jacobian(None)
+du_fd = central_differences(None)
+# normalised densities (the V0 derivatives are zero)
+du_norm = jacobian(16)
+du_norm_fd = central_differences(16)
+for i, name in enumerate(['p V0', 'p R', 'p a', 't V0', 't R', 't a']):
+    print(f'{name:5s} max|du_R| = {abs(du[i]).max():10.4e}   max|du_R - fd| = {abs(du[i] - du_fd[i]).max():10.4e}'
+          f'   norm: {abs(du_norm[i] - du_norm_fd[i]).max():10.4e}')